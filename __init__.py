@@ -1 +1 @@
-# Created By Nick Huppert on 15/9/20.
+# Created By Nick Huppert on 15/9/20.
@@ -0,0 +1,183 @@
+"""
+Admission control for the work a server hands to its worker threads.
+
+A fixed pool of workers takes tasks from one bounded queue. When the queue is full the policy of the stream a new
+task belongs to decides what happens: POLICY_DROP_OLDEST sheds the task that has waited longest to make room,
+POLICY_REJECT sheds the new task so its sender can be told straight away that the server is busy, and POLICY_BLOCK
+makes the sender wait for room. However overloaded the server gets, at most queue_size tasks are ever waiting, so
+the time any accepted task waits stays bounded.
+"""
+
+import threading
+from collections import deque
+
+# Results of WorkerPool.submit.
+QUEUED = "queued"
+SHED = "shed"
+FULL = "full"
+
+
+class WorkerPool:
+    """
+    Fixed number of worker threads running tasks from a bounded queue.
+    """
+    POLICY_DROP_OLDEST = "drop_oldest"
+    POLICY_REJECT = "reject"
+    POLICY_BLOCK = "block"
+    POLICIES = (POLICY_DROP_OLDEST, POLICY_REJECT, POLICY_BLOCK)
+    DEFAULT_WORKERS = 4
+    DEFAULT_QUEUE_SIZE = 64
+    # Fresh poses are worth more than old ones, so by default the oldest waiting task is shed.
+    DEFAULT_POLICY = POLICY_DROP_OLDEST
+
+    def __init__(self, workers=DEFAULT_WORKERS, queue_size=DEFAULT_QUEUE_SIZE, policy=DEFAULT_POLICY,
+                 stream_policies=None):
+        """
+        Args:
+            workers(int): Number of worker threads.
+            queue_size(int): Tasks that may wait for a worker before the overload policy applies.
+            policy(str): Overload policy of streams without their own, one of POLICIES.
+            stream_policies(dict): Overload policy of particular streams, by stream id.
+
+        Raises:
+            ValueError: If a policy is not one of POLICIES.
+        """
+        for name in [policy] + list((stream_policies or {}).values()):
+            if name not in self.POLICIES:
+                raise ValueError("Unknown overload policy %s" % name)
+        self.workers = max(1, int(workers))
+        self.queue_size = max(1, int(queue_size))
+        self.default_policy = policy
+        self.stream_policies = dict(stream_policies or {})
+        self.__queue = deque()
+        self.__condition = threading.Condition()
+        self.__threads = []
+        self.__running = False
+        self.active = 0
+        self.high_water = 0
+        self.completed = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.blocked = 0
+
+    def start(self):
+        """
+        Starts the worker threads if they are not already running.
+        """
+        with self.__condition:
+            if self.__running:
+                return
+            self.__running = True
+        self.__threads = [threading.Thread(target=self.__work, daemon=True) for _ in range(self.workers)]
+        for thread in self.__threads:
+            thread.start()
+
+    def stop(self):
+        """
+        Sheds every queued task and stops the workers once they finish the tasks they are running.
+        """
+        with self.__condition:
+            self.__running = False
+            waiting = list(self.__queue)
+            self.__queue.clear()
+            self.__condition.notify_all()
+        for _, shed in waiting:
+            shed()
+        for thread in self.__threads:
+            if thread is not threading.current_thread():
+                thread.join()
+        self.__threads = []
+
+    def policy(self, stream):
+        """
+        Args:
+            stream: Id of a stream.
+
+        Returns:
+            str: The overload policy of the stream.
+        """
+        return self.stream_policies.get(stream, self.default_policy)
+
+    def submit(self, stream, run, shed, wait=True, retry=False):
+        """
+        Queues a task, applying the overload policy of its stream if the queue is full.
+
+        Args:
+            stream: Id of the stream the task belongs to.
+            run(callable): Function run by a worker.
+            shed(callable): Function called instead of run if the task is shed, on the thread shedding it.
+            wait(bool): Whether a stream with POLICY_BLOCK waits for room, otherwise FULL is returned straight away.
+            retry(bool): Whether the task was held back before, so it is not counted as held back again.
+
+        Returns:
+            str: QUEUED, SHED if the task was shed, or FULL if it was neither queued nor shed and should be
+                submitted again later.
+        """
+        evicted = None
+        with self.__condition:
+            waited = False
+            while self.__running and len(self.__queue) >= self.queue_size:
+                policy = self.policy(stream)
+                if policy == self.POLICY_DROP_OLDEST:
+                    evicted = self.__queue.popleft()
+                    self.dropped += 1
+                    break
+                if policy == self.POLICY_REJECT:
+                    break
+                if not waited and not retry:
+                    self.blocked += 1
+                    waited = True
+                if not wait:
+                    return FULL
+                self.__condition.wait()
+            queued = self.__running and len(self.__queue) < self.queue_size
+            if queued:
+                self.__queue.append((run, shed))
+                self.high_water = max(self.high_water, len(self.__queue))
+                self.__condition.notify_all()
+            else:
+                self.rejected += 1
+        if evicted is not None:
+            evicted[1]()
+        if not queued:
+            shed()
+            return SHED
+        return QUEUED
+
+    def counters(self):
+        """
+        Returns:
+            dict[str, int]: Tasks queued and running now, the most ever queued, tasks completed, and tasks shed by
+                dropping the oldest or rejecting the newest, plus times a task was held back for lack of room.
+        """
+        with self.__condition:
+            return {
+                "queued": len(self.__queue),
+                "active": self.active,
+                "queue_high_water": self.high_water,
+                "completed": self.completed,
+                "shed_dropped": self.dropped,
+                "shed_rejected": self.rejected,
+                "blocked": self.blocked
+            }
+
+    def __work(self):
+        while True:
+            with self.__condition:
+                while self.__running and not self.__queue:
+                    self.__condition.wait()
+                if not self.__queue:
+                    return
+                run, _ = self.__queue.popleft()
+                self.active += 1
+                # Wakes senders waiting for room as well as other workers.
+                self.__condition.notify_all()
+            try:
+                run()
+            except Exception as e:
+                # A failing task must not take a worker with it, or the pool would shrink.
+                print("%s" % e)
+            finally:
+                with self.__condition:
+                    self.active -= 1
+                    self.completed += 1
@@ -0,0 +1,212 @@
+#!/usr/bin/python3
+"""
+End to end benchmark of poser relaying frames to the parser on localhost.
+
+Starts poser's Flask app and PoseParserNode.listener() in this process, posts synthetic PoseNet payloads to /backend
+over HTTP and notes when the parser has run the metric on each frame. Reports the latency of the POST itself and of
+the whole path from POST to metric, frames delivered and dropped as stale, and the memory allocated per frame in a
+separate traced pass where each frame is waited for before the next is sent. The traced pass posts through Flask's
+test client, as the development server drains every request into a 10MB buffer that would swamp poser's own use.
+With --passthrough poser forwards the payloads undecoded for the parser to decode.
+
+Example:
+    python benchmarks/bench_end_to_end.py --frames 2000 --rate 30 -o end_to_end.json
+"""
+
+import argparse
+import contextlib
+import http.client
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+from common import add_output_arguments, finish, latency_summary, measure_allocations, synthetic_frames
+
+import poser
+from parser import PoseParserNode
+from relay import FrameRelay
+from socket_class import SocketManager, CODEC_JSON, CODEC_POSE
+
+DEFAULT_FRAMES = 2000
+# Frames traced for allocations, fewer than timed as tracing is slow.
+ALLOCATION_FRAMES = 100
+# Seconds to wait for the parser to catch up once every frame is sent.
+DRAIN_TIMEOUT = 5.0
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+
+    def log_request(self, code="-", size="-"):
+        # Logging every request would be measured along with poser.
+        pass
+
+
+def free_port():
+    """
+    Returns:
+        int: A port on localhost nothing is listening on.
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+class EndToEnd:
+    """
+    Poser and parser running on localhost with a client posting frames to poser.
+    """
+
+    def __init__(self, parser_port, passthrough=False):
+        """
+        Args:
+            parser_port(int): Port the parser listens on.
+            passthrough(bool): Whether poser forwards payloads without decoding them.
+        """
+        self.processed = {}
+        self.condition = threading.Condition()
+        self.node = PoseParserNode.instance()
+        track_frame = self.node.track_frame
+
+        def timed_track_frame(records):
+            track_frame(records)
+            with self.condition:
+                self.processed[int(records["sequence"][0])] = time.perf_counter()
+                self.condition.notify_all()
+
+        self.node.track_frame = timed_track_frame
+        self.node.socket_manager = SocketManager(self.node, port=parser_port, server=True, allow_pickle=False,
+                                                 server_mode=SocketManager.SERVER_MODE_SELECTOR)
+        self.node.listener()
+
+        # Point poser's relay at the parser's port.
+        poser.relay.stop()
+        poser.PASSTHROUGH = passthrough
+        # Every frame posted is measured, so none may be decimated for arriving sooner than the parser asks.
+        poser.DECIMATE = False
+        if passthrough:
+            poser.socket_manager = SocketManager(None, server=False, persistent=True, codecs=(CODEC_JSON, CODEC_POSE))
+        poser.relay = FrameRelay(poser.socket_manager, port=parser_port)
+        poser.relay.start()
+        self.server = make_server("127.0.0.1", 0, poser.app, threaded=True, request_handler=QuietRequestHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = http.client.HTTPConnection("127.0.0.1", self.server.server_port)
+        self.test_client = poser.app.test_client()
+        self.sent = 0
+
+    def post(self, body, test_client=False):
+        """
+        Posts one frame to /backend.
+
+        Args:
+            body(bytes): JSON payload.
+            test_client(bool): Whether to call the app directly through Flask's test client rather than over HTTP.
+
+        Returns:
+            tuple[int, float]: Sequence number the relay gives the frame and the time the POST started.
+        """
+        sequence = self.sent
+        self.sent += 1
+        started = time.perf_counter()
+        if test_client:
+            # Requests from the test client all come from the same address so share a stream with the HTTP client.
+            self.test_client.post("/backend", data=body, content_type="application/json",
+                                  environ_base={"REMOTE_ADDR": "127.0.0.1"})
+        else:
+            self.client.request("POST", "/backend", body, {"Content-Type": "application/json"})
+            self.client.getresponse().read()
+        return sequence, started
+
+    def wait_for(self, sequence, timeout=DRAIN_TIMEOUT):
+        """
+        Waits for the parser to process a frame, or any later frame if it was dropped as stale.
+
+        Args:
+            sequence(int): Sequence number of the frame.
+            timeout(float): Seconds to wait at most.
+        """
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while not self.processed or max(self.processed) < sequence:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                self.condition.wait(remaining)
+
+    def stop(self):
+        self.client.close()
+        self.server.shutdown()
+        poser.relay.stop()
+        poser.socket_manager.close_connections()
+        self.node.socket_manager.stop_server()
+
+
+def run(frame_count, people, rate, passthrough=False):
+    """
+    Args:
+        frame_count(int): Frames posted in the timed pass.
+        people(int): Poses in each frame.
+        rate(float): Frames posted per second, 0 to post as fast as responses allow.
+        passthrough(bool): Whether poser forwards payloads without decoding them.
+
+    Returns:
+        dict[str, dict]: Measurements of the POSTs and of the whole path to the metric.
+    """
+    bodies = [json.dumps(frame).encode() for frame in synthetic_frames(frame_count + ALLOCATION_FRAMES, people)]
+    # Metrics log to the console, which would dominate the timings.
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        end_to_end = EndToEnd(free_port(), passthrough)
+        try:
+            post_durations = []
+            started = {}
+            began = time.perf_counter()
+            for index, body in enumerate(bodies[:frame_count]):
+                if rate > 0:
+                    delay = began + index / rate - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                sequence, started[sequence] = end_to_end.post(body)
+                post_durations.append(time.perf_counter() - started[sequence])
+            end_to_end.wait_for(frame_count - 1)
+            elapsed = time.perf_counter() - began
+            with end_to_end.condition:
+                delivered = {sequence: finished - started[sequence] for sequence, finished in
+                             end_to_end.processed.items() if sequence in started}
+
+            def post_and_wait(body):
+                sequence, _ = end_to_end.post(body, test_client=True)
+                end_to_end.wait_for(sequence)
+
+            allocations = measure_allocations(post_and_wait, bodies[frame_count:])
+        finally:
+            end_to_end.stop()
+
+    path = latency_summary(list(delivered.values()), elapsed)
+    path.update({"delivered": len(delivered), "dropped": frame_count - len(delivered)})
+    path.update(allocations)
+    suffix = "/people%s%s" % (people, "/passthrough" if passthrough else "")
+    return {
+        "post" + suffix: latency_summary(post_durations, elapsed),
+        "post_to_metric" + suffix: path
+    }
+
+
+def main(arguments=None):
+    argument_parser = argparse.ArgumentParser(description="End to end benchmark of poser relaying to the parser.")
+    argument_parser.add_argument("--frames", type=int, default=DEFAULT_FRAMES, help="Frames posted.")
+    argument_parser.add_argument("--people", type=int, default=1, help="Poses in each frame.")
+    argument_parser.add_argument("--rate", type=float, default=0.0,
+                                 help="Frames posted per second, 0 to post as fast as possible.")
+    argument_parser.add_argument("--passthrough", action="store_true",
+                                 help="Have poser forward payloads without decoding them.")
+    add_output_arguments(argument_parser)
+    args = argument_parser.parse_args(arguments)
+    return finish(args, "end_to_end", run(args.frames, args.people, args.rate, args.passthrough))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
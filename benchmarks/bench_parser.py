@@ -0,0 +1,101 @@
+#!/usr/bin/python3
+"""
+Microbenchmarks of the parser hot path.
+
+Times convert_to_dictionary, register_keypoints, every metric in PoseMetrics.metric_list through execute_metric, all
+of them at once through execute_metrics and create_return_dictionary, each across several history lengths, then
+measures the memory each call allocates in a separate traced pass.
+
+Example:
+    python benchmarks/bench_parser.py -o parser.json
+    python benchmarks/bench_parser.py --baseline parser.json
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+
+import numpy as np
+
+from common import add_output_arguments, finish, measure_allocations, synthetic_frames, time_calls
+
+from parser import PoseFrame, PoseMetrics, PoseParserNode
+
+DEFAULT_HISTORY_LENGTHS = (10, 50, 200, 1000)
+DEFAULT_FRAMES = 2000
+# Calls traced for allocations, fewer than timed as tracing is slow.
+ALLOCATION_FRAMES = 200
+
+
+def benchmark_cases(history_length, frames):
+    """
+    Builds the cases measured for one history length.
+
+    Args:
+        history_length(int): Number of samples the metric history keeps.
+        frames(list[list[dict]]): Synthetic frames of PoseNet poses.
+
+    Returns:
+        dict[str, tuple]: Function and list of arguments of each case, keyed by case name.
+    """
+    node = PoseParserNode.instance()
+    metrics = PoseMetrics(history_length)
+    keypoints = [frame[0]["keypoints"] for frame in frames]
+    arrays = [PoseFrame.from_posenet(points).keypoints for points in keypoints]
+    # Frames 30 per second apart, later than anything already in the history.
+    pose_frames = [PoseFrame(array, 1e6 + index / 30) for index, array in enumerate(arrays)]
+    for index in range(history_length):
+        metrics.register_keypoints(PoseFrame(arrays[index % len(arrays)], index / 30))
+
+    suffix = "/h%s" % history_length
+    cases = {
+        "convert_to_dictionary/list" + suffix: (lambda points: node.convert_to_dictionary(points, metrics), keypoints),
+        "convert_to_dictionary/array" + suffix: (lambda array: node.convert_to_dictionary(array, metrics), arrays),
+        "register_keypoints" + suffix: (metrics.register_keypoints, pose_frames)
+    }
+    for name in PoseMetrics.metric_list:
+        cases["execute_metric/%s%s" % (name, suffix)] = (
+            lambda frame, name=name: metrics.execute_metric(name, frame), pose_frames)
+    cases["execute_metrics/all" + suffix] = (
+        lambda frame: metrics.execute_metrics(list(PoseMetrics.metric_list), frame), pose_frames)
+    return cases
+
+
+def run(history_lengths, frame_count):
+    """
+    Args:
+        history_lengths(list[int]): History lengths to measure.
+        frame_count(int): Calls timed in each case.
+
+    Returns:
+        dict[str, dict]: Measurements of each case.
+    """
+    frames = synthetic_frames(frame_count)
+    metrics = PoseMetrics(1)
+    cases = {"create_return_dictionary": (lambda value: metrics.create_return_dictionary(x=value, y=value),
+                                          np.linspace(0, 1, frame_count).tolist())}
+    for history_length in history_lengths:
+        cases.update(benchmark_cases(history_length, frames))
+
+    results = {}
+    # Metrics log to the console, which would dominate the timings.
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for name, (function, arguments) in cases.items():
+            results[name] = time_calls(function, arguments)
+            results[name].update(measure_allocations(function, arguments[:ALLOCATION_FRAMES]))
+    return results
+
+
+def main(arguments=None):
+    argument_parser = argparse.ArgumentParser(description="Microbenchmarks of the parser hot path.")
+    argument_parser.add_argument("--history-lengths", type=int, nargs="+", default=list(DEFAULT_HISTORY_LENGTHS),
+                                 help="History lengths to measure.")
+    argument_parser.add_argument("--frames", type=int, default=DEFAULT_FRAMES, help="Calls timed in each case.")
+    add_output_arguments(argument_parser)
+    args = argument_parser.parse_args(arguments)
+    return finish(args, "parser", run(args.history_lengths, args.frames))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""
+Shared helpers for the benchmarks: synthetic PoseNet payloads, timing and allocation measurement, and writing
+results as JSON that can be compared against a saved baseline.
+"""
+
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+# Benchmarks import the flat modules of the repository.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parser import PART_MAP  # noqa: E402
+
+# Fraction a result may get worse than the baseline before it is reported as a regression.
+DEFAULT_TOLERANCE = 0.1
+# Results compared against a baseline, maximum latencies are too noisy to compare.
+COMPARED = ("throughput_per_s", "p50_us", "p99_us", "peak_bytes_per_frame", "retained_blocks_per_frame")
+# Results where a larger value is better, every other result is better when smaller.
+HIGHER_IS_BETTER = ("throughput_per_s",)
+
+
+def synthetic_pose(random, base=200.0, jitter=5.0, score=0.9):
+    """
+    Creates a PoseNet pose with every keypoint confidently detected near a base position.
+
+    Args:
+        random(np.random.Generator): Source of jitter.
+        base(float): Position the pose is centred around.
+        jitter(float): Largest random offset of each keypoint.
+        score(float): Score of the pose.
+
+    Returns:
+        dict: A pose as posenet sends it.
+    """
+    offsets = random.uniform(-jitter, jitter, (len(PART_MAP), 2))
+    scores = random.uniform(0.5, 1.0, len(PART_MAP))
+    return {
+        "score": score,
+        "keypoints": [{"part": name, "score": float(scores[index]),
+                       "position": {"x": base + index * 10 + float(offsets[index, 0]),
+                                    "y": base + index * 20 + float(offsets[index, 1])}}
+                      for index, name in PART_MAP.items()]
+    }
+
+
+def synthetic_frames(count, people=1, seed=0):
+    """
+    Creates frames of PoseNet poses.
+
+    Args:
+        count(int): Number of frames.
+        people(int): Poses in each frame.
+        seed(int): Seed for the jitter so runs are repeatable.
+
+    Returns:
+        list[list[dict]]: Frames, each a list of poses.
+    """
+    random = np.random.default_rng(seed)
+    return [[synthetic_pose(random, base=200.0 + 300.0 * person) for person in range(people)]
+            for _ in range(count)]
+
+
+def latency_summary(durations, elapsed=None):
+    """
+    Summarises per operation durations.
+
+    Args:
+        durations(list[float]): Duration of each operation in seconds.
+        elapsed(float): Wall time taken for all operations, defaults to the sum of the durations.
+
+    Returns:
+        dict[str, float]: Operations per second and the p50, p99 and maximum latency in microseconds.
+    """
+    durations = np.asarray(durations, dtype=np.float64)
+    if len(durations) == 0:
+        return {"count": 0}
+    elapsed = float(durations.sum()) if elapsed is None else elapsed
+    return {
+        "count": len(durations),
+        "throughput_per_s": len(durations) / elapsed if elapsed > 0 else float("inf"),
+        "p50_us": float(np.percentile(durations, 50) * 1e6),
+        "p99_us": float(np.percentile(durations, 99) * 1e6),
+        "max_us": float(durations.max() * 1e6)
+    }
+
+
+def time_calls(function, arguments, warmup=100):
+    """
+    Times a function called once for each argument.
+
+    Args:
+        function(callable): Function taking a single argument.
+        arguments(list): Arguments to call the function with, in order.
+        warmup(int): Calls made before timing starts, cycling through the arguments.
+
+    Returns:
+        dict[str, float]: Summary from latency_summary.
+    """
+    for index in range(warmup):
+        function(arguments[index % len(arguments)])
+    durations = []
+    clock = time.perf_counter
+    start = clock()
+    for argument in arguments:
+        began = clock()
+        function(argument)
+        durations.append(clock() - began)
+    return latency_summary(durations, clock() - start)
+
+
+def measure_allocations(function, arguments):
+    """
+    Measures the memory a function allocates per call with tracemalloc. Run separately from timing as tracing
+    slows every allocation down.
+
+    Args:
+        function(callable): Function taking a single argument.
+        arguments(list): Arguments to call the function with, in order.
+
+    Returns:
+        dict[str, float]: Mean peak bytes allocated during a call and memory blocks still held per call.
+    """
+    tracemalloc.start()
+    try:
+        peaks = []
+        blocks_before = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+        for argument in arguments:
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            function(argument)
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+        blocks_after = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    finally:
+        tracemalloc.stop()
+    return {
+        "peak_bytes_per_frame": float(np.mean(peaks)) if peaks else 0.0,
+        "retained_blocks_per_frame": (blocks_after - blocks_before) / max(len(arguments), 1)
+    }
+
+
+def write_results(path, benchmark, results):
+    """
+    Writes results as JSON along with the environment they were measured in.
+
+    Args:
+        path(str): File to write, or "-" for standard output.
+        benchmark(str): Name of the benchmark.
+        results(dict[str, dict]): Measurements of each case.
+    """
+    document = {
+        "benchmark": benchmark,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "results": results
+    }
+    text = json.dumps(document, indent=2, sort_keys=True)
+    if path == "-":
+        print(text)
+    else:
+        with open(path, "w") as output:
+            output.write(text + "\n")
+
+
+def compare_results(results, baseline_path, tolerance=DEFAULT_TOLERANCE):
+    """
+    Prints how each measurement changed from a saved baseline.
+
+    Args:
+        results(dict[str, dict]): Measurements of each case.
+        baseline_path(str): JSON file previously written by write_results.
+        tolerance(float): Fraction a measurement may get worse before it counts as a regression.
+
+    Returns:
+        list[str]: Description of every regression, empty when none.
+    """
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)["results"]
+    regressions = []
+    for case, measurements in sorted(results.items()):
+        for name, value in sorted(measurements.items()):
+            previous = baseline.get(case, {}).get(name)
+            if name not in COMPARED or not isinstance(previous, (int, float)) or previous == 0:
+                continue
+            change = (value - previous) / abs(previous)
+            worse = -change if name in HIGHER_IS_BETTER else change
+            flag = ""
+            if worse > tolerance:
+                flag = "  REGRESSION"
+                regressions.append("%s %s: %.4g -> %.4g" % (case, name, previous, value))
+            print("%-48s %-28s %12.4g -> %12.4g %+7.1f%%%s" % (case, name, previous, value, change * 100, flag),
+                  file=sys.stderr)
+    return regressions
+
+
+def add_output_arguments(argument_parser):
+    """
+    Adds the options shared by every benchmark for writing and comparing results.
+
+    Args:
+        argument_parser(argparse.ArgumentParser): Parser of the benchmark's command line.
+    """
+    argument_parser.add_argument("-o", "--output", default="-", help="JSON file to write results to, - for stdout.")
+    argument_parser.add_argument("--baseline", default=None, help="JSON results to compare against.")
+    argument_parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                                 help="Fraction a result may get worse than the baseline before failing.")
+
+
+def finish(args, benchmark, results):
+    """
+    Writes results and compares them against the baseline if one was given.
+
+    Args:
+        args(argparse.Namespace): Parsed options added by add_output_arguments.
+        benchmark(str): Name of the benchmark.
+        results(dict[str, dict]): Measurements of each case.
+
+    Returns:
+        int: Exit status, 1 if any result regressed beyond the tolerance.
+    """
+    write_results(args.output, benchmark, results)
+    if args.baseline is None:
+        return 0
+    regressions = compare_results(results, args.baseline, args.tolerance)
+    if regressions:
+        print("%s results regressed beyond %s%%:\n%s" % (len(regressions), args.tolerance * 100,
+                                                         "\n".join(regressions)), file=sys.stderr)
+        return 1
+    return 0
@@ -0,0 +1,73 @@
+"""
+Maps the capture times camera clients stamp on their frames onto this machine's clock.
+
+Clients stamp each frame with a monotonic clock of their own, eg. performance.now() in a browser, which only says how
+far apart their frames were captured. The offset from a client's clock to this one is estimated as the smallest gap
+seen between a frame's capture time and its arrival, as that frame was delayed least on its way. Frames therefore
+keep the spacing they were captured with however long each spent in transit, and can be checked against a freshness
+deadline, see PoseParserNode.FRESHNESS_DEADLINE. The estimate creeps forward slowly so drift between the two clocks
+never leaves it behind, and starts over when a client's clock goes backwards, eg. because the page was reloaded, or
+when nothing has arrived from the client for a while.
+"""
+
+import threading
+import time
+
+
+class CaptureClock:
+    """
+    Converts capture times of each stream from the client's clock into seconds since the epoch on this machine.
+    """
+    # Seconds per second the offset is allowed to grow by, well above the drift between two clocks.
+    DRIFT = 0.0001
+    # Seconds a stream is remembered after its last frame arrived.
+    EXPIRY = 30.0
+
+    def __init__(self, drift=DRIFT, expiry=EXPIRY):
+        """
+        Args:
+            drift(float): Seconds per second the estimated offset is allowed to grow by.
+            expiry(float): Seconds after its last frame a stream is forgotten.
+        """
+        self.drift = drift
+        self.expiry = expiry
+        # Client capture time, offset, arrival time and converted capture time of the last frame of each stream.
+        self.__streams = {}
+        self.__lock = threading.Lock()
+
+    def capture_time(self, stream, client_time, received=None):
+        """
+        Args:
+            stream(str): Key identifying the stream, eg. the client address.
+            client_time(float): Capture time of the frame in seconds on the client's clock.
+            received(float): Arrival time of the frame in seconds since the epoch, defaults to now.
+
+        Returns:
+            float: Capture time in seconds since the epoch, never later than the frame arrived nor earlier than the
+                last frame of the stream.
+        """
+        if received is None:
+            received = time.time()
+        with self.__lock:
+            for idle in [idle for idle, last in self.__streams.items() if received - last[2] > self.expiry]:
+                del self.__streams[idle]
+            last = self.__streams.get(stream)
+            if last is not None and client_time < last[0]:
+                last = None
+            offset = received - client_time
+            if last is not None:
+                _, last_offset, last_received, last_capture = last
+                offset = min(offset, last_offset + self.drift * max(0.0, received - last_received))
+            capture = client_time + offset
+            if last is not None:
+                capture = max(capture, last_capture)
+            self.__streams[stream] = (client_time, offset, received, capture)
+            return capture
+
+    def forget(self, stream):
+        """
+        Args:
+            stream(str): Key of a stream that has ended, so a client restarting its clock is not matched to it.
+        """
+        with self.__lock:
+            self.__streams.pop(stream, None)
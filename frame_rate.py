@@ -0,0 +1,143 @@
+"""
+Frame rate feedback from the parser to the camera clients.
+
+The parser times the frames it handles and works out how often each stream can send a frame, given the streams
+currently sending, its share of the parser's capacity and the sample rate the active metric needs, which no stream
+benefits from exceeding. The interval is returned in every reply, passed on by the relay and sent back to camera
+clients by poser in its answer to each frame. Clients that ignore it have frames arriving before the interval has
+passed dropped by poser, so work is cut where frames are produced rather than where they would be shed.
+"""
+
+import threading
+from time import monotonic
+
+
+class CapacityEstimator:
+    """
+    Estimates from the time spent on each frame the interval between frames each stream should keep to.
+    """
+    # Fraction of the parser's time frames may take, leaving headroom for bursts.
+    DEFAULT_UTILISATION = 0.8
+    # Seconds a stream counts as sending after its last frame.
+    DEFAULT_WINDOW = 2.0
+    # Weight of each new sample in the moving average of the time per frame.
+    SMOOTHING = 0.1
+    # Longest interval ever asked for, so clients keep sending often enough to be tracked.
+    MAX_INTERVAL = 1.0
+
+    def __init__(self, sample_rate, utilisation=DEFAULT_UTILISATION, window=DEFAULT_WINDOW):
+        """
+        Args:
+            sample_rate(float): Frames per second the active metric needs from each stream, 0 for no limit.
+            utilisation(float): Fraction of the parser's time frames may take.
+            window(float): Seconds a stream counts as sending after its last frame.
+        """
+        self.sample_rate = sample_rate
+        self.utilisation = utilisation
+        self.window = window
+        self.__frame_time = 0.0
+        self.__last_seen = {}
+        self.__lock = threading.Lock()
+
+    def record(self, stream_id, frames, seconds):
+        """
+        Args:
+            stream_id(int): Id of the stream the frames came from.
+            frames(int): Number of frames handled.
+            seconds(float): Time spent handling them.
+        """
+        if frames <= 0:
+            return
+        now = monotonic()
+        with self.__lock:
+            sample = seconds / frames
+            if self.__frame_time == 0.0:
+                self.__frame_time = sample
+            else:
+                self.__frame_time += self.SMOOTHING * (sample - self.__frame_time)
+            self.__last_seen[stream_id] = now
+
+    def streams(self):
+        """
+        Returns:
+            int: Streams that sent a frame within the window, at least 1.
+        """
+        cutoff = monotonic() - self.window
+        with self.__lock:
+            for stream_id in [stream_id for stream_id, seen in self.__last_seen.items() if seen < cutoff]:
+                del self.__last_seen[stream_id]
+            return max(1, len(self.__last_seen))
+
+    def capacity(self):
+        """
+        Returns:
+            float: Frames per second the parser can handle within its utilisation, 0 before any frame is timed.
+        """
+        with self.__lock:
+            frame_time = self.__frame_time
+        return self.utilisation / frame_time if frame_time > 0 else 0.0
+
+    def target_interval(self):
+        """
+        Returns:
+            float: Seconds each stream should leave between frames, the longer of the interval the metric needs and
+                the stream's share of the parser's capacity.
+        """
+        interval = 1.0 / self.sample_rate if self.sample_rate > 0 else 0.0
+        capacity = self.capacity()
+        if capacity > 0:
+            interval = max(interval, self.streams() / capacity)
+        return min(interval, self.MAX_INTERVAL)
+
+    def counters(self):
+        """
+        Returns:
+            dict[str, float]: Frames per second the parser can handle, streams sending and the target interval in
+                milliseconds.
+        """
+        return {
+            "frames_per_second": round(self.capacity(), 1),
+            "streams": self.streams(),
+            "target_interval_ms": round(self.target_interval() * 1000.0, 1)
+        }
+
+
+class FrameDecimator:
+    """
+    Drops frames from streams sending faster than the target interval.
+    """
+    # Fraction of the interval a frame may arrive early, so clients timing frames by animation callbacks are not
+    # decimated for their jitter.
+    DEFAULT_TOLERANCE = 0.25
+    # Seconds a stream's last admitted frame is remembered, well beyond any interval asked for.
+    DEFAULT_EXPIRY = 10.0
+
+    def __init__(self, tolerance=DEFAULT_TOLERANCE, expiry=DEFAULT_EXPIRY):
+        """
+        Args:
+            tolerance(float): Fraction of the interval a frame may arrive early.
+            expiry(float): Seconds after its last admitted frame a stream is forgotten.
+        """
+        self.tolerance = tolerance
+        self.expiry = expiry
+        self.__admitted = {}
+        self.__lock = threading.Lock()
+
+    def admit(self, stream, interval):
+        """
+        Args:
+            stream(str): Key identifying the stream, eg. the client address.
+            interval(float): Seconds the stream should leave between frames.
+
+        Returns:
+            bool: Whether the frame should be handled, False if it arrived too soon after the last one handled.
+        """
+        now = monotonic()
+        with self.__lock:
+            for idle in [idle for idle, last in self.__admitted.items() if now - last > self.expiry]:
+                del self.__admitted[idle]
+            admitted = self.__admitted.get(stream)
+            if admitted is not None and now - admitted < interval * (1.0 - self.tolerance):
+                return False
+            self.__admitted[stream] = now
+            return True
@@ -0,0 +1,26 @@
+"""
+Velocity and acceleration of tracked points over a window of history, as read from the running sums of PoseHistory.
+
+Samples where a point was below the confidence threshold, or where no time elapsed, are masked out rather than
+breaking the calculation so a few spoiled samples only reduce the number of steps averaged.
+"""
+
+
+class Kinematics:
+    """
+    Average motion of each point over a history window. Units are position units per second.
+    """
+    __slots__ = ("velocity", "acceleration", "speed", "steps")
+
+    def __init__(self, velocity, acceleration, speed, steps):
+        """
+        Args:
+            velocity(np.ndarray): (points, 2) mean x, y velocity.
+            acceleration(np.ndarray): (points, 2) mean x, y acceleration.
+            speed(np.ndarray): (points,) mean speed irrespective of direction.
+            steps(np.ndarray): (points,) number of valid steps each mean was taken over.
+        """
+        self.velocity = velocity
+        self.acceleration = acceleration
+        self.speed = speed
+        self.steps = steps
@@ -0,0 +1,286 @@
+"""
+Output stage between the parser's metrics and whatever they drive, eg. a drone controller or a ROS bridge.
+
+Metric results are submitted without waiting and delivered by a sender thread through a pluggable sink, so output
+I/O never runs on the thread handling a frame. Setpoints that differ from the last one delivered by no more than a
+deadband are suppressed, a burst of setpoints is coalesced to the latest one for each tracked person, and deliveries
+are limited to a maximum rate so the downstream controller is never sent more than it asked for. The last setpoint
+delivered for a person is forgotten once nothing has been submitted for them for a while.
+"""
+
+import json
+import numbers
+import socket
+import threading
+from collections import deque
+from time import monotonic
+
+
+def encode_setpoint(setpoint):
+    """
+    Args:
+        setpoint(dict): Setpoint to send.
+
+    Returns:
+        bytes: The setpoint as a line of JSON.
+    """
+    return json.dumps(setpoint, default=str).encode("utf-8") + b"\n"
+
+
+class LocalSink:
+    """
+    Stand-in for a downstream link, keeping recent setpoints in this process and optionally passing each one on to
+    a function.
+    """
+    DEFAULT_HISTORY = 256
+
+    def __init__(self, callback=None, history=DEFAULT_HISTORY):
+        """
+        Args:
+            callback(callable): Function called with each delivered setpoint, if any.
+            history(int): Number of recent setpoints kept in "delivered".
+        """
+        self.callback = callback
+        self.delivered = deque(maxlen=max(1, int(history)))
+
+    def send(self, setpoint):
+        self.delivered.append(setpoint)
+        if self.callback is not None:
+            self.callback(setpoint)
+
+    def close(self):
+        pass
+
+
+class UdpSink:
+    """
+    Sends each setpoint as a datagram holding a line of JSON.
+    """
+
+    def __init__(self, ip, port):
+        """
+        Args:
+            ip(str): IP address to send to.
+            port(int): Port to send to.
+        """
+        self.address = (ip, int(port))
+        self.__socket = None
+
+    def send(self, setpoint):
+        if self.__socket is None:
+            # Created on first use so the sink can be handed to a worker process before it is used.
+            self.__socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.__socket.sendto(encode_setpoint(setpoint), self.address)
+
+    def close(self):
+        if self.__socket is not None:
+            self.__socket.close()
+            self.__socket = None
+
+
+class TcpSink:
+    """
+    Streams setpoints as lines of JSON over one long-lived connection, reconnecting once if it has dropped.
+    """
+    DEFAULT_TIMEOUT = 2.0
+
+    def __init__(self, ip, port, timeout=DEFAULT_TIMEOUT):
+        """
+        Args:
+            ip(str): IP address to connect to.
+            port(int): Port to connect to.
+            timeout(float): Socket timeout in seconds.
+        """
+        self.address = (ip, int(port))
+        self.timeout = timeout
+        self.__socket = None
+
+    def send(self, setpoint):
+        data = encode_setpoint(setpoint)
+        for attempt in range(2):
+            try:
+                if self.__socket is None:
+                    self.__socket = socket.create_connection(self.address, timeout=self.timeout)
+                    self.__socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                self.__socket.sendall(data)
+                return
+            except OSError:
+                self.close()
+                if attempt == 1:
+                    raise
+
+    def close(self):
+        if self.__socket is not None:
+            try:
+                self.__socket.close()
+            except OSError:
+                pass
+            self.__socket = None
+
+
+class OutputStage:
+    """
+    Delivers the latest setpoint of each tracked person through a sink from a sender thread, at most max_rate
+    times a second and only when it has changed by more than the deadband.
+    """
+    # Deliveries per second at most, each delivering the latest setpoint of every person with a new one.
+    DEFAULT_MAX_RATE = 20.0
+    # Largest change in any numeric field of a setpoint that is not worth delivering.
+    DEFAULT_DEADBAND = 0.01
+    # Seconds the last setpoint delivered for a person is kept after their last submission, longer than their track.
+    DEFAULT_EXPIRY = 10.0
+
+    def __init__(self, sink, max_rate=DEFAULT_MAX_RATE, deadband=DEFAULT_DEADBAND, expiry=DEFAULT_EXPIRY):
+        """
+        Args:
+            sink: Object implementing send(setpoint) and close(), eg. a LocalSink, UdpSink or TcpSink.
+            max_rate(float): Deliveries per second at most, 0 for no limit.
+            deadband(float): Largest change in any numeric field that is suppressed.
+            expiry(float): Seconds a person's last delivered setpoint is kept after their last submission.
+        """
+        self.sink = sink
+        self.__interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.deadband = deadband
+        self.expiry = expiry
+        self.__pending = {}
+        self.__delivered = {}
+        self.__last_submitted = {}
+        self.__condition = threading.Condition()
+        self.__thread = None
+        self.__running = False
+        self.submitted = 0
+        self.suppressed = 0
+        self.coalesced = 0
+        self.sent = 0
+        self.failed = 0
+
+    def start(self):
+        """
+        Starts the sender thread if it is not already running.
+        """
+        with self.__condition:
+            if self.__running:
+                return
+            self.__running = True
+        self.__thread = threading.Thread(target=self.__send_loop, daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        """
+        Stops the sender thread, delivering any setpoints still pending first, and closes the sink.
+        """
+        with self.__condition:
+            self.__running = False
+            self.__condition.notify_all()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        self.sink.close()
+
+    def submit(self, parameters, track_id=None):
+        """
+        Queues a setpoint for delivery without waiting, replacing any setpoint of the same person not yet delivered.
+
+        Args:
+            parameters(dict): Setpoint from PoseMetrics.create_return_dictionary.
+            track_id(int): Id of the tracked person the setpoint is for, None when poses are not tracked.
+
+        Returns:
+            bool: Whether the setpoint will be delivered, False if it is within the deadband of the last delivered.
+        """
+        now = monotonic()
+        with self.__condition:
+            self.submitted += 1
+            self.__expire(now)
+            self.__last_submitted[track_id] = now
+            if self.__within_deadband(parameters, self.__delivered.get(track_id)):
+                self.suppressed += 1
+                # The person is back where the last delivery left them, so anything pending is out of date.
+                if self.__pending.pop(track_id, None) is not None:
+                    self.coalesced += 1
+                return False
+            if track_id in self.__pending:
+                self.coalesced += 1
+            self.__pending[track_id] = parameters
+            self.__condition.notify()
+            return True
+
+    def counters(self):
+        """
+        Returns:
+            dict[str, int]: Setpoints submitted, suppressed by the deadband, coalesced, sent and failed, plus
+                setpoints currently pending.
+        """
+        with self.__condition:
+            return {
+                "submitted": self.submitted,
+                "suppressed": self.suppressed,
+                "coalesced": self.coalesced,
+                "sent": self.sent,
+                "failed": self.failed,
+                "pending": len(self.__pending)
+            }
+
+    def __expire(self, now):
+        """
+        Forgets the last delivered setpoint of people nothing has been submitted for within the expiry time, eg.
+        because their track expired. Called with the condition held.
+
+        Args:
+            now(float): Current monotonic time in seconds.
+        """
+        for track_id in [track_id for track_id, submitted in self.__last_submitted.items()
+                         if now - submitted > self.expiry]:
+            del self.__last_submitted[track_id]
+            self.__delivered.pop(track_id, None)
+
+    def __within_deadband(self, parameters, previous):
+        if previous is None or parameters.keys() != previous.keys():
+            return False
+        for name, value in parameters.items():
+            other = previous[name]
+            if isinstance(value, numbers.Real) and isinstance(other, numbers.Real):
+                if abs(value - other) > self.deadband:
+                    return False
+            elif value != other:
+                return False
+        return True
+
+    def __next_setpoints(self, not_before):
+        """
+        Waits for pending setpoints and for the next delivery slot, then takes every pending setpoint.
+
+        Returns:
+            dict: Setpoints by track id, empty once the stage is stopped with nothing pending.
+        """
+        with self.__condition:
+            while self.__running and (not self.__pending or monotonic() < not_before):
+                self.__condition.wait(None if not self.__pending else not_before - monotonic())
+            pending = self.__pending
+            self.__pending = {}
+            return pending
+
+    def __send_loop(self):
+        not_before = 0.0
+        while True:
+            pending = self.__next_setpoints(not_before)
+            if not pending:
+                return
+            not_before = monotonic() + self.__interval
+            for track_id, parameters in pending.items():
+                setpoint = dict(parameters)
+                setpoint["track_id"] = track_id
+                try:
+                    self.sink.send(setpoint)
+                    delivered = True
+                except (OSError, ValueError) as e:
+                    print("%s" % e)
+                    delivered = False
+                with self.__condition:
+                    if delivered:
+                        self.sent += 1
+                        # A person forgotten while their setpoint was being sent stays forgotten.
+                        if track_id in self.__last_submitted:
+                            self.__delivered[track_id] = parameters
+                    else:
+                        self.failed += 1
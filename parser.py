@@ -1,605 +1,1142 @@
-#!/usr/bin/python3
-import math
-import json
-from datetime import datetime as time
-from socket_class import SocketManager
-
-import numpy as np
-
-# Confidence score required to validate a keypoint set.
-MINIMUM_CONFIDENCE = 0.2
-
-# Mapping of parts to array as per posenet keypoints.
-PART_MAP = {
-    0: "nose",
-    1: "leftEye",
-    2: "rightEye",
-    3: "leftEar",
-    4: "rightEar",
-    5: "leftShoulder",
-    6: "rightShoulder",
-    7: "leftElbow",
-    8: "rightElbow",
-    9: "leftWrist",
-    10: "rightWrist",
-    11: "leftHip",
-    12: "rightHip",
-    13: "leftKnee",
-    14: "rightKnee",
-    15: "leftAnkle",
-    16: "rightAnkle"
-}  # A 'timestamp' field is added to dictionary when parsed.
-
-# The topic the simulator is subscribed to.
-
-
-class PoseParserNode:
-    """
-    ROSpy Node for parsing data from posenet. Adds timestamp to notate when message was received.
-    """
-    _instance = None
-    # Options for default metric are any one string from the following:
-    # "demo_metric", "offset_midpoints", "centroid", "average_speed_of_points", "positional_demo", "centroid_coords"
-    DEFAULT_METRIC = "demo_metric"
-    metrics = None
-    metric_functions = None
-    socket_manager = None
-
-    def __init__(self):
-        raise TypeError("Class is singleton, call instance() not init")
-
-    @classmethod
-    def instance(cls):
-        if cls._instance is None:
-            cls._instance = cls.__new__(cls)
-            cls.metrics = PoseMetrics()
-            cls.metric_functions = PoseMetrics.metric_list.keys()
-        return cls._instance
-
-    def convert_to_dictionary(self, data):
-        """
-        Takes data recorded from posenet and converts it into a python dictionary with sensible keys.
-
-        Args:
-            data(list): A list sent from posenet.
-
-        Returns:
-            dict: A python dictionary containing pose data for each keypoint including (x, y)
-                locations and confidence score.
-        """
-        pose_dict = {}
-        for i in range(0, len(data)):
-            # Use posenet part mapping to label positions from list.
-            pose_dict[PART_MAP[i]] = {
-                "position": (float(data[i]["position"]["x"]), float(data[i]["position"]["y"])),
-                "score": float(data[i]["score"])
-            }
-        pose_dict["timestamp"] = time.now()
-        PoseParserNode.metrics.register_keypoints(pose_dict)
-        return pose_dict
-
-    def callback(self, data):
-        """
-        Callback function for ROS pub/sub model.
-        Converts message to dictionary and runs currently selected metric.
-
-        Args:
-            data: Data received from ROS subscription.
-
-        """
-        # points_data = json.loads(data)
-
-        print('the data type is', type(data))
-        points_data = data
-        keypoints = self.convert_to_dictionary(points_data["keypoints"])
-        print('the data type is now', type(keypoints))
-        if self.DEFAULT_METRIC in PoseParserNode.metric_functions:
-            trajectory_points = PoseParserNode.metrics.execute_metric(self.DEFAULT_METRIC, keypoints)
-            if trajectory_points is not None:
-                self.publisher(trajectory_points)
-
-
-    def listener(self):
-        """
-        Creates and starts the socket server.
-        """
-        if self.socket_manager is None:
-            self.socket_manager = SocketManager(self, server=True)
-        self.socket_manager.listen()
-
-    def got_message(self, address, message):
-        """
-        Callback function for when a message is received over sockets.
-
-        Args:
-            address: The address of the sender.
-            message(str): The message received.
-        """
-        self.callback(message)
-        # print(message)
-        return "DONE"
-
-    def publisher(self, trajectory_parameters):
-        """
-        Generates and publishes a MultiDOFJointTrajectory message from inputs to publisher topic for simulator.
-
-        Args:
-            trajectory_parameters(dict): A dictionary containing all data fields required to build a Trajectory message.
-        """
-        # TODO - This is where x/y/z metric results come in.
-        pass
-
-    def test_metrics(self, keypoints):
-        """
-        Calls all three advanced metrics with the keypoint data for viewing logs of responses for metrics.
-        Uncommenting the print lines in these metrics enables the console log functionality.
-        This is more of an example of how to call metrics than functional code.
-        """
-        PoseParserNode.metrics.execute_metric("midpoint", keypoints)
-        PoseParserNode.metrics.execute_metric("centroid", keypoints)
-        return PoseParserNode.metrics.execute_metric("average_speed_of_points", keypoints)
-
-
-class PoseMetrics:
-    """
-    Container class for pose metrics.
-    Metrics designed to be called external to this class must conform to the function layout that follows even if the
-    metric does not require them as the convenience method selector expects 3 arguments regardless of if they are used
-    or not.  "def metric(dict, list, list)"
-    The variable dictionary "metric_list" can contain a string name and function value to ease calling of metrics.
-    """
-    # Default Focus for the average_speed metric
-    DEFAULT_FOCUS_POINT_1 = "leftWrist"
-    DEFAULT_FOCUS_POINT_2 = "rightWrist"
-
-    # Default focus for angle threshold demo.
-    ANGLE_THRESHOLD = 15
-    previous_angle = None
-    POSITION_BASE = "rightShoulder"
-    POSITION_OUTER = "rightWrist"
-
-    # Length of list to calculate averages from history.
-    DEFAULT_HISTORY_LENGTH = 50
-
-    # Used for demo_metric.
-    high = None
-
-    # Default values for metric return properties.
-    default_x = 0.0
-    default_y = 0.0
-    default_z = 1.0
-    default_rotation_x = 0.0
-    default_rotation_y = 0.0
-    default_rotation_z = 0.0
-    default_rotation_w = 1.0
-    default_velocity_x = 1.0
-    default_velocity_y = 1.0
-    default_velocity_z = 1.0
-    default_velocity_angular_x = 1.0
-    default_velocity_angular_y = 1.0
-    default_velocity_angular_z = 1.0
-    default_acceleration_linear_x = 1.0
-    default_acceleration_linear_y = 1.0
-    default_acceleration_linear_z = 1.0
-    default_acceleration_angular_x = 1.0
-    default_acceleration_angular_y = 1.0
-    default_acceleration_angular_z = 1.0
-
-    # Variables for maintaining a history of past data for use in metric calculations.
-    history = [{}]
-    centroid_history = [{}]
-    history_length = 0
-
-    def __init__(self, history_length=DEFAULT_HISTORY_LENGTH):
-        PoseMetrics.history_length = history_length
-
-    def register_keypoints(self, keypoints):
-        """
-        Takes a dictionary of parsed pose data and adds it to the history list with timestamp.
-        Ideally, should only be called once, immediately after keypoints are parsed.
-
-        Args:
-            keypoints(dict): Latest set of pose data as parsed dictionary.
-
-        """
-        data = {}
-        try:
-            for point in keypoints:
-                if point in PART_MAP.values():
-                    if keypoints[point]["score"] < MINIMUM_CONFIDENCE:
-                        data[point] = None
-                    else:
-                        data[point] = keypoints[point]["position"]
-                elif point == "timestamp":
-                    data["timestamp"] = keypoints[point]
-            PoseMetrics.history.insert(0, data.copy())
-            # Log history of calculated centroid.
-            self.centroid(keypoints)
-            # Prune list if it gets too long
-            if len(PoseMetrics.history) > self.history_length:
-                PoseMetrics.history.pop()
-            if len(PoseMetrics.centroid_history) > self.history_length:
-                PoseMetrics.centroid_history.pop()
-            return True
-        except KeyError as e:
-            print("Exception occured\n%s\nKeyPoints passed in:\n%s" % (str(e), str(keypoints)))
-            return False
-
-    def midpoint(self, keypoints, point_1_name=DEFAULT_FOCUS_POINT_1, point_2_name=DEFAULT_FOCUS_POINT_2):
-        """
-        Finds the middle point between 2 x,y locations. Default points are left and right wrists.
-
-        Args:
-            keypoints(dict): A dictionary of all pose keypoints.
-            point_1_name(str): Name of keypoint 1 to use in metric.
-            point_2_name(str): Name of keypoint 2 to use in metric.
-
-        Returns:
-            dict: The midpoint x,y given two points and a score of between 0-1 based on proximity
-                to point 1 and 2 respectively, formatted into generic dictionary as expected by parser node.
-        """
-
-        if point_1_name is None:
-            point_1_name = self.DEFAULT_FOCUS_POINT_1
-        if point_2_name is None:
-            point_2_name = self.DEFAULT_FOCUS_POINT_2
-
-        point_1 = keypoints[point_1_name]["position"]
-        point_2 = keypoints[point_2_name]["position"]
-        x_diff = abs(point_1[0] - point_2[0])
-        y_diff = abs(point_1[1] - point_2[1])
-        midpoint_x = max(point_1[0], point_2[0]) - (x_diff / 2)
-        midpoint_y = max(point_1[1], point_2[1]) - (y_diff / 2)
-        proximity_x = abs((midpoint_x - point_1[0]) / x_diff)
-        proximity_y = abs((midpoint_y - point_1[1]) / x_diff)
-
-        # Uncomment the following to have results logged to the console.
-        # print("Offset Mid\nPoint 1: %s @ %s, Point 2: %s @ %s, Mid-Point: %s, Proximity Score: %s" %
-        #               (point_1_name, str(point_1), point_2_name, str(point_2), str((midpoint_x, midpoint_y)),
-        #                str((proximity_x + proximity_y) / 2)))
-
-        return self.create_return_dictionary(x=midpoint_x, y=midpoint_y,
-                                             proximity_value=(proximity_x + proximity_y) / 2)
-
-    def centroid(self, keypoints, point_list1=None, point_list2=None):
-        """
-        Returns the mean x,y coordinates as a midpoint from a list of specified point names.
-        Defaults to entire part map.
-
-        Args:
-            keypoints(dict): A dictionary of all pose keypoints.
-            point_list1(list[str]): A list of keypoint position names present in the part map.
-            point_list2: Not Used.
-
-        Returns:
-            dict: x,y coordinates of the calculated centroid midpoint, formatted into generic dictionary
-                as expected by parser node.
-        """
-        if point_list1 is None:
-            point_list1 = PART_MAP.values()
-        x_list = []
-        y_list = []
-        for point in point_list1:
-            if point in PART_MAP.values():
-                x_list.append(keypoints[point]["position"][0])
-                y_list.append(keypoints[point]["position"][1])
-        midpoint = (float(np.mean(x_list)), float(np.mean(y_list)))
-        PoseMetrics.centroid_history.insert(0, {"midpoint": {"position": (midpoint[0], midpoint[1])},
-                                         "timestamp": time.now()})
-
-        # Uncomment the following to have results logged to the console.
-        # print("Centroid\nMidpoint: %s" % str(midpoint))
-
-        return self.create_return_dictionary(x=midpoint[0], y=midpoint[1])
-
-    def centroid_movement_speed(self, unused1=None, unused2=None, unused3=None):
-        """
-        Returns the average speed for the centroid location according to history list. Arguments are not used
-        and only exist to conform to the metric function dictionary for creating generic calls.
-
-        Args:
-            unused1: Not Used.
-            unused2: Not Used.
-            unused3: Not Used.
-
-        Returns:
-            dict: The average movement speed of the calculated centroid, formatted into generic dictionary as
-                expected by parser node.
-        """
-        avg_speed =self.average_speed_of_point("midpoint")
-        return self.create_return_dictionary(uncategorized_data=avg_speed)
-
-    def avg_speed_of_points(self, keypoints=None, point_list=(DEFAULT_FOCUS_POINT_1, DEFAULT_FOCUS_POINT_2),
-                            second=None):
-        """
-        Computes the average speed of one or more keypoints using recorded history.
-
-        Args:
-            point_list(list[str]): A list of keypoint names to measure.
-            keypoints: Not Used.
-            second: Not Used.
-
-        Returns:
-            dict[str, float]: Dictionary of average speed of each point requested.
-        """
-        speed_dict = {}
-        if point_list is None:
-            point_list = PART_MAP.values()
-        for point in point_list:
-            if point in PART_MAP.values():
-                speed_dict[point] = self.average_speed_of_point(point)
-
-        # Uncomment the following to have results logged to the console.
-        # print("Average Speeds\n%s" % str(speed_dict))
-
-        return self.create_return_dictionary(uncategorized_data=speed_dict)
-
-    @staticmethod
-    def get_angle(base_point, outer_point):
-        """
-        Helper method for calculating angle between two points.
-
-        Args:
-            base_point(tuple[float, float]): First point
-            outer_point(tuple[float, float]): Second point
-
-        Returns:
-            float: Angle given two points in degrees.
-        """
-
-        if outer_point[0] > base_point[0]:
-            x = outer_point[0] - base_point[0]
-        else:
-            x = base_point[0] - outer_point[0]
-        if outer_point[1] > base_point[1]:
-            y = outer_point[1] - base_point[1]
-        else:
-            y = base_point[1] - outer_point[1]
-
-        return math.degrees(math.atan(y / x))
-
-    @staticmethod
-    def absolute_speed(point_name, keypoints_a, keypoints_b):
-        """
-        Quickly calculates the absolute velocity between two sets of x,y co-ordinates with given timestamps.
-        Args:
-            point_name(str): Name of the point to measure.
-            keypoints_a(dict): Dictionary of keypoints for point A.
-            keypoints_b(dict): Dictionary of keypoints for point B.
-
-        Returns:
-            float: Velocity for movement between two points irrespective of direction.
-        """
-        abs_speed = 0.0
-        if point_name in PART_MAP.values() or point_name == "midpoint":
-            abs_speed = np.sqrt((abs(keypoints_a[point_name][0] - keypoints_b[point_name][0]) ** 2) +
-                                (abs(keypoints_a[point_name][1] - keypoints_b[point_name][1]) ** 2)) / \
-                        abs(keypoints_b["timestamp"].to_sec() - keypoints_a["timestamp"].to_sec())
-        return abs_speed
-
-    def average_speed_of_point(self, point_name):
-        """
-        Calculate the overage speed for a point based on history of keypoints.
-
-        Args:
-            point_name(str): Name of keypoint to measure.
-
-        Returns:
-            float: Average speed of a point over our history irrespetive of direction.
-        """
-        unreadable_entries = 0
-        if point_name is not None and point_name == "midpoint":
-            history = PoseMetrics.centroid_history
-        else:
-            history = PoseMetrics.history
-        avg_speed = 0.0
-        previous_keypoints = None
-        if len(history) >= 2 and point_name is not None and (point_name in PART_MAP.values() or
-                                                             point_name == "midpoint"):
-            for keypoints in history:
-                if previous_keypoints is not None:
-                    # Wrap the call in a try, that way if a keypoint is "None" we dont crash and can count the number
-                    # of spoiled entries and account for it in our averages.
-                    try:
-                        avg_speed += PoseMetrics.absolute_speed(point_name, keypoints, previous_keypoints)
-                    except TypeError:
-                        unreadable_entries += 1
-                previous_keypoints = keypoints
-            if unreadable_entries >= len(history) - 2:
-                return 0
-            avg_speed /= (len(history) - unreadable_entries)
-        return avg_speed
-
-    def positional_demo(self, keypoints, first=None, second=None):
-        """
-        Measures horizontal angle between two points and logs when the angle passes between a threshold angle.
-        Logs results to console as True/False based on user interaction.
-
-        Args:
-            keypoints(dict): Parsed posenet dictionary of key-points.
-            first: Not Used.
-            second: Not Used.
-
-        """
-        if keypoints[self.POSITION_BASE]["score"] > MINIMUM_CONFIDENCE and \
-                keypoints[self.POSITION_OUTER]["score"] > MINIMUM_CONFIDENCE:
-
-            angle_horizontal = PoseMetrics.get_angle(keypoints[self.POSITION_BASE]["position"],
-                                                     keypoints[self.POSITION_OUTER]["position"])
-            current_angle = True if angle_horizontal > self.ANGLE_THRESHOLD else False
-            if self.previous_angle is None:
-                self.previous_angle = not current_angle
-            if self.previous_angle != current_angle:
-                print(" Over %s degrees?: %s | Confidence = %s:%s | Angle = %s",
-                              self.ANGLE_THRESHOLD, current_angle, keypoints[self.POSITION_BASE]["score"],
-                              keypoints[self.POSITION_OUTER]["score"], angle_horizontal)
-            self.previous_angle = current_angle
-        return None
-
-    def simulation_pose_demo(self, keypoints, first=None, second=None):
-        """
-        Midpoint metric for simulation demo. Monitors right wrist in relation to middle point between nose and knees.
-        Logs locations of key-points to console and forwards message to simulator.
-
-        Args:
-            keypoints(dict): A dictionary of parsed posenet key-points.
-            first: Not Used.
-            second: Not Used.
-
-        """
-        ret_dict = None
-        # Check the confidence in all points required is above our threshold.
-        if keypoints["nose"]["score"] > MINIMUM_CONFIDENCE and \
-                keypoints["rightKnee"]["score"] > MINIMUM_CONFIDENCE and \
-                keypoints["leftKnee"]["score"] > MINIMUM_CONFIDENCE and \
-                keypoints["rightWrist"]["score"] > MINIMUM_CONFIDENCE:
-            midpoint_y = (((keypoints["leftKnee"]["position"][1] + keypoints["rightKnee"]["position"][1]) / 2) +
-                          keypoints["nose"]["position"][1]) / 2
-            # Y axis is inverted, assign bool accordingly, Lower is larger, Higher is smaller
-            above = False if keypoints["rightWrist"]["position"][1] > midpoint_y else True
-            print(
-                "High = %s, midpoint = %s, wrist_y = %s" % (above, midpoint_y, keypoints["rightWrist"]["position"][1]))
-            if self.high is None:
-                self.high = not above
-            if self.high != above:
-                print("Switch hover mode")
-                print("High = %s, midpoint = %s, wrist_y = %s" % (
-                    above, midpoint_y, keypoints["rightWrist"]["position"][1]))
-                # Statically defined heights for drone locations for demo purposes.
-                if above:
-                    ret_dict = self.create_return_dictionary(x=0, y=0, z=3)
-                else:
-                    ret_dict = self.create_return_dictionary(x=0, y=0, z=1)
-            self.high = above
-        else:
-            # Log keypoint data if confidence did not meet threshold.
-            print("nose = %s, %s, knee1 = %s, %s, knee2 = %s, %s, wrist = %s, %s" % (keypoints["nose"]["score"],
-                                                                                             keypoints["nose"][
-                                                                                                 "position"],
-                                                                                             keypoints["rightKnee"][
-                                                                                                 "score"],
-                                                                                             keypoints["rightKnee"][
-                                                                                                 "position"],
-                                                                                             keypoints["leftKnee"][
-                                                                                                 "score"],
-                                                                                             keypoints["leftKnee"][
-                                                                                                 "position"],
-                                                                                             keypoints["rightWrist"][
-                                                                                                 "score"],
-                                                                                             keypoints["rightWrist"][
-                                                                                                 "position"]))
-        return ret_dict
-
-    def create_return_dictionary(self, x=default_x, y=default_y, z=default_z,
-                                 rotation_x=default_rotation_x, rotation_y=default_rotation_y,
-                                 rotation_z=default_rotation_z, rotation_w=default_rotation_w,
-                                 velocity_x=default_velocity_x, velocity_y=default_velocity_y,
-                                 velocity_z=default_velocity_z,
-                                 velocity_angular_x=default_velocity_angular_x,
-                                 velocity_angular_y=default_velocity_angular_y,
-                                 velocity_angular_z=default_velocity_angular_z,
-                                 acceleration_linear_x=default_acceleration_linear_x,
-                                 acceleration_linear_y=default_acceleration_linear_y,
-                                 acceleration_linear_z=default_acceleration_linear_z,
-                                 acceleration_angular_x=default_acceleration_angular_x,
-                                 acceleration_angular_y=default_acceleration_angular_y,
-                                 acceleration_angular_z=default_acceleration_angular_z,
-                                 proximity_value=None, uncategorized_data=None):
-        """
-        Creates a generically formatted dictionary based on any given values, filling unspecified parameters with
-        predefined default values. This is used to create return variables for metrics so that calling metric functions
-        is greatly simplified and more extensible.
-
-        Args:
-            x: x Location Co-ordinates.
-            y: y Location Co-ordinates.
-            z: z Location Co-ordinates.
-            rotation_x: x rotation value.
-            rotation_y: y rotation value.
-            rotation_z: z rotation value.
-            rotation_w: w rotation value.
-            velocity_x: x linear velocity.
-            velocity_y: y linear velocity.
-            velocity_z: z linear velocity.
-            velocity_angular_x: x angular velocity.
-            velocity_angular_y: y angular velocity.
-            velocity_angular_z: z angular velocity.
-            acceleration_linear_x: x linear acceleration.
-            acceleration_linear_y: y linear acceleration.
-            acceleration_linear_z: z linear acceleration.
-            acceleration_angular_x: x angular acceleration.
-            acceleration_angular_y: y angular acceleration.
-            acceleration_angular_z: z angular acceleration.
-            proximity_value: Value between 0-1 corresponding to drones proximity to a left or right keypoint.
-            uncategorized_data: Data not directly related to Drone parameters, eg. Average undirected speed of point(s).
-
-        Returns:
-            dict: The dictionary of all these values, populated with defaults for unspecified values.
-        """
-        dict_of_points = {
-            "x": x,
-            "y": y,
-            "z": z,
-            "rotation_x": rotation_x,
-            "rotation_y": rotation_y,
-            "rotation_z": rotation_z,
-            "rotation_w": rotation_w,
-            "velocity_x": velocity_x,
-            "velocity_y": velocity_y,
-            "velocity_z": velocity_z,
-            "velocity_angular_x": velocity_angular_x,
-            "velocity_angular_y": velocity_angular_y,
-            "velocity_angular_z": velocity_angular_z,
-            "acceleration_linear_x": acceleration_linear_x,
-            "acceleration_linear_y": acceleration_linear_y,
-            "acceleration_linear_z": acceleration_linear_z,
-            "acceleration_angular_x": acceleration_angular_x,
-            "acceleration_angular_y": acceleration_angular_y,
-            "acceleration_angular_z": acceleration_angular_z,
-            "proximity": proximity_value,
-            "uncategorized_data": uncategorized_data
-        }
-        return dict_of_points
-
-    # Helper dictionary for selecting functions for metrics.
-    metric_list = {
-        "positional_demo": positional_demo,
-        "demo_metric": simulation_pose_demo,
-        "offset_midpoints": midpoint,
-        "centroid": centroid_movement_speed,
-        "centroid_coords": centroid,
-        "average_speed_of_points": avg_speed_of_points
-    }
-
-    def execute_metric(self, metric_name, keypoint_dict, first_list=None, second_list=None):
-        """
-        Executes a metric given its name. Always calls the metric function from the metric list with 3 arguments.
-
-        Args:
-            metric_name(str): Name of the metric defined in the dictionary.
-            keypoint_dict(dict): Dictionary of current keypoints to be used.
-            first_list(list): Optional list required by some metrics.
-            second_list(list): Optional list required by some metrics.
-
-        Returns:
-            The result of the metric called.
-        """
-        try:
-            for key in PART_MAP.values():
-                if key not in keypoint_dict.keys():
-                    return None
-                if key != "timestamp" and (keypoint_dict[key] is None or keypoint_dict[key]["score"] is None or
-                                           keypoint_dict[key]["score"] < MINIMUM_CONFIDENCE):
-                    return None
-            # Call the appropriate function from the metric_list dictionary with the name as the key.
-            results = self.metric_list[metric_name](self, keypoint_dict, first_list, second_list)
-        except KeyError:
-            return None
-        return results
-
-
-if __name__ == '__main__':
-    # Startup for node.
-    # TODO - These two lines are how to create the pose parser object and start the server.
-    node = PoseParserNode.instance()
-    node.listener()
+#!/usr/bin/python3
+import math
+import json
+import queue
+import threading
+from datetime import datetime as time
+from time import perf_counter
+from socket_class import SocketManager
+from pose_format import POSE_RECORD, pose_records, split_frames
+from pose_history import PoseHistory
+from tracker import PoseTracker
+from recorder import PoseRecorder
+from sharding import ShardPool, report_stats
+from output_stage import OutputStage, LocalSink
+from frame_rate import CapacityEstimator
+from stats import STATS
+
+import numpy as np
+
+# Confidence score required to validate a keypoint set.
+MINIMUM_CONFIDENCE = 0.2
+
+# Mapping of parts to array as per posenet keypoints.
+PART_MAP = {
+    0: "nose",
+    1: "leftEye",
+    2: "rightEye",
+    3: "leftEar",
+    4: "rightEar",
+    5: "leftShoulder",
+    6: "rightShoulder",
+    7: "leftElbow",
+    8: "rightElbow",
+    9: "leftWrist",
+    10: "rightWrist",
+    11: "leftHip",
+    12: "rightHip",
+    13: "leftKnee",
+    14: "rightKnee",
+    15: "leftAnkle",
+    16: "rightAnkle"
+}  # A 'timestamp' field is added to dictionary when parsed.
+
+# Index of each part in the keypoint array.
+PART_INDEX = {name: index for index, name in PART_MAP.items()}
+# Index of the centroid of all keypoints in kinematics results, after the keypoints themselves.
+CENTROID_INDEX = len(PART_MAP)
+# Bit of each keypoint in a keypoint mask, in part map order.
+KEYPOINT_BITS = 1 << np.arange(len(PART_MAP), dtype=np.int64)
+
+
+def keypoint_mask(*names):
+    """
+    Args:
+        names(str): Names of keypoints in the part map, all keypoints if none are given.
+
+    Returns:
+        int: Mask with the bit of each named keypoint set.
+    """
+    if len(names) == 0:
+        return (1 << len(PART_MAP)) - 1
+    mask = 0
+    for name in names:
+        mask |= 1 << PART_INDEX[name]
+    return mask
+
+# The topic the simulator is subscribed to.
+
+
+class PoseFrame:
+    """
+    Compact representation of one parsed pose.
+    Keypoints are held in a (17, 3) array of x, y and score in part map order with a precomputed mask of the
+    keypoints above MINIMUM_CONFIDENCE. Indexing a frame by part name returns the same dictionary as the
+    older parsed dictionaries, eg. frame["rightWrist"]["position"][1], so existing code keeps working.
+    """
+    __slots__ = ("keypoints", "confident", "timestamp")
+
+    def __init__(self, keypoints, timestamp=None):
+        """
+        Args:
+            keypoints(np.ndarray): Array of x, y and score for each keypoint in part map order.
+            timestamp: Time the pose was captured or received.
+        """
+        self.keypoints = np.array(keypoints, dtype=np.float64).reshape(len(PART_MAP), 3)
+        self.confident = self.keypoints[:, 2] > MINIMUM_CONFIDENCE
+        self.timestamp = timestamp
+
+    @classmethod
+    def from_posenet(cls, keypoints, timestamp=None):
+        """
+        Args:
+            keypoints(list[dict]): Keypoints as sent from posenet.
+            timestamp: Time the pose was captured or received.
+
+        Returns:
+            PoseFrame: The parsed frame.
+        """
+        return cls([(point["position"]["x"], point["position"]["y"], point["score"]) for point in keypoints],
+                   timestamp)
+
+    @classmethod
+    def from_dict(cls, pose_dict):
+        """
+        Args:
+            pose_dict(dict): Parsed dictionary of keypoints as created by older versions of convert_to_dictionary.
+
+        Returns:
+            PoseFrame: The parsed frame.
+
+        Raises:
+            KeyError: If a keypoint is missing.
+            TypeError: If a position is not an x, y tuple.
+        """
+        return cls([pose_dict[name]["position"] + (pose_dict[name]["score"],) for name in PART_MAP.values()],
+                   pose_dict.get("timestamp"))
+
+    @property
+    def positions(self):
+        """
+        np.ndarray: (17, 2) view of keypoint x, y positions.
+        """
+        return self.keypoints[:, :2]
+
+    @property
+    def scores(self):
+        """
+        np.ndarray: View of the score of each keypoint.
+        """
+        return self.keypoints[:, 2]
+
+    def position(self, name):
+        """
+        Args:
+            name(str): Name of a keypoint in the part map.
+
+        Returns:
+            tuple[float, float]: x, y position of the keypoint.
+        """
+        index = PART_INDEX[name]
+        return float(self.keypoints[index, 0]), float(self.keypoints[index, 1])
+
+    def score(self, name):
+        """
+        Args:
+            name(str): Name of a keypoint in the part map.
+
+        Returns:
+            float: Confidence score of the keypoint.
+        """
+        return float(self.keypoints[PART_INDEX[name], 2])
+
+    def is_confident(self, *names):
+        """
+        Args:
+            names(str): Names of keypoints in the part map, all keypoints if none are given.
+
+        Returns:
+            bool: Whether every named keypoint is above MINIMUM_CONFIDENCE.
+        """
+        if len(names) == 0:
+            return bool(self.confident.all())
+        return bool(self.confident[[PART_INDEX[name] for name in names]].all())
+
+    def keys(self):
+        return list(PART_MAP.values()) + ["timestamp"]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __contains__(self, name):
+        return name in PART_INDEX or name == "timestamp"
+
+    def __getitem__(self, name):
+        if name == "timestamp":
+            return self.timestamp
+        x, y, score = self.keypoints[PART_INDEX[name]].tolist()
+        return {"position": (x, y), "score": score}
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: The frame as a parsed dictionary of keypoints with a timestamp.
+        """
+        pose_dict = {PART_MAP[i]: {"position": (x, y), "score": score}
+                     for i, (x, y, score) in enumerate(self.keypoints.tolist())}
+        pose_dict["timestamp"] = self.timestamp
+        return pose_dict
+
+
+def timestamp_seconds(timestamp):
+    """
+    Args:
+        timestamp(datetime | float): A timestamp as a datetime or in seconds, None for now.
+
+    Returns:
+        float: The timestamp in seconds.
+    """
+    if timestamp is None:
+        return time.now().timestamp()
+    if isinstance(timestamp, time):
+        return timestamp.timestamp()
+    return float(timestamp)
+
+
+def as_pose_frame(keypoints):
+    """
+    Args:
+        keypoints(PoseFrame | dict): A pose frame or a parsed dictionary of keypoints.
+
+    Returns:
+        PoseFrame: The keypoints as a pose frame.
+    """
+    if isinstance(keypoints, PoseFrame):
+        return keypoints
+    return PoseFrame.from_dict(keypoints)
+
+
+def run_shard(records_queue, stats_queue, default_metric, minimum_confidence, output_sink, output_max_rate,
+              output_deadband, freshness_deadline):
+    """
+    Worker process of a multi-stream parser, see sharding.ShardPool. Runs the metric on every frame of the streams
+    routed to it, each person with their own metric state, until it takes None from its queue. Results are
+    delivered through the worker's own output stage, and the worker's stats are sent back to the parent.
+
+    Args:
+        records_queue(multiprocessing.Queue): Queue of arrays of POSE_RECORD.
+        stats_queue(multiprocessing.Queue): Queue the worker's stats snapshots are sent back through.
+        default_metric(str): Name of the metric to run.
+        minimum_confidence(float): Confidence score required of keypoints.
+        output_sink: Sink results are delivered through, None for a LocalSink.
+        output_max_rate(float): Deliveries per second at most.
+        output_deadband(float): Largest change in a result that is not delivered.
+        freshness_deadline(float): Age in seconds past which frames are dropped, None to keep every frame.
+    """
+    global MINIMUM_CONFIDENCE
+    MINIMUM_CONFIDENCE = minimum_confidence
+    PoseParserNode.DEFAULT_METRIC = default_metric
+    PoseParserNode.OUTPUT_SINK = output_sink
+    PoseParserNode.OUTPUT_MAX_RATE = output_max_rate
+    PoseParserNode.OUTPUT_DEADBAND = output_deadband
+    PoseParserNode.FRESHNESS_DEADLINE = freshness_deadline
+    node = PoseParserNode.instance()
+    node.start_output()
+    next_report = perf_counter() + ShardPool.STATS_INTERVAL
+    try:
+        while True:
+            if perf_counter() >= next_report:
+                report_stats(stats_queue)
+                next_report = perf_counter() + ShardPool.STATS_INTERVAL
+            try:
+                records = records_queue.get(timeout=ShardPool.STATS_INTERVAL)
+            except queue.Empty:
+                continue
+            if records is None:
+                return
+            for frame in split_frames(records):
+                node.track_frame(frame)
+    finally:
+        node.output.stop()
+        report_stats(stats_queue)
+
+
+class PoseParserNode:
+    """
+    ROSpy Node for parsing data from posenet. Adds timestamp to notate when message was received.
+    """
+    _instance = None
+    # Options for default metric are any one string from the following:
+    # "demo_metric", "offset_midpoints", "centroid", "average_speed_of_points", "positional_demo", "centroid_coords"
+    DEFAULT_METRIC = "demo_metric"
+    # Path to record every received pose to for later replay, None to not record.
+    RECORD_PATH = None
+    # Worker processes the streams of pose records are spread across by stream id, 0 to handle every stream in
+    # this process.
+    SHARD_WORKERS = 0
+    # Sink results are delivered through, eg. output_stage.UdpSink, None to keep them in a LocalSink.
+    OUTPUT_SINK = None
+    OUTPUT_MAX_RATE = OutputStage.DEFAULT_MAX_RATE
+    OUTPUT_DEADBAND = OutputStage.DEFAULT_DEADBAND
+    # Seconds after capture past which a frame is too old to act on and is dropped before the metric runs, None to
+    # keep every frame. Poser and the parser must share a clock, as they do on one machine.
+    FRESHNESS_DEADLINE = 0.25
+    # Seconds the tracker of a stream, with the metric state of everyone in it, is kept after the stream's last frame.
+    TRACKER_EXPIRY = 10.0
+    metrics = None
+    metric_functions = None
+    socket_manager = None
+    # Tracker of the people in each stream of pose records, by stream id.
+    trackers = None
+    trackers_lock = threading.Lock()
+    recorder = None
+    # Worker processes handling the streams when SHARD_WORKERS is set.
+    shards = None
+    # Output stage publisher() submits results to, results are discarded while it is None.
+    output = None
+    # Estimate of how often each stream should send frames, returned to the sender of every message.
+    capacity = None
+
+    def __init__(self):
+        raise TypeError("Class is singleton, call instance() not init")
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            cls._instance = cls.__new__(cls)
+            cls.metrics = PoseMetrics(active_metrics=(cls.DEFAULT_METRIC,))
+            cls.metric_functions = PoseMetrics.metric_list.keys()
+            cls.trackers = {}
+            cls.capacity = CapacityEstimator(PoseMetrics.metric_sample_rates.get(cls.DEFAULT_METRIC, 0))
+        return cls._instance
+
+    @classmethod
+    def create_metrics(cls):
+        """
+        Returns:
+            PoseMetrics: Metric state for a newly tracked person, running only the default metric.
+        """
+        return PoseMetrics(active_metrics=(cls.DEFAULT_METRIC,))
+
+    @classmethod
+    def start_output(cls):
+        """
+        Creates and starts the output stage results are delivered through, if not already running.
+        """
+        if cls.output is None:
+            sink = LocalSink() if cls.OUTPUT_SINK is None else cls.OUTPUT_SINK
+            cls.output = OutputStage(sink, cls.OUTPUT_MAX_RATE, cls.OUTPUT_DEADBAND)
+            cls.output.start()
+            STATS.register_gauges("output", cls.output.counters)
+
+    def convert_to_dictionary(self, data, metrics=None, timestamp=None):
+        """
+        Takes data recorded from posenet and converts it into a PoseFrame, which can be indexed like a python
+        dictionary with sensible keys.
+
+        Args:
+            data(list | np.ndarray): A list sent from posenet, or a (17, 3) array of x, y and score per keypoint.
+            metrics(PoseMetrics): Metrics whose history the frame is added to, defaults to the node metrics.
+            timestamp(datetime | float): Time the frame was captured, defaults to now.
+
+        Returns:
+            PoseFrame: Pose data for each keypoint including (x, y) locations and confidence score.
+        """
+        with STATS.timer("parser_convert"):
+            if timestamp is None:
+                timestamp = time.now()
+            if isinstance(data, np.ndarray):
+                # Binary frames arrive as an array and are used as is.
+                pose_frame = PoseFrame(data, timestamp)
+            else:
+                pose_frame = PoseFrame.from_posenet(data, timestamp)
+            (PoseParserNode.metrics if metrics is None else metrics).register_keypoints(pose_frame)
+        return pose_frame
+
+    def callback(self, data):
+        """
+        Callback function for ROS pub/sub model.
+        Converts message to dictionary and runs currently selected metric.
+
+        Batches of pose records are handled in one call. Every pose of a frame is matched to a tracked person
+        and the metric runs on each person with their own history, so people are never mixed up when posenet
+        returns them in a different order. With shard workers running, the records of each stream are handed to
+        the worker owning the stream instead, and as frames are then handled in other processes they are not timed
+        for the capacity estimate, leaving the rate the metric needs as the target.
+
+        Args:
+            data: Data received from ROS subscription, a posenet pose dictionary or an array of pose records.
+
+        """
+        # points_data = json.loads(data)
+
+        if isinstance(data, np.ndarray) and data.dtype == POSE_RECORD:
+            if self.recorder is not None:
+                self.recorder.record(data)
+            frames = split_frames(data)
+            STATS.increment("parser_frames_received", len(frames))
+            if self.shards is not None:
+                dropped = self.shards.dispatch(data)
+                if dropped:
+                    STATS.increment("parser_poses_dropped", dropped)
+                return
+            started = perf_counter()
+            for frame in frames:
+                self.track_frame(frame)
+            if len(frames) > 0:
+                self.capacity.record(int(data["stream_id"][0]), len(frames), perf_counter() - started)
+            return
+        STATS.increment("parser_frames_received")
+        started = perf_counter()
+        points_data = data
+        if self.recorder is not None:
+            self.recorder.record(pose_records([points_data]))
+        keypoints = self.convert_to_dictionary(points_data["keypoints"])
+        self.process_keypoints(keypoints)
+        self.capacity.record(0, 1, perf_counter() - started)
+
+    def track_frame(self, records):
+        """
+        Matches the poses of one frame to the people tracked in its stream and runs the metric for each of them,
+        timing their motion by the frame's capture time. Frames captured longer than FRESHNESS_DEADLINE ago are
+        dropped and counted instead.
+
+        Args:
+            records(np.ndarray): Array of POSE_RECORD holding every pose of a single frame.
+        """
+        timestamp = float(records["timestamp"][0])
+        if self.FRESHNESS_DEADLINE is not None and time.now().timestamp() - timestamp > self.FRESHNESS_DEADLINE:
+            STATS.increment("parser_frames_stale")
+            return
+        stream_id = int(records["stream_id"][0])
+        with PoseParserNode.trackers_lock:
+            self.expire_trackers(timestamp)
+            tracker = PoseParserNode.trackers.get(stream_id)
+            if tracker is None:
+                tracker = PoseTracker(self.create_metrics, minimum_confidence=MINIMUM_CONFIDENCE)
+                PoseParserNode.trackers[stream_id] = tracker
+        with tracker.lock:
+            tracks = tracker.update(records["keypoints"], timestamp)
+            for track, keypoints in zip(tracks, records["keypoints"]):
+                self.process_keypoints(self.convert_to_dictionary(keypoints, track.metrics, timestamp), track.metrics,
+                                       track.track_id)
+
+    @classmethod
+    def expire_trackers(cls, timestamp):
+        """
+        Drops the trackers of streams that have sent no frame within TRACKER_EXPIRY, so streams that have ended do
+        not keep their tracks forever. Called with trackers_lock held.
+
+        Args:
+            timestamp(float): Capture time in seconds of the frame being handled.
+        """
+        for stream_id in [stream_id for stream_id, tracker in cls.trackers.items()
+                          if tracker.last_seen is not None and timestamp - tracker.last_seen > cls.TRACKER_EXPIRY]:
+            del cls.trackers[stream_id]
+
+    def process_keypoints(self, keypoints, metrics=None, track_id=None):
+        """
+        Runs the currently selected metric on parsed keypoints and publishes the result.
+
+        Args:
+            keypoints(PoseFrame): Parsed posenet key-points.
+            metrics(PoseMetrics): Metric state of the person the keypoints belong to, defaults to the node metrics.
+            track_id(int): Id of the tracked person, None when poses are not tracked.
+        """
+        if metrics is None:
+            metrics = PoseParserNode.metrics
+        if self.DEFAULT_METRIC in PoseParserNode.metric_functions:
+            trajectory_points = metrics.execute_metric(self.DEFAULT_METRIC, keypoints)
+            if trajectory_points is not None:
+                with STATS.timer("parser_publish"):
+                    self.publisher(trajectory_points, track_id)
+
+
+    def listener(self):
+        """
+        Creates and starts the socket server, recording received poses when RECORD_PATH is set and starting
+        SHARD_WORKERS worker processes to handle the streams when set, otherwise the output stage.
+        """
+        if self.RECORD_PATH is not None and self.recorder is None:
+            PoseParserNode.recorder = PoseRecorder(self.RECORD_PATH)
+            self.recorder.start()
+            STATS.register_gauges("recorder", self.recorder.counters)
+        if self.SHARD_WORKERS and self.shards is None:
+            PoseParserNode.shards = ShardPool(run_shard, (self.DEFAULT_METRIC, MINIMUM_CONFIDENCE, self.OUTPUT_SINK,
+                                                          self.OUTPUT_MAX_RATE, self.OUTPUT_DEADBAND,
+                                                          self.FRESHNESS_DEADLINE),
+                                              workers=self.SHARD_WORKERS)
+            self.shards.start()
+            STATS.register_gauges("shards", self.shards.counters)
+            STATS.register_snapshots(self.shards.snapshots)
+        elif self.shards is None:
+            self.start_output()
+        STATS.register_gauges("capacity", self.capacity.counters)
+        if self.socket_manager is None:
+            self.socket_manager = SocketManager(self, server=True, allow_pickle=False,
+                                                server_mode=SocketManager.SERVER_MODE_SELECTOR)
+        self.socket_manager.listen()
+
+    def got_message(self, address, message):
+        """
+        Callback function for when a message is received over sockets.
+
+        Args:
+            address: The address of the sender.
+            message(str): The message received.
+
+        Returns:
+            dict: Reply to the sender, "interval" holding the seconds each stream should leave between frames.
+        """
+        self.callback(message)
+        # print(message)
+        return {"interval": self.capacity.target_interval()}
+
+    def publisher(self, trajectory_parameters, track_id=None):
+        """
+        Publishes metric results for the simulator through the output stage, which delivers them from its own
+        thread at a limited rate, coalescing bursts and suppressing results that have not changed.
+
+        Args:
+            trajectory_parameters(dict): A dictionary containing all data fields required to build a Trajectory message.
+            track_id(int): Id of the tracked person the parameters were measured from, if tracked.
+        """
+        if self.output is not None:
+            self.output.submit(trajectory_parameters, track_id)
+
+    def test_metrics(self, keypoints):
+        """
+        Calls all three advanced metrics with the keypoint data for viewing logs of responses for metrics.
+        Uncommenting the print lines in these metrics enables the console log functionality.
+        This is more of an example of how to call metrics than functional code.
+
+        Returns:
+            dict: The result of each metric by name.
+        """
+        return PoseParserNode.metrics.execute_metrics(("offset_midpoints", "centroid", "average_speed_of_points"),
+                                                      keypoints)
+
+
+class PoseMetrics:
+    """
+    Container class for pose metrics.
+    Metrics designed to be called external to this class must conform to the function layout that follows even if the
+    metric does not require them as the convenience method selector expects 3 arguments regardless of if they are used
+    or not.  "def metric(dict, list, list)"
+    The variable dictionary "metric_list" can contain a string name and function value to ease calling of metrics.
+    Metrics receive keypoints as a PoseFrame, parsed dictionaries are converted by execute_metric.
+
+    Each metric declares the intermediate quantities it reads in "metric_requirements". Quantities are computed on
+    first use through quantity() and cached until the next frame, and the histories behind them are only fed while
+    an active metric needs them, so frames only pay for what the active metrics use.
+    """
+    # Default Focus for the average_speed metric
+    DEFAULT_FOCUS_POINT_1 = "leftWrist"
+    DEFAULT_FOCUS_POINT_2 = "rightWrist"
+
+    # Default focus for angle threshold demo.
+    ANGLE_THRESHOLD = 15
+    POSITION_BASE = "rightShoulder"
+    POSITION_OUTER = "rightWrist"
+
+    # Number of samples to calculate averages from history.
+    DEFAULT_HISTORY_LENGTH = 50
+
+    # Whether demo_metric logs the key-points of every frame to the console, rather than only when switching mode.
+    LOG_FRAMES = False
+
+    # Default values for metric return properties.
+    default_x = 0.0
+    default_y = 0.0
+    default_z = 1.0
+    default_rotation_x = 0.0
+    default_rotation_y = 0.0
+    default_rotation_z = 0.0
+    default_rotation_w = 1.0
+    default_velocity_x = 1.0
+    default_velocity_y = 1.0
+    default_velocity_z = 1.0
+    default_velocity_angular_x = 1.0
+    default_velocity_angular_y = 1.0
+    default_velocity_angular_z = 1.0
+    default_acceleration_linear_x = 1.0
+    default_acceleration_linear_y = 1.0
+    default_acceleration_linear_z = 1.0
+    default_acceleration_angular_x = 1.0
+    default_acceleration_angular_y = 1.0
+    default_acceleration_angular_z = 1.0
+
+    def __init__(self, history_length=DEFAULT_HISTORY_LENGTH, active_metrics=None):
+        """
+        Args:
+            history_length(int): Number of samples kept to calculate averages from.
+            active_metrics(list[str]): Names of the metrics that will be run, defaults to every metric.
+                Other metrics are activated when first executed.
+        """
+        # Fixed capacity histories of past data for use in metric calculations.
+        self.history_length = history_length
+        self.history = PoseHistory(history_length)
+        self.centroid_history = PoseHistory(history_length, points=1)
+        self.active_metrics = set()
+        self.feeds = set()
+        self.__cache = {}
+        self.__cache_frame = None
+        # Last side of the angle threshold for positional_demo and hover mode for demo_metric.
+        self.previous_angle = None
+        self.high = None
+        self.activate(*(self.metric_list.keys() if active_metrics is None else active_metrics))
+
+    def activate(self, *metric_names):
+        """
+        Marks metrics as in use so the histories they read are fed from the next registered frame onwards.
+
+        Args:
+            *metric_names(str): Names of metrics in the metric list.
+        """
+        self.active_metrics.update(name for name in metric_names if name in self.metric_list)
+        self.feeds = {self.quantity_feeds[quantity] for name in self.active_metrics
+                      for quantity in self.metric_requirements[name] if quantity in self.quantity_feeds}
+
+    def quantity(self, name, keypoints=None):
+        """
+        Returns an intermediate quantity for a frame, computing it only the first time it is asked for.
+
+        Args:
+            name(str): Name of the quantity in the quantity list.
+            keypoints(PoseFrame): Frame the quantity is for, the result is not cached when not given.
+
+        Returns:
+            The value of the quantity.
+        """
+        if keypoints is None:
+            return self.quantity_list[name](self, keypoints)
+        if keypoints is not self.__cache_frame:
+            self.__cache = {}
+            self.__cache_frame = keypoints
+        if name not in self.__cache:
+            self.__cache[name] = self.quantity_list[name](self, keypoints)
+        return self.__cache[name]
+
+    def register_keypoints(self, keypoints):
+        """
+        Takes parsed pose data and adds it to the history list with timestamp.
+        Ideally, should only be called once, immediately after keypoints are parsed.
+
+        Args:
+            keypoints(PoseFrame | dict): Latest set of pose data as a pose frame or parsed dictionary.
+
+        """
+        try:
+            frame = as_pose_frame(keypoints)
+            # Quantities cached for an earlier frame are stale once the histories move on.
+            self.__cache_frame = None
+            if not self.feeds:
+                return True
+            timestamp = timestamp_seconds(frame.timestamp)
+            if "history" in self.feeds:
+                self.history.append(frame.positions, frame.confident, timestamp)
+            if "centroid_history" in self.feeds:
+                # Log history of calculated centroid.
+                self.centroid_history.append(self.quantity("centroid", frame), True, timestamp)
+            return True
+        except (KeyError, TypeError) as e:
+            print("Exception occured\n%s\nKeyPoints passed in:\n%s" % (str(e), str(keypoints)))
+            return False
+
+    def centroid_position(self, keypoints):
+        """
+        Args:
+            keypoints(PoseFrame): All pose keypoints.
+
+        Returns:
+            np.ndarray: Mean x, y position of every keypoint.
+        """
+        return keypoints.positions.mean(axis=0)
+
+    def focus_angle(self, keypoints):
+        """
+        Args:
+            keypoints(PoseFrame): All pose keypoints.
+
+        Returns:
+            float: Horizontal angle between POSITION_BASE and POSITION_OUTER in degrees.
+        """
+        return PoseMetrics.get_angle(keypoints.position(self.POSITION_BASE), keypoints.position(self.POSITION_OUTER))
+
+    def keypoint_motion(self, keypoints=None):
+        """
+        Args:
+            keypoints: Not Used.
+
+        Returns:
+            Kinematics: Mean motion of every keypoint over the history, read from its running sums.
+        """
+        return self.history.motion()
+
+    def centroid_motion(self, keypoints=None):
+        """
+        Args:
+            keypoints: Not Used.
+
+        Returns:
+            Kinematics: Mean motion of the centroid of all keypoints over the history.
+        """
+        return self.centroid_history.motion()
+
+    # Helper dictionary for selecting functions for intermediate quantities.
+    quantity_list = {
+        "centroid": centroid_position,
+        "angle": focus_angle,
+        "keypoint_motion": keypoint_motion,
+        "centroid_motion": centroid_motion
+    }
+
+    # History each quantity is derived from, only fed while an active metric requires the quantity.
+    quantity_feeds = {
+        "keypoint_motion": "history",
+        "centroid_motion": "centroid_history"
+    }
+
+    def motion_values(self, indexes, keypoints=None):
+        """
+        Averages the motion of a set of points into the velocity and acceleration fields of a metric result.
+        Positions are 2D so z velocity and acceleration are zero.
+
+        Args:
+            indexes(list[int]): Indexes of keypoints, or CENTROID_INDEX for the centroid of all keypoints.
+            keypoints(PoseFrame): Frame the motion is wanted for, used to reuse cached quantities.
+
+        Returns:
+            dict[str, float]: Keyword arguments for create_return_dictionary.
+        """
+        velocities = []
+        accelerations = []
+        keypoint_indexes = [index for index in indexes if index != CENTROID_INDEX]
+        if keypoint_indexes:
+            motion = self.quantity("keypoint_motion", keypoints)
+            velocities.append(motion.velocity[keypoint_indexes])
+            accelerations.append(motion.acceleration[keypoint_indexes])
+        if CENTROID_INDEX in indexes:
+            motion = self.quantity("centroid_motion", keypoints)
+            velocities.append(motion.velocity)
+            accelerations.append(motion.acceleration)
+        velocity = np.concatenate(velocities).mean(axis=0)
+        acceleration = np.concatenate(accelerations).mean(axis=0)
+        return {
+            "velocity_x": float(velocity[0]),
+            "velocity_y": float(velocity[1]),
+            "velocity_z": 0.0,
+            "acceleration_linear_x": float(acceleration[0]),
+            "acceleration_linear_y": float(acceleration[1]),
+            "acceleration_linear_z": 0.0
+        }
+
+    def midpoint(self, keypoints, point_1_name=DEFAULT_FOCUS_POINT_1, point_2_name=DEFAULT_FOCUS_POINT_2):
+        """
+        Finds the middle point between 2 x,y locations. Default points are left and right wrists.
+
+        Args:
+            keypoints(PoseFrame): All pose keypoints.
+            point_1_name(str): Name of keypoint 1 to use in metric.
+            point_2_name(str): Name of keypoint 2 to use in metric.
+
+        Returns:
+            dict: The midpoint x,y given two points and a score of between 0-1 based on proximity
+                to point 1 and 2 respectively, formatted into generic dictionary as expected by parser node.
+        """
+
+        if point_1_name is None:
+            point_1_name = self.DEFAULT_FOCUS_POINT_1
+        if point_2_name is None:
+            point_2_name = self.DEFAULT_FOCUS_POINT_2
+
+        point_1 = keypoints.position(point_1_name)
+        point_2 = keypoints.position(point_2_name)
+        x_diff = abs(point_1[0] - point_2[0])
+        y_diff = abs(point_1[1] - point_2[1])
+        midpoint_x = max(point_1[0], point_2[0]) - (x_diff / 2)
+        midpoint_y = max(point_1[1], point_2[1]) - (y_diff / 2)
+        proximity_x = abs((midpoint_x - point_1[0]) / x_diff)
+        proximity_y = abs((midpoint_y - point_1[1]) / x_diff)
+
+        # Uncomment the following to have results logged to the console.
+        # print("Offset Mid\nPoint 1: %s @ %s, Point 2: %s @ %s, Mid-Point: %s, Proximity Score: %s" %
+        #               (point_1_name, str(point_1), point_2_name, str(point_2), str((midpoint_x, midpoint_y)),
+        #                str((proximity_x + proximity_y) / 2)))
+
+        return self.create_return_dictionary(x=midpoint_x, y=midpoint_y,
+                                             proximity_value=(proximity_x + proximity_y) / 2,
+                                             **self.motion_values([PART_INDEX[point_1_name],
+                                                                   PART_INDEX[point_2_name]], keypoints))
+
+    def centroid(self, keypoints, point_list1=None, point_list2=None):
+        """
+        Returns the mean x,y coordinates as a midpoint from a list of specified point names.
+        Defaults to entire part map, in which case only the centroid history is read.
+
+        Args:
+            keypoints(PoseFrame): All pose keypoints.
+            point_list1(list[str]): A list of keypoint position names present in the part map.
+            point_list2: Not Used.
+
+        Returns:
+            dict: x,y coordinates of the calculated centroid midpoint, formatted into generic dictionary
+                as expected by parser node.
+        """
+        if point_list1 is None:
+            indexes = [CENTROID_INDEX]
+            mean = self.quantity("centroid", keypoints)
+        else:
+            indexes = [PART_INDEX[point] for point in point_list1 if point in PART_INDEX]
+            mean = keypoints.positions[indexes].mean(axis=0)
+            # The motion of listed points is read from the keypoint history, fed from the next frame onwards.
+            self.feeds.add(self.quantity_feeds["keypoint_motion"])
+        midpoint = (float(mean[0]), float(mean[1]))
+
+        # Uncomment the following to have results logged to the console.
+        # print("Centroid\nMidpoint: %s" % str(midpoint))
+
+        return self.create_return_dictionary(x=midpoint[0], y=midpoint[1], **self.motion_values(indexes, keypoints))
+
+    def centroid_movement_speed(self, unused1=None, unused2=None, unused3=None):
+        """
+        Returns the average speed for the centroid location according to history list. Arguments are not used
+        and only exist to conform to the metric function dictionary for creating generic calls.
+
+        Args:
+            unused1: Not Used.
+            unused2: Not Used.
+            unused3: Not Used.
+
+        Returns:
+            dict: The average movement speed of the calculated centroid, formatted into generic dictionary as
+                expected by parser node.
+        """
+        motion = self.quantity("centroid_motion", unused1)
+        return self.create_return_dictionary(uncategorized_data=float(motion.speed[0]),
+                                             **self.motion_values([CENTROID_INDEX], unused1))
+
+    def avg_speed_of_points(self, keypoints=None, point_list=(DEFAULT_FOCUS_POINT_1, DEFAULT_FOCUS_POINT_2),
+                            second=None):
+        """
+        Computes the average speed of one or more keypoints using recorded history.
+
+        Args:
+            point_list(list[str]): A list of keypoint names to measure.
+            keypoints: Not Used.
+            second: Not Used.
+
+        Returns:
+            dict[str, float]: Dictionary of average speed of each point requested.
+        """
+        motion = self.quantity("keypoint_motion", keypoints)
+        if point_list is None:
+            speed_dict = dict(zip(PART_MAP.values(), motion.speed.tolist()))
+        else:
+            speed_dict = {point: float(motion.speed[PART_INDEX[point]]) for point in point_list
+                          if point in PART_INDEX}
+        indexes = [PART_INDEX[point] for point in speed_dict]
+
+        # Uncomment the following to have results logged to the console.
+        # print("Average Speeds\n%s" % str(speed_dict))
+
+        return self.create_return_dictionary(uncategorized_data=speed_dict,
+                                             **self.motion_values(indexes, keypoints) if indexes else {})
+
+    @staticmethod
+    def get_angle(base_point, outer_point):
+        """
+        Helper method for calculating angle between two points.
+
+        Args:
+            base_point(tuple[float, float]): First point
+            outer_point(tuple[float, float]): Second point
+
+        Returns:
+            float: Angle given two points in degrees.
+        """
+
+        if outer_point[0] > base_point[0]:
+            x = outer_point[0] - base_point[0]
+        else:
+            x = base_point[0] - outer_point[0]
+        if outer_point[1] > base_point[1]:
+            y = outer_point[1] - base_point[1]
+        else:
+            y = base_point[1] - outer_point[1]
+
+        return math.degrees(math.atan(y / x))
+
+    @staticmethod
+    def absolute_speed(point_name, keypoints_a, keypoints_b):
+        """
+        Quickly calculates the absolute velocity between two sets of x,y co-ordinates with given timestamps.
+        Args:
+            point_name(str): Name of the point to measure.
+            keypoints_a(dict): Dictionary of x,y positions by point name for point A, with a "timestamp".
+            keypoints_b(dict): Dictionary of x,y positions by point name for point B, with a "timestamp".
+
+        Returns:
+            float: Velocity for movement between two points irrespective of direction.
+        """
+        abs_speed = 0.0
+        if point_name in PART_MAP.values() or point_name == "midpoint":
+            abs_speed = np.sqrt((abs(keypoints_a[point_name][0] - keypoints_b[point_name][0]) ** 2) +
+                                (abs(keypoints_a[point_name][1] - keypoints_b[point_name][1]) ** 2)) / \
+                        abs(timestamp_seconds(keypoints_b["timestamp"]) - timestamp_seconds(keypoints_a["timestamp"]))
+        return abs_speed
+
+    def average_speed_of_point(self, point_name):
+        """
+        Calculate the overage speed for a point based on history of keypoints.
+
+        Args:
+            point_name(str): Name of keypoint to measure.
+
+        Returns:
+            float: Average speed of a point over our history irrespetive of direction.
+        """
+        if point_name == "midpoint":
+            return float(self.centroid_history.motion().speed[0])
+        if point_name in PART_INDEX:
+            return float(self.history.motion().speed[PART_INDEX[point_name]])
+        return 0.0
+
+    def positional_demo(self, keypoints, first=None, second=None):
+        """
+        Measures horizontal angle between two points and logs when the angle passes between a threshold angle.
+        Logs results to console as True/False based on user interaction.
+
+        Args:
+            keypoints(PoseFrame): Parsed posenet key-points.
+            first: Not Used.
+            second: Not Used.
+
+        """
+        if keypoints.is_confident(self.POSITION_BASE, self.POSITION_OUTER):
+
+            angle_horizontal = self.quantity("angle", keypoints)
+            current_angle = True if angle_horizontal > self.ANGLE_THRESHOLD else False
+            if self.previous_angle is None:
+                self.previous_angle = not current_angle
+            if self.previous_angle != current_angle:
+                print(" Over %s degrees?: %s | Confidence = %s:%s | Angle = %s",
+                              self.ANGLE_THRESHOLD, current_angle, keypoints.score(self.POSITION_BASE),
+                              keypoints.score(self.POSITION_OUTER), angle_horizontal)
+            self.previous_angle = current_angle
+        return None
+
+    def simulation_pose_demo(self, keypoints, first=None, second=None):
+        """
+        Midpoint metric for simulation demo. Monitors right wrist in relation to middle point between nose and knees.
+        Logs switches of mode to console and forwards message to simulator. Key-points of every frame are logged too
+        when LOG_FRAMES is set. Frames without confident key-points are counted and skipped by execute_metrics.
+
+        Args:
+            keypoints(PoseFrame): Parsed posenet key-points.
+            first: Not Used.
+            second: Not Used.
+
+        """
+        ret_dict = None
+        # Check the confidence in all points required is above our threshold.
+        if keypoints.is_confident("nose", "rightKnee", "leftKnee", "rightWrist"):
+            positions = keypoints.positions
+            midpoint_y = (((positions[PART_INDEX["leftKnee"], 1] + positions[PART_INDEX["rightKnee"], 1]) / 2) +
+                          positions[PART_INDEX["nose"], 1]) / 2
+            wrist_y = positions[PART_INDEX["rightWrist"], 1]
+            # Y axis is inverted, assign bool accordingly, Lower is larger, Higher is smaller
+            above = False if wrist_y > midpoint_y else True
+            if self.LOG_FRAMES:
+                print("High = %s, midpoint = %s, wrist_y = %s" % (above, midpoint_y, wrist_y))
+            if self.high is None:
+                self.high = not above
+            if self.high != above:
+                print("Switch hover mode")
+                print("High = %s, midpoint = %s, wrist_y = %s" % (above, midpoint_y, wrist_y))
+                # Statically defined heights for drone locations for demo purposes.
+                if above:
+                    ret_dict = self.create_return_dictionary(x=0, y=0, z=3)
+                else:
+                    ret_dict = self.create_return_dictionary(x=0, y=0, z=1)
+            self.high = above
+        return ret_dict
+
+    def create_return_dictionary(self, x=default_x, y=default_y, z=default_z,
+                                 rotation_x=default_rotation_x, rotation_y=default_rotation_y,
+                                 rotation_z=default_rotation_z, rotation_w=default_rotation_w,
+                                 velocity_x=default_velocity_x, velocity_y=default_velocity_y,
+                                 velocity_z=default_velocity_z,
+                                 velocity_angular_x=default_velocity_angular_x,
+                                 velocity_angular_y=default_velocity_angular_y,
+                                 velocity_angular_z=default_velocity_angular_z,
+                                 acceleration_linear_x=default_acceleration_linear_x,
+                                 acceleration_linear_y=default_acceleration_linear_y,
+                                 acceleration_linear_z=default_acceleration_linear_z,
+                                 acceleration_angular_x=default_acceleration_angular_x,
+                                 acceleration_angular_y=default_acceleration_angular_y,
+                                 acceleration_angular_z=default_acceleration_angular_z,
+                                 proximity_value=None, uncategorized_data=None):
+        """
+        Creates a generically formatted dictionary based on any given values, filling unspecified parameters with
+        predefined default values. This is used to create return variables for metrics so that calling metric functions
+        is greatly simplified and more extensible.
+
+        Args:
+            x: x Location Co-ordinates.
+            y: y Location Co-ordinates.
+            z: z Location Co-ordinates.
+            rotation_x: x rotation value.
+            rotation_y: y rotation value.
+            rotation_z: z rotation value.
+            rotation_w: w rotation value.
+            velocity_x: x linear velocity.
+            velocity_y: y linear velocity.
+            velocity_z: z linear velocity.
+            velocity_angular_x: x angular velocity.
+            velocity_angular_y: y angular velocity.
+            velocity_angular_z: z angular velocity.
+            acceleration_linear_x: x linear acceleration.
+            acceleration_linear_y: y linear acceleration.
+            acceleration_linear_z: z linear acceleration.
+            acceleration_angular_x: x angular acceleration.
+            acceleration_angular_y: y angular acceleration.
+            acceleration_angular_z: z angular acceleration.
+            proximity_value: Value between 0-1 corresponding to drones proximity to a left or right keypoint.
+            uncategorized_data: Data not directly related to Drone parameters, eg. Average undirected speed of point(s).
+
+        Returns:
+            dict: The dictionary of all these values, populated with defaults for unspecified values.
+        """
+        dict_of_points = {
+            "x": x,
+            "y": y,
+            "z": z,
+            "rotation_x": rotation_x,
+            "rotation_y": rotation_y,
+            "rotation_z": rotation_z,
+            "rotation_w": rotation_w,
+            "velocity_x": velocity_x,
+            "velocity_y": velocity_y,
+            "velocity_z": velocity_z,
+            "velocity_angular_x": velocity_angular_x,
+            "velocity_angular_y": velocity_angular_y,
+            "velocity_angular_z": velocity_angular_z,
+            "acceleration_linear_x": acceleration_linear_x,
+            "acceleration_linear_y": acceleration_linear_y,
+            "acceleration_linear_z": acceleration_linear_z,
+            "acceleration_angular_x": acceleration_angular_x,
+            "acceleration_angular_y": acceleration_angular_y,
+            "acceleration_angular_z": acceleration_angular_z,
+            "proximity": proximity_value,
+            "uncategorized_data": uncategorized_data
+        }
+        return dict_of_points
+
+    # Helper dictionary for selecting functions for metrics.
+    metric_list = {
+        "positional_demo": positional_demo,
+        "demo_metric": simulation_pose_demo,
+        "offset_midpoints": midpoint,
+        "centroid": centroid_movement_speed,
+        "centroid_coords": centroid,
+        "average_speed_of_points": avg_speed_of_points
+    }
+
+    # Intermediate quantities from the quantity list read by each metric.
+    metric_requirements = {
+        "positional_demo": ("angle",),
+        "demo_metric": (),
+        "offset_midpoints": ("keypoint_motion",),
+        "centroid": ("centroid_motion",),
+        "centroid_coords": ("centroid", "centroid_motion"),
+        "average_speed_of_points": ("keypoint_motion",)
+    }
+
+    # Keypoints read by each metric as a keypoint mask, a metric only runs on frames where all of them are above
+    # MINIMUM_CONFIDENCE.
+    metric_keypoints = {
+        "positional_demo": keypoint_mask(POSITION_BASE, POSITION_OUTER),
+        "demo_metric": keypoint_mask("nose", "rightKnee", "leftKnee", "rightWrist"),
+        "offset_midpoints": keypoint_mask(DEFAULT_FOCUS_POINT_1, DEFAULT_FOCUS_POINT_2),
+        "centroid": keypoint_mask(),
+        "centroid_coords": keypoint_mask(),
+        "average_speed_of_points": keypoint_mask(DEFAULT_FOCUS_POINT_1, DEFAULT_FOCUS_POINT_2)
+    }
+
+    # Frames per second each metric needs to follow a person's movement, streams sending faster only add load.
+    metric_sample_rates = {
+        "positional_demo": 10,
+        "demo_metric": 10,
+        "offset_midpoints": 15,
+        "centroid": 15,
+        "centroid_coords": 15,
+        "average_speed_of_points": 15
+    }
+
+    def execute_metric(self, metric_name, keypoint_dict, first_list=None, second_list=None):
+        """
+        Executes a metric given its name. Always calls the metric function from the metric list with 3 arguments.
+
+        Args:
+            metric_name(str): Name of the metric defined in the dictionary.
+            keypoint_dict(PoseFrame | dict): Current keypoints to be used, as a pose frame or parsed dictionary.
+            first_list(list): Optional list required by some metrics.
+            second_list(list): Optional list required by some metrics.
+
+        Returns:
+            The result of the metric called.
+        """
+        return self.execute_metrics((metric_name,), keypoint_dict, first_list, second_list)[metric_name]
+
+    def execute_metrics(self, metric_names, keypoint_dict, first_list=None, second_list=None):
+        """
+        Executes several metrics on the same frame in one pass. The frame is converted and the confidence of its
+        keypoints reduced to a mask once, each metric is only checked against the keypoints it declares in
+        "metric_keypoints" and intermediate quantities are computed once and shared through quantity().
+
+        Args:
+            metric_names(list[str]): Names of metrics defined in the dictionary.
+            keypoint_dict(PoseFrame | dict): Current keypoints to be used, as a pose frame or parsed dictionary.
+            first_list(list): Optional list passed to every metric.
+            second_list(list): Optional list passed to every metric.
+
+        Returns:
+            dict: The result of each metric by name, None for metrics that could not run on the frame.
+        """
+        results = dict.fromkeys(metric_names)
+        try:
+            frame = as_pose_frame(keypoint_dict)
+        except (KeyError, TypeError):
+            # Missing keypoints, or keypoints without data.
+            STATS.increment("parser_frames_errored")
+            return results
+        unconfident = ~int(frame.confident.dot(KEYPOINT_BITS))
+        for metric_name in results:
+            if metric_name not in self.metric_list:
+                STATS.increment("parser_frames_errored")
+                continue
+            if self.metric_keypoints[metric_name] & unconfident:
+                STATS.increment("parser_frames_rejected_low_confidence")
+                continue
+            if metric_name not in self.active_metrics:
+                self.activate(metric_name)
+            try:
+                # Call the appropriate function from the metric_list dictionary with the name as the key.
+                with STATS.timer("metric_" + metric_name):
+                    results[metric_name] = self.metric_list[metric_name](self, frame, first_list, second_list)
+            except KeyError:
+                STATS.increment("parser_frames_errored")
+            except Exception as e:
+                # Eg. ZeroDivisionError from get_angle when both points share an x, which must not fail the frame's
+                # other metrics or the connection the frame came in on.
+                print("%s failed: %s" % (metric_name, e))
+                STATS.increment("parser_frames_errored")
+        return results
+
+
+if __name__ == '__main__':
+    # Startup for node.
+    # TODO - These two lines are how to create the pose parser object and start the server.
+    node = PoseParserNode.instance()
+    node.listener()
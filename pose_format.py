@@ -0,0 +1,354 @@
+"""
+Fixed layout binary encoding for PoseNet poses sent between poser and parser.
+
+Every pose is one POSE_RECORD: 17 keypoints of (x, y, score) as float32 plus the pose score, a capture
+timestamp and the id of the stream it came from. A message is any number of records back to back so the
+receiver can view a whole message as a NumPy array with a single np.frombuffer call.
+
+The JSON payloads posenet clients send to poser are normalised here too so every reader of them agrees. In
+passthrough mode poser forwards those payloads as the bytes the client sent, behind a small JSON_HEADER, and they are
+only decoded into pose records once they reach the parser.
+"""
+
+import json
+import math
+import re
+import struct
+import time
+
+import numpy as np
+
+KEYPOINT_COUNT = 17
+
+POSE_RECORD = np.dtype([
+    ("stream_id", "<u4"),
+    ("sequence", "<u4"),
+    ("pose_index", "<u2"),
+    ("flags", "<u2"),
+    ("timestamp", "<f8"),
+    ("score", "<f4"),
+    ("keypoints", "<f4", (KEYPOINT_COUNT, 3)),
+])
+
+# Header of a forwarded JSON payload: stream id, sequence number of its first frame and capture time.
+JSON_HEADER = struct.Struct("<IId")
+# Start of a payload with a "timestamp" ahead of its frames, as the camera page sends.
+TIMESTAMP_PREFIX = re.compile(rb'\s*\{\s*"timestamp"\s*:\s*([-+.0-9eE]+)')
+# Seconds between frames of a payload that were not given a timestamp of their own.
+DEFAULT_FRAME_INTERVAL = 1 / 30
+
+
+def keypoint_array(keypoints):
+    """
+    Converts PoseNet keypoints into a (17, 3) array.
+
+    Args:
+        keypoints(list[dict]): PoseNet keypoints, each with a "position" of x/y and a "score".
+
+    Returns:
+        np.ndarray: float32 array of x, y and score for each keypoint in part map order.
+    """
+    return np.array([(point["position"]["x"], point["position"]["y"], point["score"]) for point in keypoints],
+                    dtype=np.float32)
+
+
+def pose_records(poses, stream_id=0, sequence=0, timestamp=None):
+    """
+    Packs PoseNet poses into an array of pose records.
+
+    Args:
+        poses(list[dict]): PoseNet poses, each with "keypoints" and "score".
+        stream_id(int): Id of the stream the poses came from.
+        sequence(int): Sequence number of the frame the poses were detected in.
+        timestamp(float): Capture time in seconds, defaults to now.
+
+    Returns:
+        np.ndarray: Array of POSE_RECORD, one per pose.
+
+    Raises:
+        ValueError: If a pose does not have KEYPOINT_COUNT keypoints, each with a position and score.
+    """
+    records = np.zeros(len(poses), dtype=POSE_RECORD)
+    records["stream_id"] = stream_id
+    records["sequence"] = sequence
+    records["timestamp"] = time.time() if timestamp is None else timestamp
+    for index, pose in enumerate(poses):
+        try:
+            keypoints = keypoint_array(pose["keypoints"])
+            if keypoints.shape != (KEYPOINT_COUNT, 3):
+                raise ValueError("%s keypoints rather than %s" % (len(keypoints), KEYPOINT_COUNT))
+            records[index]["pose_index"] = index
+            records[index]["score"] = pose.get("score", 0.0)
+            records[index]["keypoints"] = keypoints
+        except (KeyError, TypeError, AttributeError, ValueError) as e:
+            raise ValueError("Malformed pose %s: %r" % (index, e))
+    return records
+
+
+def batch_records(frames, stream_id=0, first_sequence=0, timestamp=None):
+    """
+    Packs several frames, each with all of its poses, into one array of pose records.
+
+    Args:
+        frames(list[list[dict]]): Frames in capture order, each a list of PoseNet poses.
+        stream_id(int): Id of the stream the frames came from.
+        first_sequence(int): Sequence number of the first frame, later frames are numbered consecutively.
+        timestamp(float | list[float]): Capture time in seconds shared by every frame, or the capture time of each
+            frame, defaults to now.
+
+    Returns:
+        np.ndarray: Array of POSE_RECORD with the poses of each frame adjacent and in frame order.
+
+    Raises:
+        ValueError: If any pose is malformed.
+    """
+    if len(frames) == 0:
+        return np.zeros(0, dtype=POSE_RECORD)
+    timestamps = timestamp if isinstance(timestamp, (list, tuple, np.ndarray)) else [timestamp] * len(frames)
+    return np.concatenate([pose_records(poses, stream_id, first_sequence + index, timestamps[index])
+                           for index, poses in enumerate(frames)])
+
+
+def split_frames(records):
+    """
+    Splits an array of pose records into the records of each frame.
+
+    Args:
+        records(np.ndarray): Array of POSE_RECORD with the poses of each frame adjacent.
+
+    Returns:
+        list[np.ndarray]: Records of each frame in order, every pose of a frame shares a stream id and sequence.
+    """
+    if len(records) == 0:
+        return []
+    boundaries = np.flatnonzero((records["stream_id"][1:] != records["stream_id"][:-1]) |
+                                (records["sequence"][1:] != records["sequence"][:-1])) + 1
+    return np.split(records, boundaries)
+
+
+def payload_frames(payload):
+    """
+    Args:
+        payload(dict): A decoded /backend payload holding a "frames" list.
+
+    Returns:
+        list: The entries of its "frames", empty if it has none.
+
+    Raises:
+        ValueError: If "frames" is not a list.
+    """
+    frames = payload.get("frames", [])
+    if not isinstance(frames, list):
+        raise ValueError("\"frames\" is %s rather than a list" % type(frames).__name__)
+    return frames
+
+
+def parse_frames(data):
+    """
+    Normalises the payloads accepted by /backend into a list of frames.
+    Accepts the list of poses posenet detects in one frame, a list of such lists, or a dictionary with a
+    "frames" list whose entries are lists of poses or dictionaries with a "poses" list. Such a dictionary may also
+    hold the "timestamp" the client captured its first frame at, see capture_clock.py.
+
+    Args:
+        data: The decoded JSON payload.
+
+    Returns:
+        list[list[dict]]: Frames in the order received, each a list of every pose detected in it.
+
+    Raises:
+        ValueError: If a dictionary's "frames" is not a list.
+    """
+    if isinstance(data, dict):
+        data = payload_frames(data)
+        data = [frame.get("poses", []) if isinstance(frame, dict) else frame for frame in data]
+    if not isinstance(data, list) or len(data) == 0:
+        return []
+    if all(isinstance(frame, list) for frame in data):
+        return [frame for frame in data if len(frame) > 0]
+    return [data]
+
+
+def json_frames(payload):
+    """
+    Lists the frames of a /backend payload with any timestamps recorded for them. The "timestamp" of a payload
+    belongs to its first frame, and a frame given as a dictionary may hold a "timestamp" of its own.
+
+    Args:
+        payload: A decoded /backend payload.
+
+    Returns:
+        list[tuple]: Timestamp in seconds, or None if not recorded, and the list of poses of each frame.
+
+    Raises:
+        ValueError: If the payload's "frames" is not a list.
+    """
+    if not isinstance(payload, dict):
+        return [(None, poses) for poses in parse_frames(payload)]
+    frames = []
+    timestamp = payload.get("timestamp")
+    for index, frame in enumerate(payload_frames(payload)):
+        frame_timestamp = timestamp if index == 0 else None
+        if isinstance(frame, dict):
+            frame_timestamp = frame.get("timestamp", frame_timestamp)
+            frame = frame.get("poses", [])
+        if isinstance(frame, list) and len(frame) > 0:
+            frames.append((frame_timestamp, frame))
+    return frames
+
+
+def frame_timestamps(client_times, first, frame_interval=DEFAULT_FRAME_INTERVAL):
+    """
+    Works out the capture time of each frame of a payload from the capture time of its first frame. Frames keep the
+    spacing of the timestamps the client gave them, frames without one follow the frame before by frame_interval,
+    so the steps between the frames of a payload are never lost to a shared timestamp.
+
+    Args:
+        client_times(list): Timestamp of each frame in seconds on the client's clock, None where it has none.
+        first(float): Capture time of the first frame in seconds.
+        frame_interval(float): Seconds between frames without a usable timestamp.
+
+    Returns:
+        list[float]: Capture time of each frame in seconds, each later than the one before.
+    """
+    times = []
+    for client_time in client_times:
+        try:
+            client_time = float(client_time)
+        except (TypeError, ValueError):
+            client_time = None
+        times.append(client_time if client_time is not None and math.isfinite(client_time) else None)
+    timestamps = [first]
+    for client_time in times[1:]:
+        timestamp = timestamps[-1] + frame_interval
+        if times[0] is not None and client_time is not None and first + client_time - times[0] > timestamps[-1]:
+            timestamp = first + client_time - times[0]
+        timestamps.append(timestamp)
+    return timestamps
+
+
+def encode_poses(message, stream_id=0, sequence=0, timestamp=None):
+    """
+    Encodes a pose, a list of poses, a list of frames of poses or an array of pose records into bytes.
+
+    Args:
+        message: A PoseNet pose dict, a list of them, a list of such lists or an array of POSE_RECORD.
+        stream_id(int): Id of the stream the poses came from.
+        sequence(int): Sequence number of the frame the poses were detected in.
+        timestamp(float): Capture time in seconds, defaults to now.
+
+    Returns:
+        bytes: The encoded records.
+
+    Raises:
+        ValueError: If the message is not a pose.
+    """
+    if isinstance(message, np.ndarray) and message.dtype == POSE_RECORD:
+        return message.tobytes()
+    if isinstance(message, dict) and "keypoints" in message:
+        message = [message]
+    if isinstance(message, (list, tuple)) and all(isinstance(pose, dict) and "keypoints" in pose
+                                                   for pose in message):
+        return pose_records(message, stream_id, sequence, timestamp).tobytes()
+    if isinstance(message, (list, tuple)) and all(isinstance(frame, (list, tuple)) for frame in message):
+        return batch_records(message, stream_id, sequence, timestamp).tobytes()
+    raise ValueError("Message of type %s is not a pose" % type(message).__name__)
+
+
+def decode_poses(payload):
+    """
+    Views encoded bytes as pose records without copying.
+
+    Args:
+        payload(bytes): Bytes produced by encode_poses.
+
+    Returns:
+        np.ndarray: Read-only array of POSE_RECORD.
+
+    Raises:
+        ValueError: If the payload is not a whole number of records.
+    """
+    if len(payload) % POSE_RECORD.itemsize != 0:
+        raise ValueError("Payload of %s bytes is not a whole number of pose records" % len(payload))
+    return np.frombuffer(payload, dtype=POSE_RECORD)
+
+
+class JsonPayload:
+    """
+    A /backend payload forwarded unchanged, as the bytes the client sent, along with where it came from.
+    """
+    __slots__ = ("body", "stream_id", "first_sequence", "timestamp")
+
+    def __init__(self, body, stream_id=0, first_sequence=0, timestamp=None):
+        """
+        Args:
+            body(bytes): The JSON payload.
+            stream_id(int): Id of the stream the payload came from.
+            first_sequence(int): Sequence number of the first frame in the payload.
+            timestamp(float): Capture time in seconds, defaults to when the payload is encoded.
+        """
+        self.body = body
+        self.stream_id = stream_id
+        self.first_sequence = first_sequence
+        self.timestamp = timestamp
+
+    def encode(self):
+        """
+        Returns:
+            bytes: The payload behind a JSON_HEADER.
+        """
+        timestamp = time.time() if self.timestamp is None else self.timestamp
+        return JSON_HEADER.pack(self.stream_id, self.first_sequence, timestamp) + self.body
+
+    def records(self):
+        """
+        Returns:
+            np.ndarray: The payload decoded into an array of POSE_RECORD.
+
+        Raises:
+            ValueError: If the payload is not valid JSON or holds malformed poses.
+        """
+        return decode_json_payload(self.encode())
+
+
+def peek_timestamp(body):
+    """
+    Reads the "timestamp" a /backend payload starts with, without decoding the rest of it.
+
+    Args:
+        body(bytes): The JSON payload as the client sent it.
+
+    Returns:
+        float: The timestamp, None if the payload does not start with one.
+    """
+    match = TIMESTAMP_PREFIX.match(body)
+    if match is None:
+        return None
+    try:
+        return float(match.group(1))
+    except ValueError:
+        return None
+
+
+def decode_json_payload(payload):
+    """
+    Decodes a payload encoded by JsonPayload.encode into pose records, the only place forwarded JSON is parsed.
+
+    Args:
+        payload(bytes): A JSON_HEADER followed by a /backend payload.
+
+    Returns:
+        np.ndarray: Array of POSE_RECORD, empty if the payload holds no frames.
+
+    Raises:
+        ValueError: If the payload is not valid JSON or holds malformed poses.
+    """
+    if len(payload) < JSON_HEADER.size:
+        raise ValueError("JSON payload of %s bytes is shorter than its header" % len(payload))
+    stream_id, first_sequence, timestamp = JSON_HEADER.unpack_from(payload)
+    frames = json_frames(json.loads(bytes(payload[JSON_HEADER.size:])))
+    if len(frames) == 0:
+        return np.zeros(0, dtype=POSE_RECORD)
+    # The header holds the capture time of the first frame, later frames are spaced out from it.
+    timestamps = frame_timestamps([client_time for client_time, _ in frames], timestamp)
+    return batch_records([poses for _, poses in frames], stream_id, first_sequence, timestamps)
@@ -0,0 +1,172 @@
+"""
+Fixed capacity history of keypoint positions for pose metrics.
+
+Samples are kept in preallocated NumPy arrays used as a circular buffer, so appending is O(1) however long the
+history is. Every sample is written twice, at its slot and at the same slot offset by the capacity, which means
+the latest n samples are always one contiguous slice and can be returned as views without copying.
+
+The history also keeps running sums of the velocity, speed and acceleration of each step between samples. Each
+append adds the new step and subtracts the step that falls out of the window, so average motion over the whole
+history is an O(1) read rather than a rescan.
+"""
+
+import numpy as np
+
+from pose_format import KEYPOINT_COUNT
+from kinematics import Kinematics
+
+
+class PoseHistory:
+    """
+    Circular buffer of x, y positions, a validity mask and timestamps for a fixed number of points.
+    The step into each sample, and the acceleration across the two steps into it, are stored in the slot of the
+    sample. The running sums cover every step inside the window, so the oldest sample's step is never counted.
+    """
+
+    def __init__(self, capacity, points=KEYPOINT_COUNT):
+        """
+        Args:
+            capacity(int): Maximum number of samples kept.
+            points(int): Number of points in each sample.
+        """
+        self.capacity = max(1, int(capacity))
+        self.points = points
+        self.__positions = np.zeros((2 * self.capacity, points, 2))
+        self.__valid = np.zeros((2 * self.capacity, points), dtype=bool)
+        self.__timestamps = np.zeros(2 * self.capacity)
+        self.__step_velocity = np.zeros((self.capacity, points, 2))
+        self.__step_speed = np.zeros((self.capacity, points))
+        self.__step_valid = np.zeros((self.capacity, points), dtype=bool)
+        self.__acceleration = np.zeros((self.capacity, points, 2))
+        self.__acceleration_valid = np.zeros((self.capacity, points), dtype=bool)
+        self.__next = 0
+        self.size = 0
+        self.__reset_sums()
+
+    def __reset_sums(self):
+        self.__velocity_sum = np.zeros((self.points, 2))
+        self.__speed_sum = np.zeros(self.points)
+        self.__step_count = np.zeros(self.points, dtype=int)
+        self.__acceleration_sum = np.zeros((self.points, 2))
+        self.__acceleration_count = np.zeros(self.points, dtype=int)
+        self.__appends_since_sync = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, positions, valid, timestamp):
+        """
+        Adds a sample, replacing the oldest once the history is full.
+
+        Args:
+            positions(np.ndarray): (points, 2) array of x, y positions.
+            valid(np.ndarray): Mask of the points whose positions can be used.
+            timestamp(float): Time of the sample in seconds.
+        """
+        slot = self.__next
+        if self.size == self.capacity:
+            self.__evict_oldest()
+        size = min(self.size + 1, self.capacity)
+        step_valid = np.zeros(self.points, dtype=bool)
+        velocity = np.zeros((self.points, 2))
+        acceleration_valid = np.zeros(self.points, dtype=bool)
+        acceleration = np.zeros((self.points, 2))
+        if size >= 2:
+            previous = (slot - 1) % self.capacity
+            elapsed = timestamp - self.__timestamps[previous]
+            if elapsed > 0:
+                step_valid = np.logical_and(valid, self.__valid[previous])
+                velocity = (positions - self.__positions[previous]) / elapsed
+                velocity[~step_valid] = 0.0
+            if size >= 3:
+                # Each velocity sits midway between its two samples, so successive velocities are this far apart.
+                interval = (timestamp - self.__timestamps[(slot - 2) % self.capacity]) / 2
+                if interval > 0:
+                    acceleration_valid = step_valid & self.__step_valid[previous]
+                    acceleration = (velocity - self.__step_velocity[previous]) / interval
+                    acceleration[~acceleration_valid] = 0.0
+        speed = np.linalg.norm(velocity, axis=1)
+
+        for index in (slot, slot + self.capacity):
+            self.__positions[index] = positions
+            self.__valid[index] = valid
+            self.__timestamps[index] = timestamp
+        self.__step_velocity[slot] = velocity
+        self.__step_speed[slot] = speed
+        self.__step_valid[slot] = step_valid
+        self.__acceleration[slot] = acceleration
+        self.__acceleration_valid[slot] = acceleration_valid
+        self.__velocity_sum += velocity
+        self.__speed_sum += speed
+        self.__step_count += step_valid
+        self.__acceleration_sum += acceleration
+        self.__acceleration_count += acceleration_valid
+        self.__next = (slot + 1) % self.capacity
+        self.size = size
+
+        # Adding and subtracting floats slowly drifts, so rebuild the sums from the stored steps now and then.
+        self.__appends_since_sync += 1
+        if self.__appends_since_sync >= self.capacity:
+            self.__sync_sums()
+
+    def __evict_oldest(self):
+        """
+        Removes the contributions that leave the window when the oldest sample is overwritten. The sample after it
+        becomes the oldest so its step no longer counts, nor does the acceleration that used that step.
+        """
+        if self.capacity >= 2:
+            slot = (self.__next + 1) % self.capacity
+            self.__velocity_sum -= self.__step_velocity[slot]
+            self.__speed_sum -= self.__step_speed[slot]
+            self.__step_count -= self.__step_valid[slot]
+        if self.capacity >= 3:
+            slot = (self.__next + 2) % self.capacity
+            self.__acceleration_sum -= self.__acceleration[slot]
+            self.__acceleration_count -= self.__acceleration_valid[slot]
+
+    def __sync_sums(self):
+        slots = (self.__next - self.size + np.arange(self.size)) % self.capacity
+        steps = slots[1:]
+        accelerations = slots[2:]
+        self.__velocity_sum = self.__step_velocity[steps].sum(axis=0)
+        self.__speed_sum = self.__step_speed[steps].sum(axis=0)
+        self.__step_count = self.__step_valid[steps].sum(axis=0)
+        self.__acceleration_sum = self.__acceleration[accelerations].sum(axis=0)
+        self.__acceleration_count = self.__acceleration_valid[accelerations].sum(axis=0)
+        self.__appends_since_sync = 0
+
+    def motion(self):
+        """
+        Reads the average motion of each point over the whole history from the running sums.
+
+        Returns:
+            Kinematics: Mean velocity, acceleration and speed of every point, zero where there were too few samples.
+        """
+        divisor = np.maximum(self.__step_count, 1)
+        return Kinematics(self.__velocity_sum / divisor[:, None],
+                          self.__acceleration_sum / np.maximum(self.__acceleration_count, 1)[:, None],
+                          self.__speed_sum / divisor, self.__step_count.copy())
+
+    def window(self, length=None):
+        """
+        Returns the latest samples, oldest first, as views into the history.
+
+        Args:
+            length(int): Number of samples wanted, defaults to every sample held.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: Positions (n, points, 2), validity mask (n, points) and
+                timestamps (n,) of the latest n samples.
+        """
+        length = self.size if length is None else min(int(length), self.size)
+        end = self.__next + self.capacity
+        start = end - length
+        return self.__positions[start:end], self.__valid[start:end], self.__timestamps[start:end]
+
+    def clear(self):
+        """
+        Forgets every sample.
+        """
+        self.__next = 0
+        self.size = 0
+        self.__reset_sums()
@@ -1,57 +1,248 @@
-#! /usr/bin/python
-import time
-from socket_class import SocketManager
-from flask import Flask, render_template, json, request, send_from_directory
-from flask_cors import CORS, cross_origin
-import logging
-"""
-Runs a simple Flask server for communication between Posenet and ROS
-"""
-
-app = Flask(__name__)
-CORS(app)
-app.config['CORS_HEADERS'] = 'Content-Type'
-socket_manager = SocketManager(None, server=False)
-
-@app.route('/<path:path>')
-def send_js(path):
-    return send_from_directory('templates', path)
-
-@app.route("/", methods=['GET', 'POST', 'OPTIONS'])
-@cross_origin()
-def index():
-    """
-    Contact point for Posenet to send data to.
-    Publishes the data to a publish topic for Pose Parser Node.
-    """
-
-    # time.sleep(0.1)
-    return app.send_static_file("camera.html")
-
-# @app.route("/extra", methods=['GET', 'POST', 'OPTIONS'])
-# @cross_origin()
-# def send_js():
-#     return app.send_static_file("camera.b3ee27ff.js")
-
-@app.route("/backend", methods=['GET', 'POST', 'OPTIONS'])
-def coco():
-    """
-    Initial test functionality from posenet.
-
-    """
-    data = list(request.get_json())
-
-    if type(data) is list:
-        print('the data type is', type(data))
-        data = data[0]
-        print('the data type is now', type(data))
-        socket_manager.send_message(message=data)
-        #socket_manager.send_message(message=999)
-
-    return "", 200
-
-
-# Start server.
-app.run(host="0.0.0.0", debug=False)
-# test = ["hi", 7, "pewpew", [1, 2, 3]]
-# socket_manager.send_message(message=test)
+#! /usr/bin/python
+import math
+import time
+from socket_class import SocketManager, CODEC_POSE, CODEC_PICKLE, CODEC_JSON
+from relay import FrameRelay
+from frame_rate import FrameDecimator
+from capture_clock import CaptureClock
+from pose_format import json_frames, frame_timestamps, peek_timestamp, batch_records
+from stats import STATS
+from static_assets import StaticAssets
+from flask import Flask, Response, render_template, json, request
+from flask_cors import CORS, cross_origin
+import logging
+
+try:
+    from flask_sock import Sock
+except ImportError:
+    # Streaming over WebSockets is optional, clients fall back to POST /backend without it.
+    Sock = None
+"""
+Runs a simple Flask server for communication between Posenet and ROS
+"""
+
+app = Flask(__name__)
+CORS(app)
+app.config['CORS_HEADERS'] = 'Content-Type'
+# Forward payloads to the parser as the bytes clients sent rather than decoding them here. The parser then validates
+# and decodes each payload once, and poser counts payloads rather than frames.
+PASSTHROUGH = False
+socket_manager = SocketManager(None, server=False, persistent=True,
+                               codecs=((CODEC_JSON,) if PASSTHROUGH else ()) + (CODEC_POSE, CODEC_PICKLE))
+# Frames are relayed to the parser from a background thread so requests never wait on the parser.
+relay = FrameRelay(socket_manager)
+relay.start()
+# Frames dropped as stale or failed to send are read from the relay whenever /metrics is requested.
+STATS.register_gauges("relay", lambda: relay.counters())
+# Whether frames from clients sending faster than the parser asks for are dropped here rather than relayed.
+DECIMATE = True
+decimator = FrameDecimator()
+# Capture times clients stamp on their payloads, mapped onto this machine's clock for the parser's freshness deadline.
+capture_clock = CaptureClock()
+# The camera client's pages and bundles, compressed once here rather than on every request. The templates directory
+# holds the same files.
+assets = StaticAssets(app.static_folder)
+
+@app.route('/<path:path>')
+def send_js(path):
+    return assets.response(path, request)
+
+@app.route("/", methods=['GET', 'POST', 'OPTIONS'])
+@cross_origin()
+def index():
+    """
+    Contact point for Posenet to send data to.
+    Publishes the data to a publish topic for Pose Parser Node.
+    """
+
+    # time.sleep(0.1)
+    return assets.response("camera.html", request)
+
+# @app.route("/extra", methods=['GET', 'POST', 'OPTIONS'])
+# @cross_origin()
+# def send_js():
+#     return app.send_static_file("camera.98fd1d1f.js")
+
+def stream_key():
+    """
+    Returns:
+        str: Key of the stream a request belongs to, from the "stream" query argument, the "X-Stream-Id"
+            header or otherwise the client address.
+    """
+    return request.args.get("stream", request.headers.get("X-Stream-Id", request.remote_addr))
+
+
+def admit_frame(key):
+    """
+    Args:
+        key(str): Key of the stream the frame belongs to.
+
+    Returns:
+        bool: Whether the frame arrived at least the target interval after the last one admitted from the stream,
+            otherwise it is counted as decimated and should be dropped.
+    """
+    if not DECIMATE or decimator.admit(key, relay.target_interval):
+        return True
+    STATS.increment("poser_frames_decimated")
+    return False
+
+
+def capture_time(key, client_time, received):
+    """
+    Args:
+        key(str): Key of the stream the payload belongs to.
+        client_time: The "timestamp" the client stamped on the payload in seconds on its own clock, if any.
+        received(float): Time the payload arrived in seconds since the epoch.
+
+    Returns:
+        float: Time the payload was captured in seconds since the epoch, the time it arrived if it was not stamped.
+    """
+    try:
+        client_time = float(client_time)
+    except (TypeError, ValueError):
+        return received
+    if not math.isfinite(client_time):
+        return received
+    return capture_clock.capture_time(key, client_time, received)
+
+
+def encode_payload(key, payload, received):
+    """
+    Validates the frames of a decoded /backend payload and encodes them for the relay. The first frame is stamped
+    with its capture time on this machine's clock and later frames are spaced out from it, see frame_timestamps.
+
+    Args:
+        key(str): Key of the stream the payload belongs to.
+        payload: The decoded JSON payload.
+        received(float): Time the payload arrived in seconds since the epoch.
+
+    Returns:
+        np.ndarray: Array of POSE_RECORD holding every pose with frames numbered from 0, empty without frames.
+
+    Raises:
+        ValueError: If a pose is malformed.
+    """
+    frames = json_frames(payload)
+    if len(frames) == 0:
+        return batch_records([])
+    client_times = [client_time for client_time, _ in frames]
+    timestamps = frame_timestamps(client_times, capture_time(key, client_times[0], received))
+    return batch_records([poses for _, poses in frames], timestamp=timestamps)
+
+
+def feedback(error=None):
+    """
+    Args:
+        error(str): Why the frame was refused, if it was.
+
+    Returns:
+        str: Answer to a frame, JSON holding "interval_ms", the milliseconds the client should leave between frames,
+            and any "error".
+    """
+    answer = {"interval_ms": round(relay.target_interval * 1000.0)}
+    if error is not None:
+        answer["error"] = error
+    return json.dumps(answer)
+
+
+@app.route("/backend", methods=['GET', 'POST', 'OPTIONS'])
+def coco():
+    """
+    Initial test functionality from posenet.
+    Queues every pose of every frame in the payload for the relay as a single batch and returns straight
+    away. Clients can set an "X-Stream-Id" header to identify their stream, otherwise their address is used.
+    In passthrough mode the body is queued without being decoded.
+    Answers with the interval the client should leave between frames, and drops frames sent sooner than that.
+    Payloads may start with the "timestamp" of their capture on the client's clock, otherwise frames are timed
+    from their arrival. Payloads holding a malformed pose are refused with 400 Bad Request.
+
+    """
+    # Only posts carry frames, a CORS preflight must neither take the slot of the post that follows it nor count as
+    # a rejected payload.
+    if request.method != "POST":
+        return Response(feedback(), mimetype="application/json")
+    received = time.time()
+    key = stream_key()
+    if not admit_frame(key):
+        return Response(feedback(), mimetype="application/json")
+
+    if PASSTHROUGH:
+        body = request.get_data(cache=False)
+        if len(body) > 0:
+            STATS.increment("poser_payloads_forwarded")
+            relay.push_raw(key, body, capture_time(key, peek_timestamp(body), received))
+        return Response(feedback(), mimetype="application/json")
+
+    try:
+        with STATS.timer("poser_decode"):
+            records = encode_payload(key, request.get_json(silent=True), received)
+    except ValueError as e:
+        STATS.increment("poser_payloads_rejected")
+        return Response(feedback("%s" % e), status=400, mimetype="application/json")
+
+    if len(records) > 0:
+        STATS.increment("poser_frames_received", int(records["sequence"][-1]) + 1)
+        relay.push(key, records)
+    else:
+        STATS.increment("poser_payloads_rejected")
+
+    return Response(feedback(), mimetype="application/json")
+
+
+@app.route("/metrics", methods=['GET'])
+def metrics():
+    """
+    Stage timings and counters of poser in the Prometheus text format, see stats.py.
+    """
+    return Response(STATS.render_text(), mimetype="text/plain")
+
+
+if Sock is not None:
+    sock = Sock(app)
+
+    @sock.route("/stream")
+    def stream(ws):
+        """
+        Streaming alternative to /backend for the camera page.
+        Each WebSocket message carries a /backend payload and is acknowledged once queued for the relay, so the
+        connection and HTTP parsing costs are paid once per client rather than once per frame. Like /backend, each
+        acknowledgement carries the interval to leave between frames and frames sent sooner are dropped.
+        """
+        key = stream_key()
+        try:
+            while True:
+                message = ws.receive()
+                received = time.time()
+                if not admit_frame(key):
+                    ws.send(feedback())
+                    continue
+                if PASSTHROUGH:
+                    if message:
+                        STATS.increment("poser_payloads_forwarded")
+                        body = message.encode("utf-8") if isinstance(message, str) else message
+                        relay.push_raw(key, body, capture_time(key, peek_timestamp(body), received))
+                    ws.send(feedback())
+                    continue
+                try:
+                    with STATS.timer("poser_decode"):
+                        records = encode_payload(key, json.loads(message), received)
+                except ValueError as e:
+                    STATS.increment("poser_payloads_rejected")
+                    ws.send(feedback("%s" % e))
+                    continue
+                if len(records) > 0:
+                    STATS.increment("poser_frames_received", int(records["sequence"][-1]) + 1)
+                    relay.push(key, records)
+                else:
+                    STATS.increment("poser_payloads_rejected")
+                ws.send(feedback())
+        finally:
+            # A reconnecting page restarts its clock, so its capture times are matched afresh.
+            capture_clock.forget(key)
+
+
+if __name__ == '__main__':
+    # Start server.
+    app.run(host="0.0.0.0", debug=False)
+# test = ["hi", 7, "pewpew", [1, 2, 3]]
+# socket_manager.send_message(message=test)
@@ -0,0 +1,271 @@
+"""
+Append-only recording of the pose records the parser receives.
+
+Records are copied into a memory-mapped file of fixed size entries by a background thread, each entry holding the
+pose record as received plus the time it was received. Ingest only hands records to a bounded queue, so recording
+never blocks it; when the disk cannot keep up the queue fills and further records are dropped and counted.
+
+Every INDEX_INTERVAL entries the receive time and entry number are appended to an index file beside the recording,
+so a reader can find a time range with a binary search of the index instead of scanning the recording. The index is
+flushed as each batch is written and the entry count in the header is only moved on after it, so a PoseRecording
+opened while the session is still being recorded sees every entry counted so far.
+"""
+
+import mmap
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from pose_format import POSE_RECORD
+
+HEADER = np.dtype([("magic", "S4"), ("version", "<u4"), ("entry_size", "<u4"), ("reserved", "<u4"),
+                   ("count", "<u8")])
+ENTRY = np.dtype([("received", "<f8"), ("record", POSE_RECORD)])
+INDEX_ENTRY = np.dtype([("received", "<f8"), ("entry", "<u8")])
+
+MAGIC = b"PPR1"
+VERSION = 1
+# Suffix of the time index written beside a recording.
+INDEX_SUFFIX = ".idx"
+
+
+def index_path(path):
+    """
+    Args:
+        path(str): Path of a recording.
+
+    Returns:
+        str: Path of the time index of the recording.
+    """
+    return path + INDEX_SUFFIX
+
+
+class PoseRecorder:
+    """
+    Records pose records to a memory-mapped file from a writer thread.
+    """
+    # Entries the file grows by each time it fills.
+    DEFAULT_CHUNK_ENTRIES = 65536
+    # Batches of records waiting to be written before new ones are dropped.
+    DEFAULT_QUEUE_SIZE = 1024
+    # Entries between time index entries.
+    INDEX_INTERVAL = 256
+
+    def __init__(self, path, queue_size=DEFAULT_QUEUE_SIZE, chunk_entries=DEFAULT_CHUNK_ENTRIES,
+                 index_interval=INDEX_INTERVAL):
+        """
+        Args:
+            path(str): Path of the recording, appended to if it already exists.
+            queue_size(int): Batches of records queued for the writer before records are dropped.
+            chunk_entries(int): Entries the file grows by each time it fills.
+            index_interval(int): Entries between time index entries.
+
+        Raises:
+            ValueError: If the path exists but is not a recording.
+        """
+        self.path = path
+        self.chunk_entries = max(1, int(chunk_entries))
+        self.index_interval = max(1, int(index_interval))
+        self.__queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self.__thread = None
+        self.__file = None
+        self.__map = None
+        self.__header = None
+        self.__entries = None
+        self.__index = None
+        self.recorded = 0
+        self.dropped = 0
+
+    def start(self):
+        """
+        Opens the recording and starts the writer thread.
+        """
+        if self.__thread is not None:
+            return
+        self.__open()
+        self.__thread = threading.Thread(target=self.__write_loop, daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        """
+        Writes every queued record, then trims the recording to the entries written and closes it.
+        """
+        if self.__thread is None:
+            return
+        self.__queue.put(None)
+        self.__thread.join()
+        self.__thread = None
+        self.__close()
+
+    def record(self, records, received=None):
+        """
+        Queues records for the writer thread without waiting, dropping them if the queue is full.
+
+        Args:
+            records(np.ndarray): Array of POSE_RECORD.
+            received(float): Time the records were received in seconds, defaults to now.
+
+        Returns:
+            bool: Whether the records were queued.
+        """
+        try:
+            self.__queue.put_nowait((records, time.time() if received is None else received))
+            return True
+        except queue.Full:
+            self.dropped += len(records)
+            return False
+
+    def counters(self):
+        """
+        Returns:
+            dict[str, int]: Records written and dropped, plus batches currently queued.
+        """
+        return {"recorded": self.recorded, "dropped": self.dropped, "queued": self.__queue.qsize()}
+
+    def __open(self):
+        exists = os.path.exists(self.path) and os.path.getsize(self.path) >= HEADER.itemsize
+        self.__file = open(self.path, "r+b" if exists else "w+b")
+        if exists:
+            header = np.fromfile(self.__file, dtype=HEADER, count=1)[0]
+            if header["magic"] != MAGIC or header["entry_size"] != ENTRY.itemsize:
+                self.__file.close()
+                raise ValueError("%s is not a pose recording" % self.path)
+            count = int(header["count"])
+        else:
+            count = 0
+        self.__map_file(count + self.chunk_entries)
+        if not exists:
+            self.__header["magic"] = MAGIC
+            self.__header["version"] = VERSION
+            self.__header["entry_size"] = ENTRY.itemsize
+            self.__header["count"] = 0
+        self.__index = open(index_path(self.path), "ab")
+
+    def __map_file(self, capacity):
+        """
+        Maps the recording with room for the given number of entries, growing the file if needed.
+        """
+        self.__entries = None
+        self.__header = None
+        if self.__map is not None:
+            self.__map.close()
+        self.__file.truncate(HEADER.itemsize + capacity * ENTRY.itemsize)
+        self.__map = mmap.mmap(self.__file.fileno(), 0)
+        self.__header = np.ndarray((), dtype=HEADER, buffer=self.__map)
+        self.__entries = np.ndarray((capacity,), dtype=ENTRY, buffer=self.__map, offset=HEADER.itemsize)
+
+    def __write(self, records, received):
+        count = int(self.__header["count"])
+        end = count + len(records)
+        if end > len(self.__entries):
+            self.__map_file(end + self.chunk_entries)
+        self.__entries["record"][count:end] = records
+        self.__entries["received"][count:end] = received
+        # Index the first entry at or after each index interval boundary.
+        boundary = -(-count // self.index_interval) * self.index_interval
+        if boundary < end:
+            index = np.zeros(1, dtype=INDEX_ENTRY)
+            index["received"] = received
+            index["entry"] = boundary
+            self.__index.write(index.tobytes())
+            self.__index.flush()
+        self.__header["count"] = end
+        self.recorded += len(records)
+
+    def __write_loop(self):
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                return
+            try:
+                self.__write(*item)
+            except (OSError, ValueError) as e:
+                self.dropped += len(item[0])
+                print("%s" % e)
+
+    def __close(self):
+        count = int(self.__header["count"])
+        self.__entries = None
+        self.__header = None
+        self.__map.flush()
+        self.__map.close()
+        self.__map = None
+        self.__file.truncate(HEADER.itemsize + count * ENTRY.itemsize)
+        self.__file.close()
+        self.__file = None
+        self.__index.close()
+        self.__index = None
+
+
+class PoseRecording:
+    """
+    Read-only view of a recording made by PoseRecorder.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path(str): Path of the recording.
+
+        Raises:
+            ValueError: If the file is not a recording.
+        """
+        self.path = path
+        with open(path, "rb") as recording:
+            self.__map = mmap.mmap(recording.fileno(), 0, access=mmap.ACCESS_READ)
+        header = np.ndarray((), dtype=HEADER, buffer=self.__map).copy()
+        if header["magic"] != MAGIC or header["entry_size"] != ENTRY.itemsize:
+            self.__map.close()
+            raise ValueError("%s is not a pose recording" % path)
+        # A recording still being written may be longer than the entries counted so far.
+        count = min(int(header["count"]), (len(self.__map) - HEADER.itemsize) // ENTRY.itemsize)
+        self.entries = np.ndarray((count,), dtype=ENTRY, buffer=self.__map, offset=HEADER.itemsize)
+        try:
+            with open(index_path(path), "rb") as index:
+                data = index.read()
+        except FileNotFoundError:
+            data = b""
+        # An index entry may be part way through being written while the session is recorded.
+        self.index = np.frombuffer(data[:len(data) - len(data) % INDEX_ENTRY.itemsize], dtype=INDEX_ENTRY)
+        self.index = self.index[self.index["entry"] < count]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def read(self, start=None, end=None):
+        """
+        Copies the entries received within a time range.
+
+        Args:
+            start(float): Earliest receive time in seconds, defaults to the start of the recording.
+            end(float): Receive time in seconds entries must be before, defaults to the end of the recording.
+
+        Returns:
+            np.ndarray: Array of ENTRY, each with the "received" time and the pose "record".
+        """
+        first = 0
+        last = len(self.entries)
+        if start is not None and len(self.index):
+            # Entries before an index entry received earlier than start were all received before it too.
+            position = np.searchsorted(self.index["received"], start, side="left") - 1
+            first = int(self.index["entry"][position]) if position >= 0 else 0
+        if end is not None and len(self.index):
+            position = np.searchsorted(self.index["received"], end, side="left")
+            last = int(self.index["entry"][position]) if position < len(self.index) else last
+        entries = self.entries[first:last]
+        keep = np.ones(len(entries), dtype=bool)
+        if start is not None:
+            keep &= entries["received"] >= start
+        if end is not None:
+            keep &= entries["received"] < end
+        return entries[keep]
+
+    def close(self):
+        """
+        Releases the mapping of the recording.
+        """
+        self.entries = None
+        self.__map.close()
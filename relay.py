@@ -0,0 +1,210 @@
+"""
+Background relay stage between the poser web server and the parser.
+
+Web handlers push batches of frames into a small bounded queue per stream and return straight away. A single sender
+thread drains the queues round robin and forwards each batch as one message through a SocketManager. When the parser
+falls behind, the oldest queued batch of a stream is overwritten by the newest so stale poses are never sent.
+
+Payloads pushed with push_raw are forwarded as the bytes the client sent and decoded only by the parser. As the relay
+never looks inside them, each counts as a single frame and takes a single sequence number, and frames after the first
+in a payload are numbered on from it.
+
+The parser answers each message with the interval streams should leave between frames, see frame_rate.py, which the
+relay keeps in target_interval for poser to pass on to camera clients.
+
+A stream that has pushed nothing for a while and has nothing queued is forgotten. If it pushes again it is sent as a
+new stream, with a new id and sequence numbers starting over.
+"""
+
+import itertools
+import threading
+from collections import deque
+from time import monotonic
+
+from pose_format import JsonPayload
+from stats import STATS
+
+
+class FrameRelay:
+    """
+    Forwards frames to the parser from a sender thread, dropping stale frames when the parser is slow.
+    """
+    # Batches held per stream, 1 means only the latest batch is ever sent.
+    DEFAULT_QUEUE_DEPTH = 1
+    # Seconds a stream is kept after its last push once its queue is empty.
+    DEFAULT_EXPIRY = 30.0
+
+    def __init__(self, socket_manager, ip=None, port=None, queue_depth=DEFAULT_QUEUE_DEPTH, expiry=DEFAULT_EXPIRY):
+        """
+        Args:
+            socket_manager(SocketManager): Client socket manager used to send frames.
+            ip(str): IP address of the parser, defaults to the SocketManager default.
+            port(int): Port of the parser, defaults to the SocketManager default.
+            queue_depth(int): Maximum batches queued for each stream.
+            expiry(float): Seconds an idle stream with nothing queued is kept.
+        """
+        self.socket_manager = socket_manager
+        self.__ip = socket_manager.DEFAULT_IP if ip is None else ip
+        self.__port = socket_manager.DEFAULT_PORT if port is None else port
+        self.__queue_depth = max(1, int(queue_depth))
+        self.expiry = expiry
+        self.__queues = {}
+        self.__stream_ids = {}
+        self.__sequences = {}
+        self.__last_pushed = {}
+        # Ids are never reused, so a stream that was forgotten is not mistaken by the parser for the one before it.
+        self.__ids = itertools.count()
+        self.__condition = threading.Condition()
+        self.__thread = None
+        self.__running = False
+        self.enqueued = 0
+        self.dropped = 0
+        self.sent = 0
+        self.failed = 0
+        # Frames the parser was too busy to take, see admission.WorkerPool.
+        self.shed = 0
+        # Seconds the parser last asked each stream to leave between frames, 0 until it first answers.
+        self.target_interval = 0.0
+
+    def start(self):
+        """
+        Starts the sender thread if it is not already running.
+        """
+        with self.__condition:
+            if self.__running:
+                return
+            self.__running = True
+        self.__thread = threading.Thread(target=self.__send_loop, daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        """
+        Stops the sender thread once it has finished sending its current frame.
+        """
+        with self.__condition:
+            self.__running = False
+            self.__condition.notify_all()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def push(self, stream, records):
+        """
+        Queues a batch of frames for sending without waiting on the parser. The poses are encoded by the caller,
+        so a malformed pose is refused where it arrived and never reaches the sender thread.
+
+        Args:
+            stream(str): Key identifying the stream the frames came from, eg. the client address.
+            records(np.ndarray): Array of POSE_RECORD from pose_format.batch_records, with frames numbered from 0.
+                The relay sets their stream id and sequence numbers.
+        """
+        if len(records) == 0:
+            return
+        self.__enqueue(stream, records, int(records["sequence"][-1]) + 1, None)
+
+    def push_raw(self, stream, body, timestamp=None):
+        """
+        Queues a /backend payload for forwarding unchanged, without decoding it.
+
+        Args:
+            stream(str): Key identifying the stream the payload came from, eg. the client address.
+            body(bytes): The JSON payload as the client sent it.
+            timestamp(float): Capture time in seconds, defaults to when the payload is sent.
+        """
+        if len(body) == 0:
+            return
+        self.__enqueue(stream, body, 1, timestamp)
+
+    def __enqueue(self, stream, batch, count, timestamp):
+        now = monotonic()
+        with self.__condition:
+            self.__expire(now)
+            queue = self.__queues.get(stream)
+            if queue is None:
+                queue = deque(maxlen=self.__queue_depth)
+                self.__queues[stream] = queue
+                self.__stream_ids[stream] = next(self.__ids)
+                self.__sequences[stream] = 0
+            self.__last_pushed[stream] = now
+            if len(queue) == self.__queue_depth:
+                self.dropped += queue[0][3]
+            queue.append((self.__sequences[stream], batch, timestamp, count))
+            self.__sequences[stream] += count
+            self.enqueued += count
+            self.__condition.notify()
+
+    def __expire(self, now):
+        """
+        Forgets the streams that have pushed nothing within the expiry time and have nothing left to send. Called with
+        the condition held.
+
+        Args:
+            now(float): Current monotonic time in seconds.
+        """
+        for stream in [stream for stream, pushed in self.__last_pushed.items()
+                       if now - pushed > self.expiry and not self.__queues[stream]]:
+            del self.__queues[stream]
+            del self.__stream_ids[stream]
+            del self.__sequences[stream]
+            del self.__last_pushed[stream]
+
+    def counters(self):
+        """
+        Returns:
+            dict[str, int]: Frames enqueued, dropped as stale, sent, shed by the parser and failed, plus batches
+                currently queued and the target interval in milliseconds.
+        """
+        with self.__condition:
+            return {
+                "enqueued": self.enqueued,
+                "dropped": self.dropped,
+                "sent": self.sent,
+                "failed": self.failed,
+                "shed": self.shed,
+                "queued": sum(len(queue) for queue in self.__queues.values()),
+                "target_interval_ms": round(self.target_interval * 1000.0, 1)
+            }
+
+    def __next_frames(self):
+        """
+        Waits for queued frames and takes the oldest frame from each stream that has one.
+
+        Returns:
+            list[tuple]: Stream id and batch for each stream, empty once the relay is stopped.
+        """
+        with self.__condition:
+            while self.__running and not any(self.__queues.values()):
+                self.__condition.wait()
+            if not self.__running:
+                return []
+            return [(self.__stream_ids[stream], queue.popleft()) for stream, queue in self.__queues.items() if queue]
+
+    def __send_loop(self):
+        while True:
+            frames = self.__next_frames()
+            if not frames:
+                return
+            for stream_id, (sequence, batch, timestamp, count) in frames:
+                with STATS.timer("relay_send"):
+                    try:
+                        if isinstance(batch, bytes):
+                            message = JsonPayload(batch, stream_id, sequence, timestamp)
+                        else:
+                            message = batch
+                            message["stream_id"] = stream_id
+                            message["sequence"] += sequence
+                        response = self.socket_manager.send_message(ip=self.__ip, port=self.__port,
+                                                                    message=message)
+                    except (KeyError, TypeError, ValueError) as e:
+                        # A batch that cannot be sent must not take the sender thread, and every stream, with it.
+                        print("%s" % e)
+                        response = "ENCODING ERROR"
+                with self.__condition:
+                    if response in ("CONNECTION ERROR", "ENCODING ERROR"):
+                        self.failed += count
+                    elif response == "BUSY":
+                        self.shed += count
+                    else:
+                        self.sent += count
+                        if isinstance(response, dict) and "interval" in response:
+                            self.target_interval = float(response["interval"])
@@ -0,0 +1,222 @@
+#!/usr/bin/python3
+"""
+Replays recorded pose sessions through the pose metrics offline.
+
+A session is a file of JSON lines, each line a /backend payload, a recording made by the parser's PoseRecorder
+or a file of binary pose records as sent from poser to parser. Frames are run through the same conversion, history and metric code as the live parser but with
+their recorded timestamps, one session per worker process, and every metric result is written to a single
+NumPy .npz file with one array per column.
+
+JSON payloads may carry a "timestamp" in seconds, as may the entries of their "frames" list. Frames without one are
+taken to follow the previous frame by the frame interval. Malformed lines and frames are skipped with a warning
+and counted rather than ending the replay. Recordings can be limited to the poses received within a time range,
+found through their time index.
+
+Example:
+    python replay.py sessions/*.jsonl --metrics centroid offset_midpoints --minimum-confidence 0.3 -o scores.npz
+"""
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import parser as pose_parser
+from parser import PoseParserNode, PoseMetrics
+from pose_format import POSE_RECORD, DEFAULT_FRAME_INTERVAL, pose_records, json_frames, split_frames
+from tracker import PoseTracker
+from recorder import PoseRecording, MAGIC
+
+# Fields of a metric result written as columns, results without a number in a field are written as NaN.
+RESULT_FIELDS = list(PoseMetrics(active_metrics=()).create_return_dictionary())
+
+
+def read_session(path, frame_interval=DEFAULT_FRAME_INTERVAL, start=None, end=None):
+    """
+    Reads a recorded session as pose records.
+
+    Args:
+        path(str): A .jsonl file of /backend payloads, a PoseRecorder recording or a file of binary pose records.
+        frame_interval(float): Seconds between frames recorded without a timestamp.
+        start(float): Earliest receive time in seconds of poses read from a recording.
+        end(float): Receive time in seconds poses read from a recording must be before.
+
+    Returns:
+        tuple[np.ndarray, int]: Array of POSE_RECORD in recorded order, and the number of malformed frames skipped,
+            a line that is not a readable payload counting as one.
+    """
+    if not path.endswith((".jsonl", ".json")):
+        with open(path, "rb") as session:
+            magic = session.read(len(MAGIC))
+        if magic != MAGIC:
+            return np.fromfile(path, dtype=POSE_RECORD), 0
+        recording = PoseRecording(path)
+        records = recording.read(start, end)["record"].copy()
+        recording.close()
+        return records, 0
+    records = []
+    skipped = 0
+    timestamp = 0.0
+    with open(path) as session:
+        for line_number, line in enumerate(session, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                frames = json_frames(json.loads(line))
+            except ValueError as e:
+                print("Skipping line %s of %s: %s" % (line_number, path, e), file=sys.stderr)
+                skipped += 1
+                continue
+            for frame_timestamp, poses in frames:
+                try:
+                    frame_time = timestamp + frame_interval if frame_timestamp is None else float(frame_timestamp)
+                    records.append(pose_records(poses, sequence=len(records), timestamp=frame_time))
+                except (TypeError, ValueError) as e:
+                    print("Skipping frame on line %s of %s: %s" % (line_number, path, e), file=sys.stderr)
+                    skipped += 1
+                    continue
+                timestamp = frame_time
+    if len(records) == 0:
+        return np.zeros(0, dtype=POSE_RECORD), skipped
+    return np.concatenate(records), skipped
+
+
+def configure(minimum_confidence, angle_threshold, verbose):
+    """
+    Applies the tuned thresholds in a worker process before any session is replayed.
+
+    Args:
+        minimum_confidence(float): Replaces parser.MINIMUM_CONFIDENCE when given.
+        angle_threshold(float): Replaces PoseMetrics.ANGLE_THRESHOLD when given.
+        verbose(bool): Whether to keep the console logging of the metrics.
+    """
+    if minimum_confidence is not None:
+        pose_parser.MINIMUM_CONFIDENCE = minimum_confidence
+    if angle_threshold is not None:
+        PoseMetrics.ANGLE_THRESHOLD = angle_threshold
+    PoseMetrics.LOG_FRAMES = verbose
+    if not verbose:
+        sys.stdout = open(os.devnull, "w")
+
+
+def replay_session(path, metric_names, history_length=PoseMetrics.DEFAULT_HISTORY_LENGTH,
+                   frame_interval=DEFAULT_FRAME_INTERVAL, start=None, end=None):
+    """
+    Runs the metrics over every frame of a session, following each person with their own metric state.
+
+    Args:
+        path(str): Session file to replay.
+        metric_names(list[str]): Names of the metrics to run.
+        history_length(int): Number of samples each person's history keeps.
+        frame_interval(float): Seconds between frames recorded without a timestamp.
+        start(float): Earliest receive time in seconds of poses replayed from a recording.
+        end(float): Receive time in seconds poses replayed from a recording must be before.
+
+    Returns:
+        tuple[dict[str, np.ndarray], int]: Columns of one row per frame, person and metric, and the number of
+            malformed frames skipped.
+    """
+    node = PoseParserNode.instance()
+    trackers = {}
+    rows = []
+    records, skipped = read_session(path, frame_interval, start, end)
+    for frame_index, frame in enumerate(split_frames(records)):
+        stream_id = int(frame["stream_id"][0])
+        timestamp = float(frame["timestamp"][0])
+        if stream_id not in trackers:
+            trackers[stream_id] = PoseTracker(lambda: PoseMetrics(history_length, metric_names),
+                                             minimum_confidence=pose_parser.MINIMUM_CONFIDENCE)
+        for track, keypoints in zip(trackers[stream_id].update(frame["keypoints"], timestamp), frame["keypoints"]):
+            keypoints = node.convert_to_dictionary(keypoints, track.metrics, timestamp)
+            results = track.metrics.execute_metrics(metric_names, keypoints)
+            for metric_index, name in enumerate(metric_names):
+                rows.append((frame_index, timestamp, track.track_id, metric_index, results[name]))
+
+    columns = {
+        "frame": np.array([row[0] for row in rows], dtype=np.int64),
+        "timestamp": np.array([row[1] for row in rows], dtype=np.float64),
+        "track_id": np.array([row[2] for row in rows], dtype=np.int32),
+        "metric": np.array([row[3] for row in rows], dtype=np.int16),
+        "produced": np.array([row[4] is not None for row in rows], dtype=bool)
+    }
+    for field in RESULT_FIELDS:
+        columns[field] = np.array([row[4][field] if row[4] is not None and isinstance(row[4][field], (int, float))
+                                   else np.nan for row in rows], dtype=np.float64)
+    return columns, skipped
+
+
+def replay(paths, output, metric_names, workers=None, history_length=PoseMetrics.DEFAULT_HISTORY_LENGTH,
+           frame_interval=DEFAULT_FRAME_INTERVAL, minimum_confidence=None, angle_threshold=None, verbose=False,
+           start=None, end=None):
+    """
+    Replays sessions in parallel and writes every result to one columnar file.
+
+    Args:
+        paths(list[str]): Session files, each replayed in its own worker.
+        output(str): Path of the .npz file to write.
+        metric_names(list[str]): Names of the metrics to run.
+        workers(int): Number of worker processes, defaults to the number of CPUs.
+        history_length(int): Number of samples each person's history keeps.
+        frame_interval(float): Seconds between frames recorded without a timestamp.
+        minimum_confidence(float): Confidence score keypoints need, defaults to parser.MINIMUM_CONFIDENCE.
+        angle_threshold(float): Angle for positional_demo, defaults to PoseMetrics.ANGLE_THRESHOLD.
+        verbose(bool): Whether to keep the console logging of the metrics.
+        start(float): Earliest receive time in seconds of poses replayed from recordings.
+        end(float): Receive time in seconds poses replayed from recordings must be before.
+
+    Returns:
+        tuple[int, int]: Number of rows written and of malformed frames skipped across every session.
+    """
+    with ProcessPoolExecutor(max_workers=workers, initializer=configure,
+                             initargs=(minimum_confidence, angle_threshold, verbose)) as executor:
+        sessions = list(executor.map(replay_session, paths, [metric_names] * len(paths),
+                                    [history_length] * len(paths), [frame_interval] * len(paths),
+                                    [start] * len(paths), [end] * len(paths)))
+    results = [columns for columns, _ in sessions]
+    skipped = sum(session_skipped for _, session_skipped in sessions)
+    columns = {name: np.concatenate([result[name] for result in results]) for name in results[0]} if results \
+        else {}
+    columns["session"] = np.concatenate([np.full(len(result["frame"]), index, dtype=np.int32)
+                                         for index, result in enumerate(results)]) if results \
+        else np.zeros(0, dtype=np.int32)
+    np.savez(output, sessions=np.array(paths), metrics=np.array(metric_names), **columns)
+    return len(columns["session"]), skipped
+
+
+def main(arguments=None):
+    argument_parser = argparse.ArgumentParser(description="Replay recorded pose sessions through the pose metrics.")
+    argument_parser.add_argument("sessions", nargs="+",
+                                 help="Session files, .jsonl of /backend payloads or binary pose records.")
+    argument_parser.add_argument("-o", "--output", default="replay.npz", help="Columnar .npz file to write.")
+    argument_parser.add_argument("-m", "--metrics", nargs="+", default=[PoseParserNode.DEFAULT_METRIC],
+                                 choices=sorted(PoseMetrics.metric_list), help="Metrics to run.")
+    argument_parser.add_argument("-w", "--workers", type=int, default=None,
+                                 help="Worker processes, defaults to the number of CPUs.")
+    argument_parser.add_argument("--history-length", type=int, default=PoseMetrics.DEFAULT_HISTORY_LENGTH,
+                                 help="Samples kept to calculate averages from.")
+    argument_parser.add_argument("--frame-interval", type=float, default=DEFAULT_FRAME_INTERVAL,
+                                 help="Seconds between frames recorded without a timestamp.")
+    argument_parser.add_argument("--minimum-confidence", type=float, default=None,
+                                 help="Confidence score required of keypoints.")
+    argument_parser.add_argument("--angle-threshold", type=float, default=None,
+                                 help="Angle in degrees for positional_demo.")
+    argument_parser.add_argument("--start", type=float, default=None,
+                                 help="Earliest receive time, in seconds since the epoch, replayed from recordings.")
+    argument_parser.add_argument("--end", type=float, default=None,
+                                 help="Receive time, in seconds since the epoch, replayed poses must be before.")
+    argument_parser.add_argument("-v", "--verbose", action="store_true", help="Keep the metrics' console logging.")
+    args = argument_parser.parse_args(arguments)
+
+    rows, skipped = replay(args.sessions, args.output, args.metrics, args.workers, args.history_length,
+                           args.frame_interval, args.minimum_confidence, args.angle_threshold, args.verbose,
+                           args.start, args.end)
+    print("Wrote %s rows from %s sessions to %s, skipping %s malformed frames" % (rows, len(args.sessions),
+                                                                                args.output, skipped))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+"""
+Spreads the streams of pose records a parser receives across worker processes.
+
+Each stream id is mapped to a worker by a consistent hash ring, so every frame of a stream is handled by the same
+worker, which owns the metric state of the people in it, and changing the number of workers moves as few streams as
+possible. Batches are handed to workers through bounded queues without waiting; when a worker falls behind, new
+batches for it are dropped and counted rather than delaying the streams of every other worker.
+
+Each worker process keeps its own STATS. Workers send a snapshot of it back every STATS_INTERVAL and as they exit,
+and the pool keeps the latest from each so the parent can merge them into its own stats, see
+Stats.register_snapshots.
+"""
+
+import bisect
+import hashlib
+import multiprocessing
+import queue
+import threading
+
+import numpy as np
+
+from stats import STATS
+
+
+def stable_hash(key):
+    """
+    Args:
+        key: Value to hash, hashed by its string form.
+
+    Returns:
+        int: A hash that is the same in every process, unlike hash() of a string.
+    """
+    return int.from_bytes(hashlib.md5(str(key).encode("utf-8")).digest()[:8], "big")
+
+
+class ConsistentHashRing:
+    """
+    Maps keys to nodes, each node placed at many points of a hash ring so keys are spread evenly between them.
+    """
+    # Points on the ring per node.
+    DEFAULT_REPLICAS = 64
+
+    def __init__(self, nodes, replicas=DEFAULT_REPLICAS):
+        """
+        Args:
+            nodes(list): Nodes to map keys to.
+            replicas(int): Points on the ring per node.
+        """
+        self.replicas = max(1, int(replicas))
+        self.__points = []
+        self.__nodes = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        """
+        Args:
+            node: Node to place on the ring.
+        """
+        for replica in range(self.replicas):
+            point = stable_hash("%s#%s" % (node, replica))
+            index = bisect.bisect(self.__points, point)
+            self.__points.insert(index, point)
+            self.__nodes.insert(index, node)
+
+    def remove(self, node):
+        """
+        Args:
+            node: Node to take off the ring, its keys move to the nodes that follow it.
+        """
+        kept = [(point, other) for point, other in zip(self.__points, self.__nodes) if other != node]
+        self.__points = [point for point, _ in kept]
+        self.__nodes = [other for _, other in kept]
+
+    def node(self, key):
+        """
+        Args:
+            key: Key to look up, eg. a stream id.
+
+        Returns:
+            The node owning the key, the first clockwise from the key's hash.
+
+        Raises:
+            LookupError: If the ring has no nodes.
+        """
+        if not self.__points:
+            raise LookupError("Hash ring has no nodes")
+        index = bisect.bisect(self.__points, stable_hash(key)) % len(self.__points)
+        return self.__nodes[index]
+
+
+def report_stats(stats_queue):
+    """
+    Sends a snapshot of the stats of this worker process to its pool without waiting. A snapshot the pool has no
+    room for is skipped, as the next one includes everything in it.
+
+    Args:
+        stats_queue(multiprocessing.Queue): Stats queue the pool passed to the worker.
+    """
+    try:
+        stats_queue.put_nowait(STATS.snapshot())
+    except queue.Full:
+        pass
+
+
+class ShardPool:
+    """
+    Worker processes, each handed the pose records of the streams the hash ring maps to it.
+    Workers run target(records_queue, stats_queue, *args), should return once they take None from their records
+    queue and should call report_stats with their stats queue every STATS_INTERVAL and before returning.
+    """
+    # Batches queued for each worker before further batches for it are dropped.
+    DEFAULT_QUEUE_SIZE = 256
+    # Seconds between the stats snapshots each worker sends back.
+    STATS_INTERVAL = 1.0
+    # Snapshots waiting to be read from each worker before further snapshots are skipped.
+    STATS_QUEUE_SIZE = 4
+
+    def __init__(self, target, args=(), workers=None, queue_size=DEFAULT_QUEUE_SIZE):
+        """
+        Args:
+            target(callable): Module level function run by each worker process.
+            args(tuple): Further arguments passed to the target after the queue.
+            workers(int): Number of worker processes, defaults to the number of CPUs.
+            queue_size(int): Batches queued for each worker before further batches are dropped.
+        """
+        self.__target = target
+        self.__args = tuple(args)
+        self.workers = max(1, int(workers or multiprocessing.cpu_count()))
+        self.__queue_size = max(1, int(queue_size))
+        self.__ring = ConsistentHashRing(range(self.workers))
+        self.__queues = []
+        self.__stats_queues = []
+        self.__processes = []
+        # Latest stats snapshot of each worker, kept after the workers stop.
+        self.__snapshots = {}
+        self.__snapshots_lock = threading.Lock()
+        self.dispatched = [0] * self.workers
+        self.dropped = [0] * self.workers
+
+    def start(self):
+        """
+        Starts the worker processes. Workers are spawned rather than forked, so they can be started after the
+        server threads are running.
+        """
+        if self.__processes:
+            return
+        context = multiprocessing.get_context("spawn")
+        for _ in range(self.workers):
+            records_queue = context.Queue(self.__queue_size)
+            stats_queue = context.Queue(self.STATS_QUEUE_SIZE)
+            process = context.Process(target=self.__target, args=(records_queue, stats_queue) + self.__args,
+                                      daemon=True)
+            process.start()
+            self.__queues.append(records_queue)
+            self.__stats_queues.append(stats_queue)
+            self.__processes.append(process)
+
+    def stop(self, timeout=5.0):
+        """
+        Asks every worker to finish the batches already queued and waits for them to exit.
+
+        Args:
+            timeout(float): Seconds to wait for each worker before terminating it.
+        """
+        for records_queue in self.__queues:
+            try:
+                records_queue.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+        for process in self.__processes:
+            # Reading the stats queues lets a worker that is sending its last snapshot exit.
+            self.snapshots()
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self.snapshots()
+        self.__queues = []
+        self.__stats_queues = []
+        self.__processes = []
+
+    def shard(self, stream_id):
+        """
+        Args:
+            stream_id(int): Id of a stream.
+
+        Returns:
+            int: Index of the worker handling the stream.
+        """
+        return self.__ring.node(int(stream_id))
+
+    def dispatch(self, records):
+        """
+        Hands each stream's records to the worker owning it without waiting.
+
+        Args:
+            records(np.ndarray): Array of POSE_RECORD, from any number of streams.
+
+        Returns:
+            int: Number of records dropped because a worker's queue was full.
+        """
+        dropped = 0
+        stream_ids = records["stream_id"]
+        streams = np.unique(stream_ids)
+        for stream_id in streams:
+            batch = records if len(streams) == 1 else records[stream_ids == stream_id]
+            worker = self.shard(stream_id)
+            try:
+                self.__queues[worker].put_nowait(batch)
+                self.dispatched[worker] += len(batch)
+            except queue.Full:
+                self.dropped[worker] += len(batch)
+                dropped += len(batch)
+        return dropped
+
+    def snapshots(self):
+        """
+        Reads the stats snapshots the workers have sent without waiting.
+
+        Returns:
+            list[dict]: The latest stats snapshot of each worker that has sent one, see Stats.snapshot.
+        """
+        with self.__snapshots_lock:
+            for worker, stats_queue in enumerate(self.__stats_queues):
+                try:
+                    while True:
+                        self.__snapshots[worker] = stats_queue.get_nowait()
+                except queue.Empty:
+                    pass
+            return list(self.__snapshots.values())
+
+    def counters(self):
+        """
+        Returns:
+            dict[str, int]: Records dispatched and dropped across every worker, plus workers still alive.
+        """
+        return {
+            "workers": sum(1 for process in self.__processes if process.is_alive()),
+            "dispatched": sum(self.dispatched),
+            "dropped": sum(self.dropped)
+        }
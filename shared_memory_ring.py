@@ -0,0 +1,161 @@
+"""
+Shared memory ring buffer of pose records for when poser and parser run on the same host.
+
+One process writes pose records into a fixed number of slots in a multiprocessing.shared_memory block and any
+reader polls for new ones. Every record is stamped with an increasing sequence number, which lets a reader that
+falls behind tell how many records were overwritten before it could read them. Only one writer per ring is
+supported.
+
+A reader that restarts creates a new ring under the same name, so a writer must notice that the ring it attached to
+has been replaced rather than keep writing into a block nobody reads. Each ring is created with a random generation
+and is marked retired when its owner closes it or a new owner takes over its name. Writers check the mark on every
+write and compare the generation of the ring now under the name every so often, for an owner that was killed before
+it could retire its ring.
+"""
+
+import os
+from multiprocessing import shared_memory, resource_tracker
+from time import monotonic
+
+import numpy as np
+
+from pose_format import POSE_RECORD
+
+HEADER = np.dtype([("capacity", "<u8"), ("write_sequence", "<u8"), ("generation", "<u8"), ("retired", "<u8")])
+SLOT = np.dtype([("sequence", "<u8"), ("record", POSE_RECORD)])
+
+
+class SharedMemoryRing:
+    """
+    A fixed capacity ring of pose records in shared memory.
+    Sequence numbers start at 1, a slot sequence of 0 marks a slot that is being written.
+    """
+    DEFAULT_NAME = "pose_parser_ring"
+    DEFAULT_CAPACITY = 1024
+    # Seconds between checks by a writer that the name still refers to the ring it is attached to.
+    DEFAULT_CHECK_INTERVAL = 1.0
+
+    def __init__(self, name=DEFAULT_NAME, capacity=DEFAULT_CAPACITY, create=False,
+                 check_interval=DEFAULT_CHECK_INTERVAL):
+        """
+        Args:
+            name(str): Name of the shared memory block.
+            capacity(int): Number of record slots, only used when creating the ring.
+            create(bool): Whether to create the ring, otherwise an existing ring is attached to.
+            check_interval(float): Seconds between checks by replaced() that the name still refers to this ring.
+
+        Raises:
+            FileNotFoundError: If attaching to a ring that does not exist.
+        """
+        self.name = name
+        self.owner = create
+        self.check_interval = check_interval
+        if create:
+            try:
+                # Remove a ring left behind by a process that did not shut down cleanly, retiring it first so a
+                # writer still attached to it moves to the new ring.
+                stale = shared_memory.SharedMemory(name=name)
+                if stale.size >= HEADER.itemsize:
+                    np.ndarray((), dtype=HEADER, buffer=stale.buf)["retired"] = 1
+                stale.close()
+                stale.unlink()
+            except FileNotFoundError:
+                pass
+            size = HEADER.itemsize + SLOT.itemsize * int(capacity)
+            self.__memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            self.__memory = self.__attach(name)
+        self.__header = np.ndarray((), dtype=HEADER, buffer=self.__memory.buf)
+        if create:
+            self.__header["capacity"] = capacity
+            self.__header["write_sequence"] = 0
+            self.__header["generation"] = int.from_bytes(os.urandom(8), "little")
+            self.__header["retired"] = 0
+        self.capacity = int(self.__header["capacity"])
+        self.generation = int(self.__header["generation"])
+        self.__checked = monotonic()
+        self.__slots = np.ndarray((self.capacity,), dtype=SLOT, buffer=self.__memory.buf, offset=HEADER.itemsize)
+        self.next_sequence = int(self.__header["write_sequence"]) + 1
+        self.dropped = 0
+
+    @staticmethod
+    def __attach(name):
+        memory = shared_memory.SharedMemory(name=name)
+        # Attaching registers the block with this process's resource tracker, which would unlink it on exit.
+        resource_tracker.unregister(memory._name, "shared_memory")
+        return memory
+
+    def replaced(self):
+        """
+        Checks whether a writer should attach again because the ring's owner has retired it, or at most every
+        check_interval, because the name no longer refers to it.
+
+        Returns:
+            bool: Whether this ring is no longer the one readers poll.
+        """
+        if self.__header["retired"]:
+            return True
+        now = monotonic()
+        if now - self.__checked < self.check_interval:
+            return False
+        self.__checked = now
+        try:
+            current = self.__attach(self.name)
+        except FileNotFoundError:
+            return True
+        try:
+            return current.size < HEADER.itemsize or \
+                int(np.ndarray((), dtype=HEADER, buffer=current.buf)["generation"]) != self.generation
+        finally:
+            current.close()
+
+    def write(self, records):
+        """
+        Appends records to the ring, overwriting the oldest slots once it is full.
+
+        Args:
+            records(np.ndarray): Array of POSE_RECORD.
+        """
+        sequence = int(self.__header["write_sequence"])
+        for record in records:
+            sequence += 1
+            index = sequence % self.capacity
+            self.__slots["sequence"][index] = 0
+            self.__slots["record"][index] = record
+            self.__slots["sequence"][index] = sequence
+            self.__header["write_sequence"] = sequence
+
+    def read(self):
+        """
+        Copies every record written since the last read.
+        Records overwritten before they could be read are added to the dropped count.
+
+        Returns:
+            np.ndarray: Array of POSE_RECORD in the order written, empty when nothing new is available.
+        """
+        head = int(self.__header["write_sequence"])
+        if head < self.next_sequence:
+            return np.zeros(0, dtype=POSE_RECORD)
+        if head - self.next_sequence + 1 > self.capacity:
+            self.dropped += head - self.next_sequence + 1 - self.capacity
+            self.next_sequence = head - self.capacity + 1
+        sequences = np.arange(self.next_sequence, head + 1, dtype=np.uint64)
+        indexes = sequences % self.capacity
+        copied = self.__slots[indexes]
+        # A slot rewritten while being copied no longer holds the sequence it was copied for.
+        valid = (copied["sequence"] == sequences) & (self.__slots["sequence"][indexes] == sequences)
+        self.dropped += int(len(sequences) - np.count_nonzero(valid))
+        self.next_sequence = head + 1
+        return copied["record"][valid]
+
+    def close(self):
+        """
+        Detaches from the ring, removing it if this instance created it.
+        """
+        if self.owner:
+            self.__header["retired"] = 1
+        self.__header = None
+        self.__slots = None
+        self.__memory.close()
+        if self.owner:
+            self.__memory.unlink()
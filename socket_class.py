@@ -1,126 +1,1059 @@
-"""
-This class is derived from my older code and has been modified to suit this assignment.
--Nick Huppert, s3729119
-
-Essentially, this class is designed to handle the sending/receiving/listening portion
-of messaging over sockets. It can act as both a server (receiver) or a client (sender)
-and is mainly used to simplify the logic of using messages and make made code look neater.
-If run as a server (which is the default) it will call the function got_message() in the
-class that created it whenever a message is received.
-When creating an instance of this class, the callback generally should be set to "self" eg:
-socket_manager = SocketManager(self, port=int(port))
-"""
-
-import socket
-import threading
-from time import sleep
-import pickle
-
-
-class SocketManager:
-    """
-    Warnings:
-        Requires implementing classes to define a callback class that implements a
-        "got_message(self, address, message)" function.
-    """
-    DEFAULT_IP = "127.0.0.1"
-    MESSAGE_SEPARATOR_PATTERN = "-----"
-    DEFAULT_PORT = 5001
-    DEFAULT_PACKET_SIZE = 4096
-    DEFAULT_IDLE_TIMEOUT = 30
-    run = True
-
-    def __init__(self, callback, ip=DEFAULT_IP, port=DEFAULT_PORT, packet_size=DEFAULT_PACKET_SIZE,
-                 timeout=DEFAULT_IDLE_TIMEOUT, server=True):
-        self.__host_ip = ip
-        self.__host_port = port
-        self.__packet_size = packet_size
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        if server:
-            self.socket.bind((self.__host_ip, self.__host_port))
-        self.__timeout = timeout
-        self.callback = callback
-
-    def listen(self):
-        """
-        Starts the socket server listening for connections in new thread.
-        Each connection is dispatched to a new thread.
-        """
-        SocketManager.run = True
-        self.socket.listen()
-        threading.Thread(target=self.__listen_loop).start()
-        print("Now listening on port: %s" % self.__host_port)
-
-    def __listen_loop(self):
-        try:
-            while SocketManager.run is True:
-                self.socket.settimeout(self.__timeout)
-                try:
-                    client, address = self.socket.accept()
-                    client.settimeout(self.__timeout)
-                    threading.Thread(target=self.__server_action, args=(client, address)).start()
-                except socket.timeout:
-                    pass
-        except threading.ThreadError:
-            pass
-        finally:
-            self.socket.close()
-
-    # Parse the message received from a client and call appropriate function
-    def __server_action(self, client, address):
-        """
-        Args:
-            client: The client who has connected to the server
-            address: The address of the client
-        """
-        response = ""
-        try:
-            with client:
-                while True:
-                    message = client.recv(self.__packet_size)
-                    if message == b'':
-                        break
-                    if message is not None:
-                        response = str(self.callback.got_message(address, pickle.loads(message)))
-                        client.sendall(pickle.dumps(response))
-                        break
-                    else:
-                        break
-
-        except (TimeoutError, AttributeError, socket.timeout, ConnectionError, ConnectionRefusedError) as e:
-            print("%s" % e)
-        finally:
-            client.close()
-
-    def send_message(self, ip=DEFAULT_IP, port=DEFAULT_PORT, message=None):
-        """
-        Takes a string message and sends it to remote server, returning the response.
-
-        Args:
-            ip(str): IP address to connect to as string.
-            port(int): Port number to connect to.
-            message(any): The message to send to the remote server.
-
-        Returns:
-            any: The response of the server or None on error.
-         """
-        socket_connection = None
-        try:
-            socket_connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            response = None
-            socket_connection.connect((ip, int(port)))
-            socket_connection.sendall(pickle.dumps(message))
-            sleep(.1)
-            while response is None:
-                response = socket_connection.recv(self.__packet_size)
-            socket_connection.close()
-            return pickle.loads(response)
-        except (ConnectionRefusedError, AttributeError, socket.timeout, ConnectionError) as e:
-            # print("%s" % e)
-            return_value = "CONNECTION ERROR"
-        finally:
-            socket_connection.close()
-        return return_value
-
-    def stop_server(self):
-        SocketManager.run = False
+"""
+This class is derived from my older code and has been modified to suit this assignment.
+-Nick Huppert, s3729119
+
+Essentially, this class is designed to handle the sending/receiving/listening portion
+of messaging over sockets. It can act as both a server (receiver) or a client (sender)
+and is mainly used to simplify the logic of using messages and make made code look neater.
+If run as a server (which is the default) it will call the function got_message() in the
+class that created it whenever a message is received.
+When creating an instance of this class, the callback generally should be set to "self" eg:
+socket_manager = SocketManager(self, port=int(port))
+
+Clients created with persistent=True keep one long-lived connection per remote server and send
+length-prefixed frames over it instead of opening a new socket for every message. The server detects
+these connections from a short preamble and keeps reading frames until the client disconnects, so
+persistent and one-shot clients can talk to the same server.
+Servers run thread per connection by default. With server_mode=SERVER_MODE_SELECTOR every connection is
+instead multiplexed on a single selector loop. Either way got_message() runs on a fixed pool of worker threads fed
+by a bounded queue, see admission.WorkerPool. When the queue is full the overload policy of the message's stream
+sheds the oldest queued message, answers the new one with BUSY straight away, or holds it back until there is room.
+With transport=TRANSPORT_SHARED_MEMORY, for poser and parser on the same host, pose records skip the network
+entirely and are passed through a shared memory ring buffer that the server polls.
+Persistent connections also negotiate a codec. CODEC_POSE sends poses as fixed layout binary records (see
+pose_format) and replies as JSON, so neither end unpickles network input. CODEC_PICKLE is kept as a fallback
+for arbitrary messages and can be refused by servers created with allow_pickle=False. CODEC_JSON forwards
+pose_format.JsonPayload messages, the JSON clients sent to poser, so they are decoded only by the server, and falls
+back to pose records when a server does not accept it. CODEC_STATS connections
+are answered with the stage timings and counters of the server process instead, see query_stats.
+"""
+
+import json
+import selectors
+import socket
+import struct
+import threading
+from collections import deque
+from time import sleep, monotonic
+import pickle
+
+import numpy as np
+
+from admission import WorkerPool, FULL
+from pose_format import encode_poses, decode_poses, decode_json_payload, JsonPayload, POSE_RECORD
+from shared_memory_ring import SharedMemoryRing
+from stats import STATS
+
+# Codecs negotiated by persistent connections.
+CODEC_PICKLE = b"P"
+CODEC_POSE = b"K"
+CODEC_JSON = b"J"
+CODEC_STATS = b"S"
+CODEC_REJECTED = b"-"
+# Reply to a message shed by the worker pool of an overloaded server.
+BUSY = "BUSY"
+# Stream id at the start of CODEC_POSE and CODEC_JSON messages.
+STREAM_ID = struct.Struct("<I")
+
+
+def encode_message(codec, message):
+    """
+    Args:
+        codec(bytes): The negotiated codec.
+        message(any): The message to encode, a pose or list of poses for CODEC_POSE or a JsonPayload for
+            CODEC_JSON.
+
+    Returns:
+        bytes: The encoded message.
+
+    Raises:
+        ValueError: If the message cannot be encoded with the codec.
+    """
+    if isinstance(message, JsonPayload):
+        if codec == CODEC_JSON:
+            return message.encode()
+        # The server does not take JSON, so decode it here instead.
+        message = message.records()
+    if codec == CODEC_JSON:
+        raise ValueError("Only JSON payloads can be sent with the JSON codec")
+    if codec == CODEC_POSE:
+        return encode_poses(message)
+    if codec == CODEC_STATS:
+        # Every message is a stats query, so there is nothing to send.
+        return b""
+    return pickle.dumps(message)
+
+
+def decode_message(codec, payload):
+    """
+    Args:
+        codec(bytes): The negotiated codec.
+        payload(bytes): An encoded message.
+
+    Returns:
+        any: The message, an array of pose records for CODEC_POSE and CODEC_JSON.
+    """
+    if codec == CODEC_POSE:
+        return decode_poses(payload)
+    if codec == CODEC_JSON:
+        try:
+            return decode_json_payload(payload)
+        except ValueError as e:
+            # Bad JSON from one client should not cost poser its connection, so it is counted and skipped.
+            STATS.increment("socket_payloads_rejected")
+            print("%s" % e)
+            return np.zeros(0, dtype=POSE_RECORD)
+    return pickle.loads(payload)
+
+
+def encode_reply(codec, response):
+    if codec in (CODEC_POSE, CODEC_JSON, CODEC_STATS):
+        return json.dumps(response, default=str).encode("utf-8")
+    return pickle.dumps(str(response))
+
+
+def decode_reply(codec, payload):
+    if codec in (CODEC_POSE, CODEC_JSON, CODEC_STATS):
+        return json.loads(payload.decode("utf-8"))
+    return pickle.loads(payload)
+
+
+def message_stream(codec, payload, address):
+    """
+    Reads which stream a message belongs to without decoding it.
+
+    Args:
+        codec(bytes): The negotiated codec.
+        payload(bytes): An encoded message.
+        address: Address of the client that sent the message.
+
+    Returns:
+        The stream id of the first pose for CODEC_POSE and CODEC_JSON, otherwise the address of the client.
+    """
+    if codec in (CODEC_POSE, CODEC_JSON) and len(payload) >= STREAM_ID.size:
+        return STREAM_ID.unpack_from(payload)[0]
+    return address
+
+
+def choose_codec(offered, accepted):
+    """
+    Args:
+        offered(bytes): Codecs offered by a client, in order of preference.
+        accepted(tuple[bytes]): Codecs the server accepts.
+
+    Returns:
+        bytes: The first offered codec that is accepted, or CODEC_REJECTED.
+    """
+    for index in range(len(offered)):
+        if offered[index:index + 1] in accepted:
+            return offered[index:index + 1]
+    return CODEC_REJECTED
+
+
+class FramedStream:
+    """
+    Wraps a connected socket to send and receive length-prefixed messages.
+    Each frame is a 4 byte big-endian payload length followed by the payload itself.
+    """
+    HEADER = struct.Struct("!I")
+    MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+    def __init__(self, connection, packet_size, initial=b""):
+        """
+        Args:
+            connection(socket.socket): A connected socket.
+            packet_size(int): Size of each read from the socket.
+            initial(bytes): Bytes already read from the socket that belong to the stream.
+        """
+        self.connection = connection
+        self.__packet_size = packet_size
+        self.__buffer = bytearray(initial)
+
+    def read_exactly(self, size):
+        """
+        Reads an exact number of bytes from the stream.
+
+        Args:
+            size(int): Number of bytes to read.
+
+        Returns:
+            bytes: The bytes read, or None if the peer closed the connection before any were buffered.
+        """
+        while len(self.__buffer) < size:
+            chunk = self.connection.recv(max(self.__packet_size, size - len(self.__buffer)))
+            if chunk == b'':
+                if len(self.__buffer) == 0:
+                    return None
+                raise ConnectionError("Connection closed part way through a frame")
+            self.__buffer += chunk
+        data = bytes(self.__buffer[:size])
+        del self.__buffer[:size]
+        return data
+
+    def receive(self):
+        """
+        Returns:
+            bytes: The payload of the next frame, or None if the peer closed the connection.
+        """
+        header = self.read_exactly(self.HEADER.size)
+        if header is None:
+            return None
+        size = self.HEADER.unpack(header)[0]
+        if size > self.MAX_FRAME_SIZE:
+            raise ConnectionError("Frame of %s bytes exceeds maximum frame size" % size)
+        payload = self.read_exactly(size)
+        if payload is None:
+            raise ConnectionError("Connection closed part way through a frame")
+        return payload
+
+    def send(self, payload):
+        """
+        Args:
+            payload(bytes): The payload to send as a single frame.
+        """
+        self.connection.sendall(self.HEADER.pack(len(payload)) + payload)
+
+    def send_raw(self, data):
+        """
+        Args:
+            data(bytes): Bytes to send without a frame header.
+        """
+        self.connection.sendall(data)
+
+
+class PersistentConnection:
+    """
+    A long-lived framed connection from a client to one server.
+    Reconnects automatically when the connection drops and optionally pipelines several messages, only
+    waiting on a reply once pipeline_depth messages are in flight.
+    """
+
+    def __init__(self, ip, port, packet_size, timeout, pipeline_depth=1, preamble=b"", codecs=(CODEC_PICKLE,)):
+        """
+        Args:
+            ip(str): IP address to connect to.
+            port(int): Port number to connect to.
+            packet_size(int): Size of each read from the socket.
+            timeout(float): Socket timeout in seconds.
+            pipeline_depth(int): Number of messages that may be in flight before waiting on a reply.
+            preamble(bytes): Bytes sent once on each new connection before any frames.
+            codecs(tuple[bytes]): Codecs to offer the server, in order of preference.
+        """
+        self.__address = (ip, int(port))
+        self.__packet_size = packet_size
+        self.__timeout = timeout
+        self.__pipeline_depth = max(1, int(pipeline_depth))
+        self.__preamble = preamble
+        self.__codecs = tuple(codecs)
+        self.codec = None
+        self.__stream = None
+        self.__in_flight = 0
+        self.__lock = threading.Lock()
+
+    def __connect(self):
+        connection = socket.create_connection(self.__address, timeout=self.__timeout)
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.__stream = FramedStream(connection, self.__packet_size)
+        self.__in_flight = 0
+        connection.sendall(self.__preamble + bytes([len(self.__codecs)]) + b"".join(self.__codecs))
+        codec = self.__stream.read_exactly(1)
+        if codec not in self.__codecs:
+            self.__close()
+            raise ConnectionError("Server accepted none of the offered codecs")
+        self.codec = codec
+
+    def close(self):
+        with self.__lock:
+            self.__close()
+
+    def __close(self):
+        if self.__stream is not None:
+            try:
+                self.__stream.connection.close()
+            except OSError:
+                pass
+        self.__stream = None
+        self.__in_flight = 0
+
+    def request(self, message):
+        """
+        Sends a message, reconnecting and retrying once if the connection has dropped.
+
+        Args:
+            message(any): The message to send, encoded with the negotiated codec.
+
+        Returns:
+            any: The oldest outstanding reply once the pipeline is full, or None if the reply is still in flight.
+        """
+        with self.__lock:
+            for attempt in range(2):
+                try:
+                    if self.__stream is None:
+                        self.__connect()
+                    self.__stream.send(encode_message(self.codec, message))
+                    self.__in_flight += 1
+                    reply = None
+                    while self.__in_flight >= self.__pipeline_depth:
+                        reply = self.__receive_reply()
+                    return reply
+                except (OSError, ConnectionError):
+                    self.__close()
+                    if attempt == 1:
+                        raise
+
+    def flush(self):
+        """
+        Waits for every in-flight reply.
+
+        Returns:
+            any: The most recent reply, or None if nothing was in flight.
+        """
+        with self.__lock:
+            reply = None
+            try:
+                while self.__in_flight > 0:
+                    reply = self.__receive_reply()
+            except (OSError, ConnectionError):
+                self.__close()
+                raise
+            return reply
+
+    def __receive_reply(self):
+        reply = self.__stream.receive()
+        if reply is None:
+            raise ConnectionError("Server closed the connection")
+        self.__in_flight -= 1
+        return decode_reply(self.codec, reply)
+
+
+class SelectorConnection:
+    """
+    State of one client connection served by a SelectorServer.
+    """
+    # Connection modes, decided from the first bytes the client sends.
+    UNKNOWN = 0
+    LEGACY = 1
+    NEGOTIATING = 2
+    FRAMED = 3
+
+    def __init__(self, client, address):
+        self.client = client
+        self.address = address
+        self.mode = SelectorConnection.UNKNOWN
+        self.codec = CODEC_PICKLE
+        self.inbound = bytearray()
+        self.outbound = bytearray()
+        self.pending = deque()
+        self.busy = False
+        # Whether the first pending message is being held back until the worker pool has room.
+        self.held_back = False
+        self.reading = True
+        # Events the connection is currently registered with the selector for.
+        self.events = selectors.EVENT_READ
+        self.close_after_write = False
+        self.last_active = monotonic()
+
+
+class SelectorServer:
+    """
+    Serves every client connection from a single selector loop.
+    Frames are read and written without blocking on the loop thread while got_message() calls run on a bounded
+    pool of worker threads. Messages from one connection are handled one at a time, in order, so replies to
+    pipelined frames come back in the order they were sent. Messages of streams with POLICY_BLOCK stay in their
+    connection's pending queue while the pool is full, so the loop thread itself never waits.
+    """
+    # Stop reading from a connection while this many of its frames are waiting on a worker.
+    MAX_PENDING_FRAMES = 64
+    SELECT_TIMEOUT = 1.0
+    # Connections beyond this many are closed as soon as they are accepted.
+    DEFAULT_MAX_CONNECTIONS = 256
+
+    def __init__(self, listen_socket, callback, preamble, accepted_codecs, packet_size, timeout, pool,
+                 max_connections=DEFAULT_MAX_CONNECTIONS):
+        """
+        Args:
+            listen_socket(socket.socket): Bound socket that is already listening.
+            callback: Object implementing got_message(address, message).
+            preamble(bytes): Preamble sent by persistent clients.
+            accepted_codecs(tuple[bytes]): Codecs the server accepts.
+            packet_size(int): Size of each read from a socket.
+            timeout(float): Seconds before an idle connection is closed.
+            pool(WorkerPool): Workers running got_message(), started and stopped with the server.
+            max_connections(int): Connections served at once, further connections are closed.
+        """
+        self.__listen_socket = listen_socket
+        self.callback = callback
+        self.__preamble = preamble
+        self.__accepted_codecs = accepted_codecs
+        self.__packet_size = packet_size
+        self.__timeout = timeout
+        self.__pool = pool
+        self.__max_connections = max_connections
+        self.__selector = selectors.DefaultSelector()
+        self.__completed = deque()
+        # Connections with a message held back until the pool has room.
+        self.__blocked = deque()
+        self.__wake_receiver, self.__wake_sender = socket.socketpair()
+        self.__connections = set()
+
+    def serve(self):
+        """
+        Runs the selector loop until SocketManager.run is cleared.
+        """
+        self.__listen_socket.setblocking(False)
+        self.__wake_receiver.setblocking(False)
+        self.__selector.register(self.__listen_socket, selectors.EVENT_READ, None)
+        self.__selector.register(self.__wake_receiver, selectors.EVENT_READ, self.__wake_receiver)
+        self.__pool.start()
+        last_sweep = monotonic()
+        try:
+            while SocketManager.run is True:
+                for key, events in self.__selector.select(self.SELECT_TIMEOUT):
+                    if key.data is None:
+                        self.__accept()
+                    elif key.data is self.__wake_receiver:
+                        self.__drain_wake()
+                    else:
+                        if events & selectors.EVENT_READ:
+                            self.__read(key.data)
+                        if events & selectors.EVENT_WRITE and key.data in self.__connections:
+                            self.__write(key.data)
+                self.__complete()
+                if monotonic() - last_sweep > self.SELECT_TIMEOUT:
+                    self.__close_idle()
+                    last_sweep = monotonic()
+        finally:
+            self.__pool.stop()
+            for connection in list(self.__connections):
+                self.__close(connection)
+            self.__selector.close()
+            self.__wake_receiver.close()
+            self.__wake_sender.close()
+            self.__listen_socket.close()
+
+    def __accept(self):
+        while True:
+            try:
+                client, address = self.__listen_socket.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            if len(self.__connections) >= self.__max_connections:
+                STATS.increment("socket_connections_shed")
+                client.close()
+                continue
+            client.setblocking(False)
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection = SelectorConnection(client, address)
+            STATS.increment("socket_connections_accepted")
+            self.__connections.add(connection)
+            self.__selector.register(client, selectors.EVENT_READ, connection)
+
+    def __drain_wake(self):
+        try:
+            while self.__wake_receiver.recv(self.__packet_size):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+
+    def __read(self, connection):
+        try:
+            with STATS.timer("socket_recv"):
+                data = connection.client.recv(self.__packet_size)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            print("%s" % e)
+            STATS.increment("socket_errors")
+            self.__close(connection)
+            return
+        if data == b'':
+            if connection.busy or connection.pending or connection.outbound:
+                connection.reading = False
+                connection.close_after_write = True
+                self.__update(connection)
+            else:
+                self.__close(connection)
+            return
+        connection.last_active = monotonic()
+        connection.inbound += data
+        try:
+            self.__parse(connection)
+        except (ConnectionError, ValueError) as e:
+            print("%s" % e)
+            STATS.increment("socket_errors")
+            self.__close(connection)
+            return
+        self.__dispatch(connection)
+        self.__update(connection)
+
+    def __parse(self, connection):
+        """
+        Moves every complete message in the inbound buffer of a connection to its pending queue.
+        """
+        if connection.mode == SelectorConnection.UNKNOWN:
+            if connection.inbound[:1] == self.__preamble[:1]:
+                connection.mode = SelectorConnection.NEGOTIATING
+            else:
+                connection.mode = SelectorConnection.LEGACY
+        if connection.mode == SelectorConnection.LEGACY:
+            # One-shot clients send a single message per connection, as read by a single recv.
+            if CODEC_PICKLE not in self.__accepted_codecs:
+                raise ConnectionError("Refusing pickled message from %s" % str(connection.address))
+            connection.pending.append(bytes(connection.inbound))
+            connection.inbound.clear()
+            connection.reading = False
+            connection.close_after_write = True
+            return
+        if connection.mode == SelectorConnection.NEGOTIATING:
+            header_size = len(self.__preamble) + 1
+            if len(connection.inbound) < header_size or \
+                    len(connection.inbound) < header_size + connection.inbound[header_size - 1]:
+                return
+            if bytes(connection.inbound[:len(self.__preamble)]) != self.__preamble:
+                raise ConnectionError("Invalid preamble from %s" % str(connection.address))
+            offered = bytes(connection.inbound[header_size:header_size + connection.inbound[header_size - 1]])
+            del connection.inbound[:header_size + len(offered)]
+            connection.codec = choose_codec(offered, self.__accepted_codecs)
+            connection.outbound += connection.codec
+            if connection.codec == CODEC_REJECTED:
+                connection.reading = False
+                connection.close_after_write = True
+                return
+            connection.mode = SelectorConnection.FRAMED
+        header = FramedStream.HEADER
+        while len(connection.inbound) >= header.size:
+            size = header.unpack_from(connection.inbound)[0]
+            if size > FramedStream.MAX_FRAME_SIZE:
+                raise ConnectionError("Frame of %s bytes exceeds maximum frame size" % size)
+            if len(connection.inbound) < header.size + size:
+                break
+            connection.pending.append(bytes(connection.inbound[header.size:header.size + size]))
+            del connection.inbound[:header.size + size]
+        if len(connection.pending) >= self.MAX_PENDING_FRAMES:
+            connection.reading = False
+
+    def __dispatch(self, connection):
+        if connection.busy or not connection.pending:
+            return
+        payload = connection.pending[0]
+        connection.busy = True
+        status = self.__pool.submit(message_stream(connection.codec, payload, connection.address),
+                                    lambda: self.__handle(connection, payload), lambda: self.__shed(connection),
+                                    wait=False, retry=connection.held_back)
+        connection.held_back = status == FULL
+        if connection.held_back:
+            connection.busy = False
+            if connection not in self.__blocked:
+                self.__blocked.append(connection)
+            return
+        connection.pending.popleft()
+
+    def __handle(self, connection, payload):
+        """
+        Runs on a worker thread. Decodes a message, passes it to the callback and queues the encoded reply.
+        Whatever fails, the message is always finished, closing the connection without a reply on failure, so a
+        connection is never left waiting for a reply that will not come.
+        """
+        reply = None
+        try:
+            if connection.codec == CODEC_STATS:
+                response = STATS.snapshot()
+            else:
+                with STATS.timer("socket_decode"):
+                    message = decode_message(connection.codec, payload)
+                response = self.callback.got_message(connection.address, message)
+            reply = self.__frame_reply(connection, encode_reply(connection.codec, response))
+        except Exception as e:
+            print("%s" % e)
+            STATS.increment("socket_errors")
+        finally:
+            self.__finish(connection, reply)
+
+    def __shed(self, connection):
+        """
+        Answers a message shed by the worker pool with BUSY, on whichever thread shed it.
+        """
+        STATS.increment("socket_messages_shed")
+        self.__finish(connection, self.__frame_reply(connection, encode_reply(connection.codec, BUSY)))
+
+    @staticmethod
+    def __frame_reply(connection, reply):
+        if connection.mode == SelectorConnection.FRAMED:
+            return FramedStream.HEADER.pack(len(reply)) + reply
+        return reply
+
+    def __finish(self, connection, reply):
+        """
+        Hands the reply to a message back to the loop thread, None to close the connection.
+        """
+        self.__completed.append((connection, reply))
+        try:
+            self.__wake_sender.send(b"\0")
+        except OSError:
+            pass
+
+    def __complete(self):
+        while self.__completed:
+            connection, reply = self.__completed.popleft()
+            if connection not in self.__connections:
+                continue
+            connection.busy = False
+            if reply is None:
+                self.__close(connection)
+                continue
+            connection.outbound += reply
+            if not connection.close_after_write and len(connection.pending) < self.MAX_PENDING_FRAMES:
+                connection.reading = True
+            self.__dispatch(connection)
+            self.__write(connection)
+        for _ in range(len(self.__blocked)):
+            connection = self.__blocked.popleft()
+            if connection in self.__connections:
+                self.__dispatch(connection)
+
+    def __write(self, connection):
+        if connection.outbound:
+            try:
+                sent = connection.client.send(connection.outbound)
+                del connection.outbound[:sent]
+            except (BlockingIOError, InterruptedError):
+                pass
+            except OSError as e:
+                print("%s" % e)
+                self.__close(connection)
+                return
+        if not connection.outbound and connection.close_after_write and not connection.busy \
+                and not connection.pending:
+            self.__close(connection)
+            return
+        self.__update(connection)
+
+    def __update(self, connection):
+        if connection not in self.__connections:
+            return
+        events = selectors.EVENT_READ if connection.reading else 0
+        if connection.outbound:
+            events |= selectors.EVENT_WRITE
+        if events == connection.events:
+            return
+        if connection.events == 0:
+            self.__selector.register(connection.client, events, connection)
+        elif events == 0:
+            self.__selector.unregister(connection.client)
+        else:
+            self.__selector.modify(connection.client, events, connection)
+        connection.events = events
+
+    def __close_idle(self):
+        now = monotonic()
+        for connection in list(self.__connections):
+            if not connection.busy and now - connection.last_active > self.__timeout:
+                self.__close(connection)
+
+    def __close(self, connection):
+        if connection not in self.__connections:
+            return
+        self.__connections.discard(connection)
+        if connection.events != 0:
+            self.__selector.unregister(connection.client)
+        connection.client.close()
+
+
+class SocketManager:
+    """
+    Warnings:
+        Requires implementing classes to define a callback class that implements a
+        "got_message(self, address, message)" function.
+    """
+    DEFAULT_IP = "127.0.0.1"
+    MESSAGE_SEPARATOR_PATTERN = "-----"
+    DEFAULT_PORT = 5001
+    DEFAULT_PACKET_SIZE = 4096
+    DEFAULT_IDLE_TIMEOUT = 30
+    DEFAULT_PIPELINE_DEPTH = 1
+    SERVER_MODE_THREADED = "threaded"
+    SERVER_MODE_SELECTOR = "selector"
+    TRANSPORT_TCP = "tcp"
+    TRANSPORT_SHARED_MEMORY = "shared_memory"
+    # Transport used when none is given, switch to TRANSPORT_SHARED_MEMORY when poser and parser share a host.
+    DEFAULT_TRANSPORT = TRANSPORT_TCP
+    # Seconds between polls of an empty shared memory ring.
+    DEFAULT_POLL_INTERVAL = 0.0005
+    # Sent by persistent clients when connecting. Pickled messages always start with b"\x80" so cannot clash.
+    FRAMED_PREAMBLE = b"PPF1"
+    run = True
+
+    def __init__(self, callback, ip=DEFAULT_IP, port=DEFAULT_PORT, packet_size=DEFAULT_PACKET_SIZE,
+                 timeout=DEFAULT_IDLE_TIMEOUT, server=True, persistent=False, pipeline_depth=DEFAULT_PIPELINE_DEPTH,
+                 codecs=(CODEC_PICKLE,), allow_pickle=True, server_mode=SERVER_MODE_THREADED,
+                 workers=WorkerPool.DEFAULT_WORKERS, transport=None, ring_name=SharedMemoryRing.DEFAULT_NAME,
+                 ring_capacity=SharedMemoryRing.DEFAULT_CAPACITY, queue_size=WorkerPool.DEFAULT_QUEUE_SIZE,
+                 overload_policy=WorkerPool.DEFAULT_POLICY, stream_policies=None,
+                 max_connections=SelectorServer.DEFAULT_MAX_CONNECTIONS):
+        """
+        Args:
+            callback: Object implementing got_message(address, message), or None for send only clients.
+            ip(str): IP address to bind to when running as a server.
+            port(int): Port to bind to when running as a server.
+            packet_size(int): Size of each read from a socket.
+            timeout(float): Idle timeout in seconds for sockets.
+            server(bool): Whether to bind the socket for listening.
+            persistent(bool): Whether send_message keeps a long-lived framed connection to each server.
+            pipeline_depth(int): Messages allowed in flight on a persistent connection before waiting on a reply.
+            codecs(tuple[bytes]): Codecs persistent connections offer to servers, in order of preference.
+            allow_pickle(bool): Whether the server accepts pickled messages from clients.
+            server_mode(str): SERVER_MODE_THREADED for a thread per connection or SERVER_MODE_SELECTOR to
+                multiplex every connection on one selector loop.
+            workers(int): Worker threads running got_message().
+            transport(str): TRANSPORT_TCP or TRANSPORT_SHARED_MEMORY, defaults to DEFAULT_TRANSPORT.
+            ring_name(str): Name of the shared memory ring.
+            ring_capacity(int): Records held by the shared memory ring, used by the server that creates it.
+            queue_size(int): Messages that may wait for a worker before the overload policy applies.
+            overload_policy(str): What happens to messages when the queue is full, one of WorkerPool.POLICIES.
+            stream_policies(dict): Overload policy of particular streams by stream id, or by client address for
+                pickled messages.
+            max_connections(int): Connections served at once, further connections are closed.
+        """
+        self.__host_ip = ip
+        self.__host_port = port
+        self.__packet_size = packet_size
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if server:
+            self.socket.bind((self.__host_ip, self.__host_port))
+        self.__timeout = timeout
+        self.__persistent = persistent
+        self.__pipeline_depth = pipeline_depth
+        self.__codecs = tuple(codecs)
+        self.__server_codecs = (CODEC_POSE, CODEC_JSON, CODEC_STATS) + ((CODEC_PICKLE,) if allow_pickle else ())
+        self.__connections = {}
+        self.__connections_lock = threading.Lock()
+        self.__server_mode = server_mode
+        self.__pool = WorkerPool(workers, queue_size, overload_policy, stream_policies)
+        self.__max_connections = max_connections
+        self.__active_connections = 0
+        self.__transport = SocketManager.DEFAULT_TRANSPORT if transport is None else transport
+        self.__ring_name = ring_name
+        self.__ring_capacity = ring_capacity
+        self.__ring = None
+        self.callback = callback
+
+    def listen(self):
+        """
+        Starts the socket server listening for connections in new thread.
+        Each connection is dispatched to a new thread, or in selector mode multiplexed on the listening thread.
+        With the shared memory transport a ring is created and polled instead.
+        """
+        SocketManager.run = True
+        if self.__transport == self.TRANSPORT_SHARED_MEMORY:
+            self.__ring = SharedMemoryRing(self.__ring_name, self.__ring_capacity, create=True)
+            STATS.register_gauges("ring", lambda: {"dropped": self.__ring.dropped if self.__ring else 0})
+            threading.Thread(target=self.__ring_loop).start()
+            print("Now polling shared memory ring: %s" % self.__ring_name)
+            return
+        self.socket.listen()
+        STATS.register_gauges("server", self.__pool.counters)
+        if self.__server_mode == self.SERVER_MODE_SELECTOR:
+            server = SelectorServer(self.socket, self.callback, self.FRAMED_PREAMBLE, self.__server_codecs,
+                                    self.__packet_size, self.__timeout, self.__pool, self.__max_connections)
+            threading.Thread(target=server.serve).start()
+        else:
+            self.__pool.start()
+            threading.Thread(target=self.__listen_loop).start()
+        print("Now listening on port: %s" % self.__host_port)
+
+    def __listen_loop(self):
+        try:
+            self.socket.settimeout(self.__timeout)
+            while SocketManager.run is True:
+                try:
+                    client, address = self.socket.accept()
+                    with self.__connections_lock:
+                        accepted = self.__active_connections < self.__max_connections
+                        if accepted:
+                            self.__active_connections += 1
+                    if not accepted:
+                        STATS.increment("socket_connections_shed")
+                        client.close()
+                        continue
+                    client.settimeout(self.__timeout)
+                    STATS.increment("socket_connections_accepted")
+                    threading.Thread(target=self.__server_action, args=(client, address)).start()
+                except socket.timeout:
+                    pass
+        except threading.ThreadError:
+            pass
+        finally:
+            self.__pool.stop()
+            self.socket.close()
+
+    def __run_in_pool(self, stream, task):
+        """
+        Runs a task on the worker pool and waits for it, the calling connection thread never runs got_message().
+
+        Args:
+            stream: Id of the stream the task belongs to.
+            task(callable): Function to run.
+
+        Returns:
+            The result of the task, or BUSY if the task was shed.
+
+        Raises:
+            Exception: Whatever the task raised.
+        """
+        outcome = []
+        done = threading.Event()
+
+        def run():
+            try:
+                outcome.append((True, task()))
+            except Exception as e:
+                outcome.append((False, e))
+            finally:
+                done.set()
+
+        def shed():
+            STATS.increment("socket_messages_shed")
+            outcome.append((True, BUSY))
+            done.set()
+
+        self.__pool.submit(stream, run, shed)
+        done.wait()
+        succeeded, result = outcome[0]
+        if not succeeded:
+            raise result
+        return result
+
+    def __ring_loop(self):
+        address = (self.TRANSPORT_SHARED_MEMORY, self.__ring_name)
+        try:
+            while SocketManager.run is True:
+                records = self.__ring.read()
+                if len(records) > 0:
+                    self.callback.got_message(address, records)
+                else:
+                    sleep(self.DEFAULT_POLL_INTERVAL)
+        finally:
+            self.__ring.close()
+            self.socket.close()
+
+    # Parse the message received from a client and call appropriate function
+    def __server_action(self, client, address):
+        """
+        Args:
+            client: The client who has connected to the server
+            address: The address of the client
+        """
+        response = ""
+        try:
+            with client:
+                while True:
+                    with STATS.timer("socket_recv"):
+                        message = client.recv(self.__packet_size)
+                    if message == b'':
+                        break
+                    if message[:1] == self.FRAMED_PREAMBLE[:1]:
+                        self.__serve_framed(client, address, message)
+                        break
+                    if CODEC_PICKLE not in self.__server_codecs:
+                        print("Refusing pickled message from %s" % str(address))
+                        break
+                    if message is not None:
+                        with STATS.timer("socket_decode"):
+                            message = pickle.loads(message)
+                        response = str(self.__run_in_pool(address,
+                                                          lambda: self.callback.got_message(address, message)))
+                        client.sendall(pickle.dumps(response))
+                        break
+                    else:
+                        break
+
+        except (TimeoutError, AttributeError, socket.timeout, ConnectionError, ConnectionRefusedError,
+                ValueError, pickle.UnpicklingError) as e:
+            print("%s" % e)
+            STATS.increment("socket_errors")
+        finally:
+            client.close()
+            with self.__connections_lock:
+                self.__active_connections -= 1
+
+    def __serve_framed(self, client, address, initial):
+        """
+        Keeps reading frames from a persistent client and replying to each until the client disconnects.
+
+        Args:
+            client: The client who has connected to the server
+            address: The address of the client
+            initial(bytes): Data already read from the client, starting with the framed preamble.
+        """
+        client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        stream = FramedStream(client, self.__packet_size, initial)
+        if stream.read_exactly(len(self.FRAMED_PREAMBLE)) != self.FRAMED_PREAMBLE:
+            raise ConnectionError("Invalid preamble from %s" % str(address))
+        codec = self.__negotiate_codec(stream)
+        if codec == CODEC_REJECTED:
+            return
+        while SocketManager.run is True:
+            payload = stream.receive()
+            if payload is None:
+                break
+            if codec == CODEC_STATS:
+                response = STATS.snapshot()
+            else:
+                with STATS.timer("socket_decode"):
+                    message = decode_message(codec, payload)
+                response = self.__run_in_pool(message_stream(codec, payload, address),
+                                              lambda: self.callback.got_message(address, message))
+            stream.send(encode_reply(codec, response))
+
+    def __negotiate_codec(self, stream):
+        """
+        Reads the codecs offered by a persistent client and replies with the first one this server accepts.
+
+        Returns:
+            bytes: The chosen codec, or CODEC_REJECTED if none were acceptable.
+        """
+        count = stream.read_exactly(1)
+        offered = stream.read_exactly(count[0]) if count else None
+        if offered is None:
+            raise ConnectionError("Connection closed during codec negotiation")
+        codec = choose_codec(offered, self.__server_codecs)
+        stream.send_raw(codec)
+        return codec
+
+    def send_message(self, ip=DEFAULT_IP, port=DEFAULT_PORT, message=None):
+        """
+        Takes a string message and sends it to remote server, returning the response.
+        Persistent clients reuse one framed connection per server. With a pipeline_depth above 1 the
+        response returned is the oldest outstanding one, or None while the pipeline is still filling.
+
+        Args:
+            ip(str): IP address to connect to as string.
+            port(int): Port number to connect to.
+            message(any): The message to send to the remote server.
+
+        Returns:
+            any: The response of the server or None on error.
+         """
+        with STATS.timer("socket_send"):
+            if self.__transport == self.TRANSPORT_SHARED_MEMORY:
+                return self.__send_shared_memory(message)
+            if self.__persistent:
+                return self.__send_persistent(ip, port, message)
+            return self.__send_once(ip, port, message)
+
+    def __send_once(self, ip, port, message):
+        socket_connection = None
+        try:
+            socket_connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            response = None
+            socket_connection.connect((ip, int(port)))
+            socket_connection.sendall(pickle.dumps(message))
+            while response is None:
+                response = socket_connection.recv(self.__packet_size)
+            socket_connection.close()
+            return pickle.loads(response)
+        except (ConnectionRefusedError, AttributeError, socket.timeout, ConnectionError, EOFError) as e:
+            # print("%s" % e)
+            return_value = "CONNECTION ERROR"
+        finally:
+            socket_connection.close()
+        return return_value
+
+    def __send_shared_memory(self, message):
+        """
+        Writes pose records into the server's shared memory ring. There is no reply so None is returned on success.
+        The ring is attached to again once the server has replaced it, eg. because the server restarted, or after a
+        write fails.
+        """
+        try:
+            if self.__ring is not None and self.__ring.replaced():
+                STATS.increment("socket_ring_reattached")
+                self.__detach_ring()
+            if self.__ring is None:
+                self.__ring = SharedMemoryRing(self.__ring_name)
+            if isinstance(message, JsonPayload):
+                message = message.records()
+            self.__ring.write(decode_poses(encode_poses(message)))
+            return None
+        except ValueError as e:
+            print("%s" % e)
+            return "ENCODING ERROR"
+        except FileNotFoundError:
+            return "CONNECTION ERROR"
+        except OSError as e:
+            print("%s" % e)
+            self.__detach_ring()
+            return "CONNECTION ERROR"
+
+    def __detach_ring(self):
+        if self.__ring is not None:
+            try:
+                self.__ring.close()
+            except OSError as e:
+                print("%s" % e)
+            self.__ring = None
+
+    def __send_persistent(self, ip, port, message):
+        try:
+            return self.__connection(ip, port).request(message)
+        except ValueError as e:
+            print("%s" % e)
+            return "ENCODING ERROR"
+        except (ConnectionRefusedError, AttributeError, socket.timeout, ConnectionError, OSError):
+            return "CONNECTION ERROR"
+
+    def __connection(self, ip, port):
+        key = (ip, int(port))
+        with self.__connections_lock:
+            connection = self.__connections.get(key)
+            if connection is None:
+                connection = PersistentConnection(ip, port, self.__packet_size, self.__timeout,
+                                                  self.__pipeline_depth, self.FRAMED_PREAMBLE, self.__codecs)
+                self.__connections[key] = connection
+            return connection
+
+    def query_stats(self, ip=DEFAULT_IP, port=DEFAULT_PORT):
+        """
+        Asks a server for the stage timings and counters of its process, see stats.Stats.snapshot.
+
+        Args:
+            ip(str): IP address of the server.
+            port(int): Port of the server.
+
+        Returns:
+            dict | str: The stats of the server, or "CONNECTION ERROR" on error.
+        """
+        connection = PersistentConnection(ip, port, self.__packet_size, self.__timeout, 1, self.FRAMED_PREAMBLE,
+                                          (CODEC_STATS,))
+        try:
+            return connection.request(None)
+        except (socket.timeout, ConnectionError, OSError):
+            return "CONNECTION ERROR"
+        finally:
+            connection.close()
+
+    def flush(self, ip=DEFAULT_IP, port=DEFAULT_PORT):
+        """
+        Waits for every pipelined message sent to a server to be answered.
+
+        Returns:
+            any: The most recent response, None if nothing was in flight or "CONNECTION ERROR" on error.
+        """
+        try:
+            return self.__connection(ip, port).flush()
+        except (socket.timeout, ConnectionError, OSError):
+            return "CONNECTION ERROR"
+
+    def close_connections(self):
+        """
+        Closes all persistent client connections.
+        """
+        with self.__connections_lock:
+            for connection in self.__connections.values():
+                connection.close()
+            self.__connections.clear()
+            if self.__ring is not None and not self.__ring.owner:
+                self.__detach_ring()
+
+    def stop_server(self):
+        SocketManager.run = False
@@ -0,0 +1,119 @@
+"""
+Serves the camera client's pages and bundles from memory, precompressed, with strong ETags and cache headers.
+
+Every file of a directory is read and compressed once when the server starts: gzip always, and brotli too when the
+brotli package is installed. A request gets the smallest encoding its Accept-Encoding allows without anything being
+compressed per request. Files with a content hash in their name, eg. camera.98fd1d1f.js, never change under that
+name, so browsers are told to cache them for a year without revalidating. Other files, eg. camera.html, must be
+revalidated each time and are answered with 304 Not Modified while their ETag still matches, so restarting a fleet
+of kiosk browsers costs a few small requests rather than megabytes of JavaScript each.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:
+    # Brotli is optional, gzip is used without it.
+    brotli = None
+
+# Names with a content hash before the extension, eg. camera.98fd1d1f.js.
+HASHED_NAME = re.compile(r"\.[0-9a-f]{8,}\.[A-Za-z0-9]+$")
+CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+CACHE_REVALIDATE = "no-cache"
+
+
+class StaticAsset:
+    """
+    One file along with each encoding of it that is smaller than the original.
+    """
+    __slots__ = ("name", "mimetype", "etag", "cache_control", "encodings")
+
+    def __init__(self, name, data, compress_level):
+        """
+        Args:
+            name(str): Path of the file relative to the directory served.
+            data(bytes): Contents of the file.
+            compress_level(int): Compression level of gzip, between 1 and 9.
+        """
+        self.name = name
+        self.mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        self.etag = hashlib.sha256(data).hexdigest()[:32]
+        self.cache_control = CACHE_IMMUTABLE if HASHED_NAME.search(name) else CACHE_REVALIDATE
+        # Preferred encodings first, the original last.
+        self.encodings = []
+        if brotli is not None:
+            self.__add_encoding("br", brotli.compress(data), data)
+        self.__add_encoding("gzip", gzip.compress(data, compress_level, mtime=0), data)
+        self.encodings.append(("identity", data))
+
+    def __add_encoding(self, encoding, encoded, data):
+        if len(encoded) < len(data):
+            self.encodings.append((encoding, encoded))
+
+    def select(self, accept_encodings):
+        """
+        Args:
+            accept_encodings: Accept-Encoding header of the request, eg. request.accept_encodings.
+
+        Returns:
+            tuple[str, bytes]: The first encoding the client accepts and the file in it.
+        """
+        for encoding, data in self.encodings:
+            if encoding == "identity" or accept_encodings[encoding] > 0:
+                return encoding, data
+        return self.encodings[-1]
+
+
+class StaticAssets:
+    """
+    Every file of a directory, held in memory and served precompressed.
+    """
+    DEFAULT_COMPRESS_LEVEL = 9
+
+    def __init__(self, directory, compress_level=DEFAULT_COMPRESS_LEVEL):
+        """
+        Args:
+            directory(str): Directory of the files to serve, read once here.
+            compress_level(int): Compression level of gzip, between 1 and 9.
+        """
+        self.directory = directory
+        self.assets = {}
+        for root, _, files in os.walk(directory):
+            for file_name in files:
+                path = os.path.join(root, file_name)
+                name = os.path.relpath(path, directory).replace(os.sep, "/")
+                with open(path, "rb") as asset_file:
+                    self.assets[name] = StaticAsset(name, asset_file.read(), compress_level)
+
+    def response(self, name, request):
+        """
+        Args:
+            name(str): Path of the file relative to the directory served.
+            request: The Flask request for the file.
+
+        Returns:
+            Response: The file in the best encoding the client accepts, 304 Not Modified if the client's copy is
+                current, or 404 Not Found if the directory had no such file.
+        """
+        asset = self.assets.get(name)
+        if asset is None:
+            return Response("Not Found", status=404, mimetype="text/plain")
+        encoding, data = asset.select(request.accept_encodings)
+        # Each encoding is a different representation, so it gets an ETag of its own.
+        etag = asset.etag if encoding == "identity" else "%s-%s" % (asset.etag, encoding)
+        headers = {"Cache-Control": asset.cache_control, "Vary": "Accept-Encoding"}
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304, headers=headers)
+        else:
+            response = Response(data, mimetype=asset.mimetype, headers=headers)
+            if encoding != "identity":
+                response.headers["Content-Encoding"] = encoding
+        response.set_etag(etag)
+        return response
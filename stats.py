@@ -0,0 +1,254 @@
+"""
+Latency histograms and counters for each stage of the pipeline.
+
+Stages are timed with the monotonic perf_counter clock and every duration is counted in one of a fixed set of
+buckets, so recording a sample costs a bisect and a few additions however much traffic there is and the memory used
+never grows. Each process keeps its own registry, STATS, which poser serves on /metrics and the parser returns to
+stats queries made through SocketManager.query_stats. Snapshots sent back by worker processes, eg. those of a
+sharding.ShardPool, are merged into the snapshot of the process that started them.
+"""
+
+import bisect
+import threading
+from time import perf_counter
+
+# Upper bounds in seconds of the histogram buckets, from 10 microseconds to 10 seconds. Slower samples are counted
+# in a final overflow bucket.
+DEFAULT_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Prefix of every name in the text exposition.
+METRIC_PREFIX = "pose"
+
+
+class LatencyHistogram:
+    """
+    Counts of durations in fixed buckets, along with their total and maximum.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        Args:
+            buckets(tuple[float]): Upper bound of each bucket in seconds, in increasing order.
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def observe(self, seconds):
+        """
+        Args:
+            seconds(float): Duration to count.
+        """
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.maximum:
+            self.maximum = seconds
+
+    def quantile(self, fraction):
+        """
+        Estimates a quantile as the upper bound of the bucket it falls in.
+
+        Args:
+            fraction(float): Quantile between 0 and 1, eg. 0.99.
+
+        Returns:
+            float: Estimated duration in seconds, the maximum seen for the overflow bucket or 0 with no samples.
+        """
+        if self.count == 0:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target and count > 0:
+                return self.buckets[index] if index < len(self.buckets) else self.maximum
+        return self.maximum
+
+    def merge(self, snapshot):
+        """
+        Adds the samples of another histogram with the same buckets.
+
+        Args:
+            snapshot(dict): Snapshot of the other histogram, eg. taken in another process.
+        """
+        for index, (_, count) in enumerate(snapshot["buckets"]):
+            self.counts[index] += count
+        self.count += snapshot["count"]
+        self.total += snapshot["sum"]
+        self.maximum = max(self.maximum, snapshot["max"])
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: Sample count, total, maximum, p50 and p99 in seconds, and the count of each bucket by upper bound.
+        """
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "max": self.maximum,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": [[bound, count] for bound, count in zip(self.buckets + (float("inf"),), self.counts)]
+        }
+
+
+class StageTimer:
+    """
+    Context manager that adds the time spent inside it to the histogram of a stage.
+    """
+    __slots__ = ("stats", "stage", "started")
+
+    def __init__(self, stats, stage):
+        self.stats = stats
+        self.stage = stage
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stats.observe(self.stage, perf_counter() - self.started)
+        return False
+
+
+class Stats:
+    """
+    Registry of the latency histogram of each stage and of named counters, safe to update from any thread.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        Args:
+            buckets(tuple[float]): Upper bound of each histogram bucket in seconds, in increasing order.
+        """
+        self.__buckets = tuple(sorted(buckets))
+        self.__histograms = {}
+        self.__counters = {}
+        self.__gauges = {}
+        self.__sources = []
+        self.__lock = threading.Lock()
+
+    def timer(self, stage):
+        """
+        Times a stage, eg. "with STATS.timer("parser_convert"):".
+
+        Args:
+            stage(str): Name of the stage.
+
+        Returns:
+            StageTimer: Context manager recording the time spent inside it.
+        """
+        return StageTimer(self, stage)
+
+    def observe(self, stage, seconds):
+        """
+        Args:
+            stage(str): Name of the stage.
+            seconds(float): Time the stage took.
+        """
+        with self.__lock:
+            histogram = self.__histograms.get(stage)
+            if histogram is None:
+                histogram = LatencyHistogram(self.__buckets)
+                self.__histograms[stage] = histogram
+            histogram.observe(seconds)
+
+    def increment(self, counter, amount=1):
+        """
+        Args:
+            counter(str): Name of the counter.
+            amount(int): Amount to add.
+        """
+        with self.__lock:
+            self.__counters[counter] = self.__counters.get(counter, 0) + amount
+
+    def register_gauges(self, prefix, read):
+        """
+        Adds values kept elsewhere, eg. FrameRelay.counters, which are read each time the stats are.
+
+        Args:
+            prefix(str): Prefix of the name of each value.
+            read(callable): Function returning a dictionary of numbers by name.
+        """
+        with self.__lock:
+            self.__gauges[prefix] = read
+
+    def register_snapshots(self, read):
+        """
+        Adds the stats of other processes, eg. ShardPool.snapshots, which are read each time the stats are and merged
+        in. Their counters and gauges are added to those of the same name and their histograms to the same stage.
+
+        Args:
+            read(callable): Function returning a list of snapshots taken by other processes.
+        """
+        with self.__lock:
+            self.__sources.append(read)
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: "counters" and "gauges" by name and a "stages" snapshot of the histogram of each stage.
+        """
+        with self.__lock:
+            counters = dict(self.__counters)
+            stages = {stage: histogram.snapshot() for stage, histogram in self.__histograms.items()}
+            gauges = list(self.__gauges.items())
+            sources = list(self.__sources)
+        values = {}
+        for prefix, read in gauges:
+            for name, value in read().items():
+                values["%s_%s" % (prefix, name)] = value
+        for read in sources:
+            for other in read():
+                for name, value in other["counters"].items():
+                    counters[name] = counters.get(name, 0) + value
+                for name, value in other["gauges"].items():
+                    values[name] = values.get(name, 0) + value
+                for stage, histogram in other["stages"].items():
+                    merged = LatencyHistogram(self.__buckets)
+                    if stage in stages:
+                        merged.merge(stages[stage])
+                    merged.merge(histogram)
+                    stages[stage] = merged.snapshot()
+        return {"counters": counters, "gauges": values, "stages": stages}
+
+    def render_text(self):
+        """
+        Returns:
+            str: The stats in the Prometheus text exposition format.
+        """
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append("# TYPE %s_%s_total counter" % (METRIC_PREFIX, name))
+            lines.append("%s_%s_total %s" % (METRIC_PREFIX, name, value))
+        for name, value in sorted(snapshot["gauges"].items()):
+            lines.append("# TYPE %s_%s gauge" % (METRIC_PREFIX, name))
+            lines.append("%s_%s %s" % (METRIC_PREFIX, name, value))
+        if snapshot["stages"]:
+            lines.append("# TYPE %s_stage_seconds histogram" % METRIC_PREFIX)
+        for stage, histogram in sorted(snapshot["stages"].items()):
+            cumulative = 0
+            for bound, count in histogram["buckets"]:
+                cumulative += count
+                lines.append('%s_stage_seconds_bucket{stage="%s",le="%s"} %s' % (
+                    METRIC_PREFIX, stage, "+Inf" if bound == float("inf") else repr(bound), cumulative))
+            lines.append('%s_stage_seconds_sum{stage="%s"} %r' % (METRIC_PREFIX, stage, histogram["sum"]))
+            lines.append('%s_stage_seconds_count{stage="%s"} %s' % (METRIC_PREFIX, stage, histogram["count"]))
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """
+        Clears every histogram and counter, keeping registered gauges and the stats of other processes.
+        """
+        with self.__lock:
+            self.__histograms.clear()
+            self.__counters.clear()
+
+
+# Stats of the current process.
+STATS = Stats()
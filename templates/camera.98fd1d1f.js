@@ -39,6 +39,5 @@ var t=arguments[3],e=require("buffer").Buffer;Object.defineProperty(exports,"__e
 },{"@tensorflow/tfjs-core":"PqBP","@tensorflow/tfjs-layers":"KLDv","@tensorflow/tfjs-converter":"rGPK","@tensorflow/tfjs-data":"ewAU"}],"DJnL":[function(require,module,exports) {
 "use strict";Object.defineProperty(exports,"__esModule",{value:!0}),exports.isMobile=p,exports.updateTryResNetButtonDatGuiCss=g,exports.toggleLoadingUI=x,exports.drawPoint=h,exports.drawSegment=w,exports.drawSkeleton=P,exports.drawKeypoints=b,exports.drawBoundingBox=v,exports.renderToCanvas=B,exports.renderImageToCanvas=N,exports.drawHeatMapValues=I,exports.drawOffsetVectors=k,exports.tryResNetButtonText=exports.tryResNetButtonName=void 0;var t=o(require("@tensorflow-models/posenet")),e=o(require("@tensorflow/tfjs"));function n(){if("function"!=typeof WeakMap)return null;var t=new WeakMap;return n=function(){return t},t}function o(t){if(t&&t.__esModule)return t;if(null===t||"object"!=typeof t&&"function"!=typeof t)return{default:t};var e=n();if(e&&e.has(t))return e.get(t);var o={},r=Object.defineProperty&&Object.getOwnPropertyDescriptor;for(var s in t)if(Object.prototype.hasOwnProperty.call(t,s)){var a=r?Object.getOwnPropertyDescriptor(t,s):null;a&&(a.get||a.set)?Object.defineProperty(o,s,a):o[s]=t[s]}return o.default=t,e&&e.set(t,o),o}const r="aqua",s="red",a=2,i="tryResNetButton";exports.tryResNetButtonName="tryResNetButton";const u="[New] Try ResNet50";exports.tryResNetButtonText=u;const l="width:100%;text-decoration:underline;",c="background:#e61d5f;";function f(){return/Android/i.test(navigator.userAgent)}function d(){return/iPhone|iPad|iPod/i.test(navigator.userAgent)}function p(){return f()||d()}function y(t,e,n=""){for(var o=document.getElementsByClassName("property-name"),r=0;r<o.length;r++){(o[r].textContent||o[r].innerText)==t&&(o[r].parentNode.parentNode.style=e,""!==n&&(o[r].style=n))}}function g(){y(u,c,l)}function x(t,e="loading",n="main"){t?(document.getElementById(e).style.display="block",document.getElementById(n).style.display="none"):(document.getElementById(e).style.display="none",document.getElementById(n).style.display="block")}function m({y:t,x:e}){return[t,e]}function h(t,e,n,o,r){t.beginPath(),t.arc(n,e,o,0,2*Math.PI),t.fillStyle=r,t.fill()}function w([t,e],[n,o],r,s,i){i.beginPath(),i.moveTo(e*s,t*s),i.lineTo(o*s,n*s),i.lineWidth=a,i.strokeStyle=r,i.stroke()}function P(e,n,o,s=1){t.getAdjacentKeyPoints(e,n).forEach(t=>{w(m(t[0].position),m(t[1].position),r,s,o)})}function b(t,e,n,o=1){for(let s=0;s<t.length;s++){const a=t[s];if(a.score<e)continue;const{y:i,x:u}=a.position;h(n,i*o,u*o,3,r)}}function v(e,n){const o=t.getBoundingBox(e);n.rect(o.minX,o.minY,o.maxX-o.minX,o.maxY-o.minY),n.strokeStyle=s,n.stroke()}async function B(t,e){const[n,o]=t.shape,r=new ImageData(o,n),s=await t.data();for(let a=0;a<n*o;++a){const t=4*a,e=3*a;r.data[t+0]=s[e+0],r.data[t+1]=s[e+1],r.data[t+2]=s[e+2],r.data[t+3]=255}e.putImageData(r,0,0)}function N(t,e,n){n.width=e[0],n.height=e[1],n.getContext("2d").drawImage(t,0,0)}function I(t,n,o){O(o.getContext("2d"),t.mul(e.scalar(n,"int32")),5,r)}function O(t,e,n,o){const r=e.buffer().values;for(let s=0;s<r.length;s+=2){const e=r[s],a=r[s+1];0!==a&&0!==e&&(t.beginPath(),t.arc(a,e,n,0,2*Math.PI),t.fillStyle=o,t.fill())}}function k(e,n,o,s=1,a){const i=t.singlePose.getOffsetPoints(e,o,n),u=e.buffer().values,l=i.buffer().values;for(let t=0;t<u.length;t+=2){w([u[t]*o,u[t+1]*o],[l[t],l[t+1]],r,s,a)}}
 },{"@tensorflow-models/posenet":"yqJr","@tensorflow/tfjs":"cHV2"}],"rkgv":[function(require,module,exports) {
-"use strict";Object.defineProperty(exports,"__esModule",{value:!0}),exports.bindPage=T;var e=a(require("@tensorflow-models/posenet")),t=i(require("dat.gui")),n=i(require("stats.js")),o=require("./demo_util");function i(e){return e&&e.__esModule?e:{default:e}}function u(){if("function"!=typeof WeakMap)return null;var e=new WeakMap;return u=function(){return e},e}function a(e){if(e&&e.__esModule)return e;if(null===e||"object"!=typeof e&&"function"!=typeof e)return{default:e};var t=u();if(t&&t.has(e))return t.get(e);var n={},o=Object.defineProperty&&Object.getOwnPropertyDescriptor;for(var i in e)if(Object.prototype.hasOwnProperty.call(e,i)){var a=o?Object.getOwnPropertyDescriptor(e,i):null;a&&(a.get||a.set)?Object.defineProperty(n,i,a):n[i]=e[i]}return n.default=e,t&&t.set(e,n),n}const r=600,s=500,l=new n.default;async function c(){if(!navigator.mediaDevices||!navigator.mediaDevices.getUserMedia)throw new Error("Browser API navigator.mediaDevices.getUserMedia not available");const e=document.getElementById("video");e.width=r,e.height=s;const t=(0,o.isMobile)(),n=await navigator.mediaDevices.getUserMedia({audio:!1,video:{facingMode:"user",width:t?void 0:r,height:t?void 0:s}});return e.srcObject=n,new Promise(t=>{e.onloadedmetadata=(()=>{t(e)})})}async function d(){const e=await c();return e.play(),e}const p=2,g=(0,o.isMobile)()?.5:.75,h=16,m=500,f=1,y=32,P=250,w={algorithm:"multi-pose",input:{architecture:"MobileNetV1",outputStride:h,inputResolution:m,multiplier:g,quantBytes:p},singlePoseDetection:{minPoseConfidence:.1,minPartConfidence:.5},multiPoseDetection:{maxPoseDetections:5,minPoseConfidence:.15,minPartConfidence:.1,nmsRadius:30},output:{showVideo:!0,showSkeleton:!0,showPoints:!0,showBoundingBox:!1},net:null};function B(e,n){w.net=n,e.length>0&&(w.camera=e[0].deviceId);const i=new t.default.GUI({width:300});let u=null;w[o.tryResNetButtonName]=function(){u.setValue("ResNet50")},i.add(w,o.tryResNetButtonName).name(o.tryResNetButtonText),(0,o.updateTryResNetButtonDatGuiCss)();const a=i.add(w,"algorithm",["single-pose","multi-pose"]);let r=i.addFolder("Input");u=r.add(w.input,"architecture",["MobileNetV1","ResNet50"]),w.architecture=w.input.architecture;let s=null;function l(e,t){s&&s.remove(),w.inputResolution=e,w.input.inputResolution=e,(s=r.add(w.input,"inputResolution",t)).onChange(function(e){w.changeToInputResolution=e})}let c=null;function d(e,t){c&&c.remove(),w.outputStride=e,w.input.outputStride=e,(c=r.add(w.input,"outputStride",t)).onChange(function(e){w.changeToOutputStride=e})}let B=null;function v(e,t){B&&B.remove(),w.multiplier=e,w.input.multiplier=e,(B=r.add(w.input,"multiplier",t)).onChange(function(e){w.changeToMultiplier=e})}let R=null;function T(){var e,t;"MobileNetV1"===w.input.architecture?(l(m,[200,250,300,350,400,450,500,550,600,650,700,750,800]),d(h,[8,16]),v(g,[.5,.75,1])):(l(P,[200,250,300,350,400,450,500,550,600,650,700,750,800]),d(y,[32,16]),v(f,[1])),e=p,t=[1,2,4],R&&R.remove(),w.quantBytes=+e,w.input.quantBytes=+e,(R=r.add(w.input,"quantBytes",t)).onChange(function(e){w.changeToQuantBytes=+e})}T(),r.open();let D=i.addFolder("Single Pose Detection");D.add(w.singlePoseDetection,"minPoseConfidence",0,1),D.add(w.singlePoseDetection,"minPartConfidence",0,1);let S=i.addFolder("Multi Pose Detection");S.add(w.multiPoseDetection,"maxPoseDetections").min(1).max(20).step(1),S.add(w.multiPoseDetection,"minPoseConfidence",0,1),S.add(w.multiPoseDetection,"minPartConfidence",0,1),S.add(w.multiPoseDetection,"nmsRadius").min(0).max(40),S.open();let I=i.addFolder("Output");I.add(w.output,"showVideo"),I.add(w.output,"showSkeleton"),I.add(w.output,"showPoints"),I.add(w.output,"showBoundingBox"),I.open(),u.onChange(function(e){T(),w.changeToArchitecture=e}),a.onChange(function(e){switch(w.algorithm){case"single-pose":S.close(),D.open();break;case"multi-pose":D.close(),S.open()}})}function v(){l.showPanel(0),document.getElementById("main").appendChild(l.dom)}function R(t,n){const i=document.getElementById("output"),u=i.getContext("2d"),a=!0;i.width=r,i.height=s,async function n(){w.changeToArchitecture&&(w.net.dispose(),(0,o.toggleLoadingUI)(!0),w.net=await e.load({architecture:w.changeToArchitecture,outputStride:w.outputStride,inputResolution:w.inputResolution,multiplier:w.multiplier}),(0,o.toggleLoadingUI)(!1),w.architecture=w.changeToArchitecture,w.changeToArchitecture=null),w.changeToMultiplier&&(w.net.dispose(),(0,o.toggleLoadingUI)(!0),w.net=await e.load({architecture:w.architecture,outputStride:w.outputStride,inputResolution:w.inputResolution,multiplier:+w.changeToMultiplier,quantBytes:w.quantBytes}),(0,o.toggleLoadingUI)(!1),w.multiplier=+w.changeToMultiplier,w.changeToMultiplier=null),w.changeToOutputStride&&(w.net.dispose(),(0,o.toggleLoadingUI)(!0),w.net=await e.load({architecture:w.architecture,outputStride:+w.changeToOutputStride,inputResolution:w.inputResolution,multiplier:w.multiplier,quantBytes:w.quantBytes}),(0,o.toggleLoadingUI)(!1),w.outputStride=+w.changeToOutputStride,w.changeToOutputStride=null),w.changeToInputResolution&&(w.net.dispose(),(0,o.toggleLoadingUI)(!0),w.net=await e.load({architecture:w.architecture,outputStride:w.outputStride,inputResolution:+w.changeToInputResolution,multiplier:w.multiplier,quantBytes:w.quantBytes}),(0,o.toggleLoadingUI)(!1),w.inputResolution=+w.changeToInputResolution,w.changeToInputResolution=null),w.changeToQuantBytes&&(w.net.dispose(),(0,o.toggleLoadingUI)(!0),w.net=await e.load({architecture:w.architecture,outputStride:w.outputStride,inputResolution:w.inputResolution,multiplier:w.multiplier,quantBytes:w.changeToQuantBytes}),(0,o.toggleLoadingUI)(!1),w.quantBytes=w.changeToQuantBytes,w.changeToQuantBytes=null),l.begin();let i,c,d=[];switch(w.algorithm){case"single-pose":const e=await w.net.estimatePoses(t,{flipHorizontal:a,decodingMethod:"single-person"});d=d.concat(e),i=+w.singlePoseDetection.minPoseConfidence,c=+w.singlePoseDetection.minPartConfidence;break;case"multi-pose":let n=await w.net.estimatePoses(t,{flipHorizontal:a,decodingMethod:"multi-person",maxDetections:w.multiPoseDetection.maxPoseDetections,scoreThreshold:w.multiPoseDetection.minPartConfidence,nmsRadius:w.multiPoseDetection.nmsRadius});d=d.concat(n),i=+w.multiPoseDetection.minPoseConfidence,c=+w.multiPoseDetection.minPartConfidence}u.clearRect(0,0,r,s),w.output.showVideo&&(u.save(),u.scale(-1,1),u.translate(-r,0),u.drawImage(t,0,0,r,s),u.restore());const p=JSON.stringify(d);console.log(p),fetch("/backend",{headers:{"content-type":"application/json; charset=UTF-8"},body:p,method:"POST"}).then(e=>d.json()).then(e=>{console.log(e)}),d.forEach(({score:e,keypoints:t})=>{e>=i&&(w.output.showPoints&&(0,o.drawKeypoints)(t,c,u),w.output.showSkeleton&&(0,o.drawSkeleton)(t,c,u),w.output.showBoundingBox&&(0,o.drawBoundingBox)(t,u))}),l.end(),requestAnimationFrame(n)}()}async function T(){(0,o.toggleLoadingUI)(!0);const t=await e.load({architecture:w.input.architecture,outputStride:w.input.outputStride,inputResolution:w.input.inputResolution,multiplier:w.input.multiplier,quantBytes:w.input.quantBytes});let n;(0,o.toggleLoadingUI)(!1);try{n=await d()}catch(i){let e=document.getElementById("info");throw e.textContent="this browser does not support video capture,or this device does not have a camera",e.style.display="block",i}B([],t),v(),R(n,t)}navigator.getUserMedia=navigator.getUserMedia||navigator.webkitGetUserMedia||navigator.mozGetUserMedia,T();
+"use strict";Object.defineProperty(exports,"__esModule",{value:!0}),exports.bindPage=T;var e=a(require("@tensorflow-models/posenet")),t=i(require("dat.gui")),n=i(require("stats.js")),o=require("./demo_util");function i(e){return e&&e.__esModule?e:{default:e}}function u(){if("function"!=typeof WeakMap)return null;var e=new WeakMap;return u=function(){return e},e}function a(e){if(e&&e.__esModule)return e;if(null===e||"object"!=typeof e&&"function"!=typeof e)return{default:e};var t=u();if(t&&t.has(e))return t.get(e);var n={},o=Object.defineProperty&&Object.getOwnPropertyDescriptor;for(var i in e)if(Object.prototype.hasOwnProperty.call(e,i)){var a=o?Object.getOwnPropertyDescriptor(e,i):null;a&&(a.get||a.set)?Object.defineProperty(n,i,a):n[i]=e[i]}return n.default=e,t&&t.set(e,n),n}const r=600,s=500,l=new n.default;async function c(){if(!navigator.mediaDevices||!navigator.mediaDevices.getUserMedia)throw new Error("Browser API navigator.mediaDevices.getUserMedia not available");const e=document.getElementById("video");e.width=r,e.height=s;const t=(0,o.isMobile)(),n=await navigator.mediaDevices.getUserMedia({audio:!1,video:{facingMode:"user",width:t?void 0:r,height:t?void 0:s}});return e.srcObject=n,new Promise(t=>{e.onloadedmetadata=(()=>{t(e)})})}async function d(){const e=await c();return e.play(),e}const p=2,g=(0,o.isMobile)()?.5:.75,h=16,m=500,f=1,y=32,P=250,w={algorithm:"multi-pose",input:{architecture:"MobileNetV1",outputStride:h,inputResolution:m,multiplier:g,quantBytes:p},singlePoseDetection:{minPoseConfidence:.1,minPartConfidence:.5},multiPoseDetection:{maxPoseDetections:5,minPoseConfidence:.15,minPartConfidence:.1,nmsRadius:30},output:{showVideo:!0,showSkeleton:!0,showPoints:!0,showBoundingBox:!1},net:null};function B(e,n){w.net=n,e.length>0&&(w.camera=e[0].deviceId);const i=new t.default.GUI({width:300});let u=null;w[o.tryResNetButtonName]=function(){u.setValue("ResNet50")},i.add(w,o.tryResNetButtonName).name(o.tryResNetButtonText),(0,o.updateTryResNetButtonDatGuiCss)();const a=i.add(w,"algorithm",["single-pose","multi-pose"]);let r=i.addFolder("Input");u=r.add(w.input,"architecture",["MobileNetV1","ResNet50"]),w.architecture=w.input.architecture;let s=null;function l(e,t){s&&s.remove(),w.inputResolution=e,w.input.inputResolution=e,(s=r.add(w.input,"inputResolution",t)).onChange(function(e){w.changeToInputResolution=e})}let c=null;function d(e,t){c&&c.remove(),w.outputStride=e,w.input.outputStride=e,(c=r.add(w.input,"outputStride",t)).onChange(function(e){w.changeToOutputStride=e})}let B=null;function v(e,t){B&&B.remove(),w.multiplier=e,w.input.multiplier=e,(B=r.add(w.input,"multiplier",t)).onChange(function(e){w.changeToMultiplier=e})}let R=null;function T(){var e,t;"MobileNetV1"===w.input.architecture?(l(m,[200,250,300,350,400,450,500,550,600,650,700,750,800]),d(h,[8,16]),v(g,[.5,.75,1])):(l(P,[200,250,300,350,400,450,500,550,600,650,700,750,800]),d(y,[32,16]),v(f,[1])),e=p,t=[1,2,4],R&&R.remove(),w.quantBytes=+e,w.input.quantBytes=+e,(R=r.add(w.input,"quantBytes",t)).onChange(function(e){w.changeToQuantBytes=+e})}T(),r.open();let D=i.addFolder("Single Pose Detection");D.add(w.singlePoseDetection,"minPoseConfidence",0,1),D.add(w.singlePoseDetection,"minPartConfidence",0,1);let S=i.addFolder("Multi Pose Detection");S.add(w.multiPoseDetection,"maxPoseDetections").min(1).max(20).step(1),S.add(w.multiPoseDetection,"minPoseConfidence",0,1),S.add(w.multiPoseDetection,"minPartConfidence",0,1),S.add(w.multiPoseDetection,"nmsRadius").min(0).max(40),S.open();let I=i.addFolder("Output");I.add(w.output,"showVideo"),I.add(w.output,"showSkeleton"),I.add(w.output,"showPoints"),I.add(w.output,"showBoundingBox"),I.open(),u.onChange(function(e){T(),w.changeToArchitecture=e}),a.onChange(function(e){switch(w.algorithm){case"single-pose":S.close(),D.open();break;case"multi-pose":D.close(),S.open()}})}function v(){l.showPanel(0),document.getElementById("main").appendChild(l.dom)}function R(t,n){const i=document.getElementById("output"),u=i.getContext("2d"),a=!0;i.width=r,i.height=s,async function n(){w.changeToArchitecture&&(w.net.dispose(),(0,o.toggleLoadingUI)(!0),w.net=await e.load({architecture:w.changeToArchitecture,outputStride:w.outputStride,inputResolution:w.inputResolution,multiplier:w.multiplier}),(0,o.toggleLoadingUI)(!1),w.architecture=w.changeToArchitecture,w.changeToArchitecture=null),w.changeToMultiplier&&(w.net.dispose(),(0,o.toggleLoadingUI)(!0),w.net=await e.load({architecture:w.architecture,outputStride:w.outputStride,inputResolution:w.inputResolution,multiplier:+w.changeToMultiplier,quantBytes:w.quantBytes}),(0,o.toggleLoadingUI)(!1),w.multiplier=+w.changeToMultiplier,w.changeToMultiplier=null),w.changeToOutputStride&&(w.net.dispose(),(0,o.toggleLoadingUI)(!0),w.net=await e.load({architecture:w.architecture,outputStride:+w.changeToOutputStride,inputResolution:w.inputResolution,multiplier:w.multiplier,quantBytes:w.quantBytes}),(0,o.toggleLoadingUI)(!1),w.outputStride=+w.changeToOutputStride,w.changeToOutputStride=null),w.changeToInputResolution&&(w.net.dispose(),(0,o.toggleLoadingUI)(!0),w.net=await e.load({architecture:w.architecture,outputStride:w.outputStride,inputResolution:+w.changeToInputResolution,multiplier:w.multiplier,quantBytes:w.quantBytes}),(0,o.toggleLoadingUI)(!1),w.inputResolution=+w.changeToInputResolution,w.changeToInputResolution=null),w.changeToQuantBytes&&(w.net.dispose(),(0,o.toggleLoadingUI)(!0),w.net=await e.load({architecture:w.architecture,outputStride:w.outputStride,inputResolution:w.inputResolution,multiplier:w.multiplier,quantBytes:w.changeToQuantBytes}),(0,o.toggleLoadingUI)(!1),w.quantBytes=w.changeToQuantBytes,w.changeToQuantBytes=null),l.begin();let i,c,d=[];switch(w.algorithm){case"single-pose":const e=await w.net.estimatePoses(t,{flipHorizontal:a,decodingMethod:"single-person"});d=d.concat(e),i=+w.singlePoseDetection.minPoseConfidence,c=+w.singlePoseDetection.minPartConfidence;break;case"multi-pose":let n=await w.net.estimatePoses(t,{flipHorizontal:a,decodingMethod:"multi-person",maxDetections:w.multiPoseDetection.maxPoseDetections,scoreThreshold:w.multiPoseDetection.minPartConfidence,nmsRadius:w.multiPoseDetection.nmsRadius});d=d.concat(n),i=+w.multiPoseDetection.minPoseConfidence,c=+w.multiPoseDetection.minPartConfidence}u.clearRect(0,0,r,s),w.output.showVideo&&(u.save(),u.scale(-1,1),u.translate(-r,0),u.drawImage(t,0,0,r,s),u.restore());const p=JSON.stringify(d);console.log(p),window.sendPoses(p),d.forEach(({score:e,keypoints:t})=>{e>=i&&(w.output.showPoints&&(0,o.drawKeypoints)(t,c,u),w.output.showSkeleton&&(0,o.drawSkeleton)(t,c,u),w.output.showBoundingBox&&(0,o.drawBoundingBox)(t,u))}),l.end(),requestAnimationFrame(n)}()}async function T(){(0,o.toggleLoadingUI)(!0);const t=await e.load({architecture:w.input.architecture,outputStride:w.input.outputStride,inputResolution:w.input.inputResolution,multiplier:w.input.multiplier,quantBytes:w.input.quantBytes});let n;(0,o.toggleLoadingUI)(!1);try{n=await d()}catch(i){let e=document.getElementById("info");throw e.textContent="this browser does not support video capture,or this device does not have a camera",e.style.display="block",i}B([],t),v(),R(n,t)}navigator.getUserMedia=navigator.getUserMedia||navigator.webkitGetUserMedia||navigator.mozGetUserMedia,T();
 },{"@tensorflow-models/posenet":"yqJr","dat.gui":"ArXC","stats.js":"ZsAW","./demo_util":"DJnL"}]},{},["rkgv"], null)
-//# sourceMappingURL=camera.b3ee27ff.js.map
\ No newline at end of file
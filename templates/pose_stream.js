@@ -0,0 +1,103 @@
+// Streams pose frames to the poser over one long-lived WebSocket instead of a POST per animation frame.
+// Falls back to POST /backend while the socket is connecting or when the server has no streaming endpoint.
+// The camera bundle calls window.sendPoses(body) with the JSON encoded poses of each frame.
+// Every answer carries interval_ms, the time the parser asks the page to leave between frames. Animation frames are
+// delayed until the next frame is due, so poses are not estimated only to be thrown away.
+// Each payload carries the time its animation frame began, when the video frame was captured, in seconds on the
+// page's monotonic clock. The server times motion and freshness by it rather than by when the payload arrives.
+(function () {
+    "use strict";
+    // Frames sent without an acknowledgement before new frames are dropped at the source.
+    var MAX_UNACKNOWLEDGED = 4;
+    var RECONNECT_DELAY_MS = 1000;
+    // Time of one animation frame, the delay left to requestAnimationFrame itself.
+    var FRAME_MS = 1000 / 60;
+
+    var socket = null;
+    var unacknowledged = 0;
+    var reconnectAt = 0;
+    var streamAvailable = "WebSocket" in window;
+    var interval = 0;
+    var nextFrameAt = 0;
+    var capturedAt = performance.now();
+    var requestAnimationFrame = window.requestAnimationFrame.bind(window);
+
+    window.requestAnimationFrame = function (callback) {
+        var wait = nextFrameAt - performance.now();
+        var frame = function (time) {
+            capturedAt = performance.now();
+            callback(time);
+        };
+        if (wait > FRAME_MS) {
+            return setTimeout(function () {
+                requestAnimationFrame(frame);
+            }, wait - FRAME_MS);
+        }
+        return requestAnimationFrame(frame);
+    };
+
+    function applyFeedback(text) {
+        try {
+            var feedback = JSON.parse(text);
+            if (typeof feedback.interval_ms === "number") {
+                interval = feedback.interval_ms;
+            }
+        } catch (error) {
+            // Servers without feedback answer with an empty body.
+        }
+    }
+
+    function connect() {
+        var protocol = window.location.protocol === "https:" ? "wss:" : "ws:";
+        var opened = false;
+        socket = new WebSocket(protocol + "//" + window.location.host + "/stream");
+        unacknowledged = 0;
+        socket.onopen = function () {
+            opened = true;
+        };
+        socket.onmessage = function (event) {
+            if (unacknowledged > 0) {
+                unacknowledged--;
+            }
+            applyFeedback(event.data);
+        };
+        socket.onclose = function () {
+            socket = null;
+            // A socket that never opened means the server does not stream, keep posting instead.
+            streamAvailable = opened;
+            reconnectAt = Date.now() + RECONNECT_DELAY_MS;
+        };
+    }
+
+    function post(body) {
+        fetch("/backend", {headers: {"content-type": "application/json; charset=UTF-8"}, body: body, method: "POST"})
+            .then(function (response) {
+                return response.text();
+            })
+            .then(applyFeedback)
+            .catch(function (error) {
+                console.log(error);
+            });
+    }
+
+    window.sendPoses = function (body) {
+        var now = performance.now();
+        // Animation frames land on vsync, so a frame due within half of one is sent rather than skipped.
+        if (now + FRAME_MS / 2 < nextFrameAt) {
+            return;
+        }
+        nextFrameAt = now + interval;
+        body = '{"timestamp":' + capturedAt / 1000 + ',"frames":[' + body + "]}";
+        if (socket === null && streamAvailable && Date.now() >= reconnectAt) {
+            connect();
+        }
+        if (socket !== null && socket.readyState === WebSocket.OPEN) {
+            if (unacknowledged < MAX_UNACKNOWLEDGED) {
+                unacknowledged++;
+                socket.send(body);
+            }
+            return;
+        }
+        post(body);
+    };
+})();
@@ -0,0 +1,130 @@
+"""
+Checks the deadband, coalescing, rate limit and expiry of OutputStage, delivering to a LocalSink.
+"""
+
+import time
+
+import pytest
+
+from output_stage import LocalSink, OutputStage
+
+
+class FailingSink:
+    """
+    Sink whose downstream link is always down.
+    """
+
+    def send(self, setpoint):
+        raise OSError("link down")
+
+    def close(self):
+        pass
+
+
+def wait_for(stage, count):
+    deadline = time.monotonic() + 5.0
+    while stage.counters()["sent"] + stage.counters()["failed"] < count:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+@pytest.fixture
+def sink():
+    return LocalSink()
+
+
+def test_changes_within_the_deadband_are_suppressed(sink):
+    stage = OutputStage(sink, max_rate=0, deadband=0.01)
+    stage.start()
+    try:
+        assert stage.submit({"x": 1.0, "mode": "hover"}, 0)
+        wait_for(stage, 1)
+        assert not stage.submit({"x": 1.005, "mode": "hover"}, 0)
+        # Another person has had nothing delivered, so their setpoint always goes out.
+        assert stage.submit({"x": 1.005, "mode": "hover"}, 1)
+        assert stage.submit({"x": 1.0, "mode": "land"}, 0)
+        wait_for(stage, 3)
+        assert stage.submit({"x": 1.02, "mode": "land"}, 0)
+        wait_for(stage, 4)
+    finally:
+        stage.stop()
+    assert [(setpoint["track_id"], setpoint["x"], setpoint["mode"]) for setpoint in sink.delivered] == [
+        (0, 1.0, "hover"), (1, 1.005, "hover"), (0, 1.0, "land"), (0, 1.02, "land")]
+    assert stage.counters()["suppressed"] == 1
+
+
+def test_burst_is_coalesced_to_the_latest_setpoint_of_each_person(sink):
+    stage = OutputStage(sink, max_rate=0)
+    for value in range(5):
+        stage.submit({"x": float(value)}, 0)
+    stage.submit({"x": 10.0}, 1)
+    counters = stage.counters()
+    assert counters["pending"] == 2
+    assert counters["coalesced"] == 4
+    # Stopping delivers whatever is still pending.
+    stage.start()
+    stage.stop()
+    assert sorted((setpoint["track_id"], setpoint["x"]) for setpoint in sink.delivered) == [(0, 4.0), (1, 10.0)]
+
+
+def test_returning_within_the_deadband_drops_the_pending_setpoint(sink):
+    stage = OutputStage(sink, max_rate=0)
+    stage.start()
+    try:
+        stage.submit({"x": 1.0}, 0)
+        wait_for(stage, 1)
+    finally:
+        stage.stop()
+    stage.submit({"x": 2.0}, 0)
+    assert not stage.submit({"x": 1.0}, 0)
+    assert stage.counters()["pending"] == 0
+    assert stage.counters()["coalesced"] == 1
+
+
+def test_deliveries_are_limited_to_the_maximum_rate(sink):
+    times = []
+    sink.callback = lambda setpoint: times.append(time.monotonic())
+    stage = OutputStage(sink, max_rate=20.0)
+    stage.start()
+    try:
+        end = time.monotonic() + 0.3
+        value = 0.0
+        while time.monotonic() < end:
+            value += 1.0
+            stage.submit({"x": value}, 0)
+            time.sleep(0.002)
+    finally:
+        stage.stop()
+    assert 2 <= len(times) <= 8
+    assert min(later - earlier for earlier, later in zip(times, times[1:])) >= 0.045
+    assert stage.counters()["coalesced"] > stage.counters()["sent"]
+
+
+def test_person_is_forgotten_after_the_expiry(sink):
+    stage = OutputStage(sink, max_rate=0, expiry=0.05)
+    stage.start()
+    try:
+        stage.submit({"x": 1.0}, 0)
+        wait_for(stage, 1)
+        time.sleep(0.1)
+        # The last delivery was forgotten, so the same setpoint is delivered again rather than suppressed.
+        assert stage.submit({"x": 1.0}, 0)
+        wait_for(stage, 2)
+    finally:
+        stage.stop()
+    assert len(sink.delivered) == 2
+
+
+def test_failed_deliveries_are_counted_and_not_taken_as_delivered():
+    stage = OutputStage(FailingSink(), max_rate=0)
+    stage.start()
+    try:
+        stage.submit({"x": 1.0}, 0)
+        wait_for(stage, 1)
+        # Nothing reached the link, so the same setpoint is tried again.
+        assert stage.submit({"x": 1.0}, 0)
+        wait_for(stage, 2)
+    finally:
+        stage.stop()
+    assert stage.counters()["failed"] == 2
+    assert stage.counters()["sent"] == 0
@@ -0,0 +1,52 @@
+"""
+PoseMetrics handling of parsed keypoints.
+"""
+
+import numpy as np
+
+from parser import MINIMUM_CONFIDENCE, PART_MAP, PoseFrame, PoseMetrics
+
+
+def pose_dict(position=lambda index: (float(index), 2.0 * index)):
+    keypoints = {name: {"position": position(index), "score": 0.9} for index, name in PART_MAP.items()}
+    keypoints["timestamp"] = 1.0
+    return keypoints
+
+
+def test_register_keypoints_accepts_parsed_dictionary():
+    assert PoseMetrics(active_metrics=("centroid_coords",)).register_keypoints(pose_dict())
+
+
+def test_register_keypoints_refuses_malformed_keypoints():
+    metrics = PoseMetrics(active_metrics=("centroid_coords",))
+    missing = pose_dict()
+    del missing["nose"]
+    assert not metrics.register_keypoints(missing)
+    assert not metrics.register_keypoints(pose_dict(lambda index: [float(index), 2.0 * index]))
+
+
+def test_only_histories_active_metrics_read_are_fed():
+    assert PoseMetrics(active_metrics=("centroid_coords",)).feeds == {"centroid_history"}
+    assert PoseMetrics(active_metrics=("centroid",)).feeds == {"centroid_history"}
+    assert PoseMetrics(active_metrics=("average_speed_of_points",)).feeds == {"history"}
+    assert PoseMetrics(active_metrics=("demo_metric", "positional_demo")).feeds == set()
+    metrics = PoseMetrics(active_metrics=("demo_metric",))
+    metrics.activate("offset_midpoints")
+    assert metrics.feeds == {"history"}
+
+
+def test_centroid_coords_does_not_feed_keypoint_history():
+    metrics = PoseMetrics(active_metrics=("centroid_coords",))
+    for timestamp in (1.0, 1.1, 1.2):
+        keypoints = pose_dict()
+        keypoints["timestamp"] = timestamp
+        assert metrics.register_keypoints(keypoints)
+    assert len(metrics.history) == 0
+    assert len(metrics.centroid_history) == 3
+
+
+def test_keypoints_exactly_at_the_threshold_are_not_confident():
+    frame = PoseFrame([(float(index), 0.0, MINIMUM_CONFIDENCE) for index in range(len(PART_MAP))])
+    assert not frame.confident.any()
+    frame.keypoints[:, 2] = np.nextafter(MINIMUM_CONFIDENCE, 1.0)
+    assert PoseFrame(frame.keypoints).is_confident()
@@ -0,0 +1,105 @@
+"""
+Checks the windowed views of PoseHistory, and its running sums against the motion computed directly from the samples
+in its window.
+"""
+
+import numpy as np
+import pytest
+
+from kinematics import Kinematics
+from pose_history import PoseHistory
+
+
+def compute_kinematics(positions, valid, timestamps):
+    """
+    Computes the mean motion of each point over a window of samples in one pass, as a reference for the running sums.
+
+    Args:
+        positions(np.ndarray): (n, points, 2) x, y positions, oldest first.
+        valid(np.ndarray): (n, points) mask of usable positions.
+        timestamps(np.ndarray): (n,) sample times in seconds.
+
+    Returns:
+        Kinematics: Mean velocity, acceleration and speed of every point, zero where there were too few samples.
+    """
+    points = positions.shape[1]
+    if len(timestamps) < 2:
+        zeros = np.zeros((points, 2))
+        return Kinematics(zeros, zeros.copy(), np.zeros(points), np.zeros(points, dtype=int))
+    elapsed = np.diff(timestamps)
+    steps = valid[1:] & valid[:-1] & (elapsed > 0)[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        velocities = np.diff(positions, axis=0) / elapsed[:, None, None]
+    velocities[~steps] = 0.0
+    step_counts = steps.sum(axis=0)
+    divisor = np.maximum(step_counts, 1)
+    velocity = velocities.sum(axis=0) / divisor[:, None]
+    speed = np.linalg.norm(velocities, axis=2).sum(axis=0) / divisor
+
+    acceleration = np.zeros((points, 2))
+    if len(timestamps) >= 3:
+        # Each velocity sits midway between its two samples, so successive velocities are this far apart.
+        interval = (timestamps[2:] - timestamps[:-2]) / 2
+        acceleration_steps = steps[1:] & steps[:-1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            accelerations = np.diff(velocities, axis=0) / interval[:, None, None]
+        accelerations[~acceleration_steps] = 0.0
+        acceleration = accelerations.sum(axis=0) / np.maximum(acceleration_steps.sum(axis=0), 1)[:, None]
+    return Kinematics(velocity, acceleration, speed, step_counts)
+
+
+@pytest.mark.parametrize("capacity", [1, 2, 3, 8, 30])
+def test_running_sums_match_direct_computation(capacity):
+    random = np.random.default_rng(capacity)
+    points = 5
+    samples = 4 * capacity + 7
+    positions = random.uniform(0.0, 640.0, (samples, points, 2))
+    valid = random.random((samples, points)) > 0.2
+    # Some samples share the time of the one before, so no time elapses in their step.
+    timestamps = np.cumsum(np.where(random.random(samples) > 0.1, random.uniform(0.01, 0.1, samples), 0.0))
+    history = PoseHistory(capacity, points)
+    for index in range(samples):
+        history.append(positions[index], valid[index], timestamps[index])
+        start = max(0, index + 1 - capacity)
+        expected = compute_kinematics(positions[start:index + 1], valid[start:index + 1],
+                                      timestamps[start:index + 1])
+        motion = history.motion()
+        assert len(history) == index + 1 - start
+        np.testing.assert_array_equal(motion.steps, expected.steps)
+        np.testing.assert_allclose(motion.velocity, expected.velocity, rtol=1e-9, atol=1e-9)
+        np.testing.assert_allclose(motion.speed, expected.speed, rtol=1e-9, atol=1e-9)
+        np.testing.assert_allclose(motion.acceleration, expected.acceleration, rtol=1e-9, atol=1e-9)
+
+
+def test_window_returns_latest_samples_as_views():
+    points = 3
+    history = PoseHistory(4, points)
+    positions = np.arange(7 * points * 2, dtype=float).reshape(7, points, 2)
+    for index in range(7):
+        history.append(positions[index], np.full(points, index % 2 == 0), float(index))
+    window_positions, window_valid, window_timestamps = history.window()
+    np.testing.assert_array_equal(window_positions, positions[3:])
+    np.testing.assert_array_equal(window_valid[:, 0], [False, True, False, True])
+    np.testing.assert_array_equal(window_timestamps, [3.0, 4.0, 5.0, 6.0])
+    latest_positions, _, latest_timestamps = history.window(2)
+    np.testing.assert_array_equal(latest_positions, positions[5:])
+    np.testing.assert_array_equal(latest_timestamps, [5.0, 6.0])
+    assert np.shares_memory(latest_positions, window_positions)
+    assert len(history.window(10)[2]) == 4
+
+
+def test_clear_forgets_samples_and_running_sums():
+    points = 2
+    history = PoseHistory(3, points)
+    for index in range(5):
+        history.append(np.full((points, 2), 10.0 * index), np.ones(points, dtype=bool), 0.1 * index)
+    history.clear()
+    assert len(history) == 0
+    assert len(history.window()[2]) == 0
+    np.testing.assert_array_equal(history.motion().steps, [0, 0])
+    history.append(np.zeros((points, 2)), np.ones(points, dtype=bool), 1.0)
+    history.append(np.ones((points, 2)), np.ones(points, dtype=bool), 1.5)
+    motion = history.motion()
+    np.testing.assert_array_equal(motion.steps, [1, 1])
+    np.testing.assert_allclose(motion.velocity, np.full((points, 2), 2.0))
+    np.testing.assert_array_equal(history.window()[2], [1.0, 1.5])
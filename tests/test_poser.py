@@ -0,0 +1,54 @@
+"""
+Requests to poser's /backend through the Flask test client, with no parser listening behind the relay.
+"""
+
+import pytest
+
+import poser
+from pose_format import json_frames, parse_frames
+from stats import STATS
+
+
+@pytest.fixture
+def client():
+    return poser.app.test_client()
+
+
+def rejected():
+    return STATS.snapshot()["counters"].get("poser_payloads_rejected", 0)
+
+
+@pytest.mark.parametrize("payload", [{"frames": 5}, {"frames": "frames"}, {"frames": {"poses": []}}])
+def test_frames_that_are_not_a_list_are_refused(payload):
+    with pytest.raises(ValueError):
+        json_frames(payload)
+    with pytest.raises(ValueError):
+        parse_frames(payload)
+
+
+def test_backend_answers_bad_request_for_frames_that_are_not_a_list(client):
+    before = rejected()
+    response = client.post("/backend", json={"frames": 5}, headers={"X-Stream-Id": "not-a-list"})
+    assert response.status_code == 400
+    assert "interval_ms" in response.get_json()
+    assert "rather than a list" in response.get_json()["error"]
+    assert rejected() == before + 1
+
+
+def test_preflight_and_get_are_not_counted_as_rejected(client):
+    before = rejected()
+    assert client.options("/backend", headers={"Origin": "http://camera", "Access-Control-Request-Method": "POST"}) \
+        .status_code == 200
+    response = client.get("/backend")
+    assert response.status_code == 200
+    assert "interval_ms" in response.get_json()
+    assert rejected() == before
+
+
+def test_backend_allows_cross_origin_posts(client):
+    response = client.options("/backend", headers={"Origin": "http://camera", "Access-Control-Request-Method": "POST",
+                                                   "Access-Control-Request-Headers": "Content-Type"})
+    assert response.headers["Access-Control-Allow-Origin"] in ("*", "http://camera")
+    assert "POST" in response.headers["Access-Control-Allow-Methods"]
+    response = client.post("/backend", json={"frames": []}, headers={"Origin": "http://camera"})
+    assert response.headers["Access-Control-Allow-Origin"] in ("*", "http://camera")
@@ -0,0 +1,73 @@
+"""
+Recording pose records with PoseRecorder and reading them back with PoseRecording, during and after a session.
+"""
+
+import time
+
+import numpy as np
+
+from pose_format import POSE_RECORD
+from recorder import PoseRecorder, PoseRecording, INDEX_ENTRY, index_path
+
+
+def records(count, first_sequence=0):
+    batch = np.zeros(count, dtype=POSE_RECORD)
+    batch["sequence"] = np.arange(first_sequence, first_sequence + count)
+    return batch
+
+
+def wait_for(recorder, count):
+    deadline = time.monotonic() + 5.0
+    while recorder.counters()["recorded"] < count:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def record_session(recorder, batches):
+    for batch in range(batches):
+        recorder.record(records(3, 3 * batch), received=100.0 + batch)
+    wait_for(recorder, 3 * batches)
+
+
+def test_recording_is_readable_while_being_written(tmp_path):
+    path = str(tmp_path / "session.ppr")
+    recorder = PoseRecorder(path, chunk_entries=8, index_interval=4)
+    recorder.start()
+    try:
+        record_session(recorder, 10)
+        assert len(np.fromfile(index_path(path), dtype=INDEX_ENTRY)) == 8
+        recording = PoseRecording(path)
+        try:
+            assert len(recording) == 30
+            np.testing.assert_array_equal(recording.read(107.0)["record"]["sequence"], np.arange(21, 30))
+            np.testing.assert_array_equal(recording.read(102.0, 104.0)["record"]["sequence"], np.arange(6, 12))
+        finally:
+            recording.close()
+    finally:
+        recorder.stop()
+
+
+def test_recording_is_trimmed_and_appended_to(tmp_path):
+    path = str(tmp_path / "session.ppr")
+    recorder = PoseRecorder(path, chunk_entries=64, index_interval=4)
+    recorder.start()
+    record_session(recorder, 2)
+    recorder.stop()
+    recorder = PoseRecorder(path, chunk_entries=64, index_interval=4)
+    recorder.start()
+    recorder.record(records(2, 6), received=200.0)
+    wait_for(recorder, 2)
+    recorder.stop()
+    recording = PoseRecording(path)
+    try:
+        np.testing.assert_array_equal(recording.read()["record"]["sequence"], np.arange(8))
+        np.testing.assert_array_equal(recording.read(150.0)["received"], [200.0, 200.0])
+    finally:
+        recording.close()
+
+
+def test_records_are_dropped_rather_than_blocking_when_the_queue_is_full(tmp_path):
+    recorder = PoseRecorder(str(tmp_path / "session.ppr"), queue_size=1)
+    assert recorder.record(records(2))
+    assert not recorder.record(records(3))
+    assert recorder.counters()["dropped"] == 3
@@ -0,0 +1,63 @@
+"""
+Checks that FrameRelay forgets streams that have gone idle, and only once they have nothing left to send.
+"""
+
+import threading
+import time
+
+from relay import FrameRelay
+
+
+class RecordingSocketManager:
+    """
+    Stands in for SocketManager, keeping the stream id and first sequence number of every payload sent.
+    """
+    DEFAULT_IP = "127.0.0.1"
+    DEFAULT_PORT = 0
+
+    def __init__(self):
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def send_message(self, ip, port, message):
+        with self.lock:
+            self.sent.append((message.stream_id, message.first_sequence))
+        return {"interval": 0.0}
+
+
+def wait_for(relay, count):
+    deadline = time.monotonic() + 5.0
+    while relay.counters()["sent"] < count:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_idle_stream_is_sent_again_under_a_new_id():
+    manager = RecordingSocketManager()
+    relay = FrameRelay(manager, expiry=0.05)
+    relay.start()
+    try:
+        relay.push_raw("first", b"[]")
+        wait_for(relay, 1)
+        relay.push_raw("first", b"[]")
+        wait_for(relay, 2)
+        relay.push_raw("second", b"[]")
+        wait_for(relay, 3)
+        time.sleep(0.1)
+        # Pushing from any stream forgets the idle ones, so the first stream comes back as a new one.
+        relay.push_raw("first", b"[]")
+        wait_for(relay, 4)
+        assert len(relay._FrameRelay__stream_ids) == 1
+    finally:
+        relay.stop()
+    assert manager.sent == [(0, 0), (0, 1), (1, 0), (2, 0)]
+
+
+def test_stream_with_queued_frames_is_kept():
+    relay = FrameRelay(RecordingSocketManager(), expiry=0.0)
+    relay.push_raw("first", b"[]")
+    time.sleep(0.01)
+    # The sender thread has not started, so the first stream still has a payload waiting and must not be forgotten.
+    relay.push_raw("second", b"[]")
+    assert relay.counters()["queued"] == 2
+    assert relay._FrameRelay__stream_ids == {"first": 0, "second": 1}
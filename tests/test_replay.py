@@ -0,0 +1,42 @@
+"""
+Reading and replaying JSON sessions that hold malformed lines and frames.
+"""
+
+import json
+
+import numpy as np
+
+from replay import read_session, replay
+
+
+def pose(offset=0.0):
+    return {"score": 0.9, "keypoints": [{"position": {"x": offset + index, "y": offset + 2 * index}, "score": 0.8}
+                                        for index in range(17)]}
+
+
+def write_session(path):
+    lines = [
+        json.dumps({"timestamp": 1.0, "frames": [[pose()], [pose(1.0)]]}),
+        "not json",
+        json.dumps({"frames": 5}),
+        json.dumps({"frames": [[{"score": 1.0}], [pose(2.0)]]}),
+        json.dumps({"frames": [{"timestamp": "soon", "poses": [pose(3.0)]}, [pose(4.0)]]}),
+    ]
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+
+def test_read_session_skips_and_counts_malformed_frames(tmp_path):
+    records, skipped = read_session(write_session(tmp_path / "session.jsonl"), frame_interval=0.5)
+    assert skipped == 4
+    np.testing.assert_array_equal(records["sequence"], [0, 1, 2, 3])
+    np.testing.assert_allclose(records["timestamp"], [1.0, 1.5, 2.0, 2.5])
+
+
+def test_replay_reports_skipped_frames_rather_than_aborting(tmp_path):
+    output = str(tmp_path / "scores.npz")
+    rows, skipped = replay([write_session(tmp_path / "session.jsonl")], output, ["centroid"], workers=1)
+    assert skipped == 4
+    assert rows == 4
+    with np.load(output) as scores:
+        assert len(scores["frame"]) == 4
@@ -0,0 +1,54 @@
+"""
+Stats of ShardPool worker processes merged into the stats of the parent.
+"""
+
+import numpy as np
+
+from parser import run_shard
+from pose_format import batch_records
+from sharding import ShardPool
+from stats import Stats
+
+
+def pose(offset=0.0):
+    return {"score": 0.9, "keypoints": [{"position": {"x": offset + index, "y": offset + 2 * index}, "score": 0.8}
+                                        for index in range(17)]}
+
+
+def test_snapshots_of_other_processes_are_merged():
+    parent = Stats()
+    parent.increment("parser_frames_stale", 2)
+    parent.observe("metric_centroid", 0.001)
+    worker = Stats()
+    worker.increment("parser_frames_stale", 3)
+    worker.increment("parser_frames_errored")
+    worker.observe("metric_centroid", 0.002)
+    worker.observe("metric_centroid", 20.0)
+    worker.register_gauges("output", lambda: {"sent": 4})
+    parent.register_gauges("output", lambda: {"sent": 1})
+    parent.register_snapshots(lambda: [worker.snapshot(), worker.snapshot()])
+    snapshot = parent.snapshot()
+    assert snapshot["counters"] == {"parser_frames_stale": 8, "parser_frames_errored": 2}
+    assert snapshot["gauges"]["output_sent"] == 9
+    stage = snapshot["stages"]["metric_centroid"]
+    assert stage["count"] == 5
+    assert stage["max"] == 20.0
+    assert sum(count for _, count in stage["buckets"]) == 5
+    assert stage["buckets"][-1][1] == 2
+    assert 'pose_stage_seconds_count{stage="metric_centroid"} 5' in parent.render_text()
+
+
+def test_worker_stats_reach_the_parent():
+    pool = ShardPool(run_shard, ("centroid_coords", 0.2, None, 0.0, 0.0, None), workers=2)
+    parent = Stats()
+    parent.register_snapshots(pool.snapshots)
+    pool.start()
+    try:
+        frames = [[pose(index)] for index in range(6)]
+        for stream_id in range(4):
+            assert pool.dispatch(batch_records(frames, stream_id=stream_id, timestamp=list(np.arange(6) / 30))) == 0
+    finally:
+        pool.stop()
+    snapshots = pool.snapshots()
+    assert len(snapshots) == 2
+    assert parent.snapshot()["stages"]["metric_centroid_coords"]["count"] == 24
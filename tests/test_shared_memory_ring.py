@@ -0,0 +1,103 @@
+"""
+Records passed through a SharedMemoryRing, and a writer following the ring across a restart of its reader.
+"""
+
+import itertools
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from pose_format import POSE_RECORD
+from shared_memory_ring import SharedMemoryRing
+from socket_class import SocketManager
+
+ring_names = itertools.count()
+
+
+def records(count, first_sequence=0):
+    batch = np.zeros(count, dtype=POSE_RECORD)
+    batch["sequence"] = np.arange(first_sequence, first_sequence + count)
+    batch["score"] = 0.5
+    return batch
+
+
+@pytest.fixture
+def name():
+    return "test_ring_%s_%s" % (os.getpid(), next(ring_names))
+
+
+def writer(name):
+    return SocketManager(None, server=False, transport=SocketManager.TRANSPORT_SHARED_MEMORY, ring_name=name)
+
+
+def test_reader_gets_records_in_order(name):
+    reader = SharedMemoryRing(name, 8, create=True)
+    attached = SharedMemoryRing(name)
+    try:
+        attached.write(records(3))
+        attached.write(records(2, 3))
+        np.testing.assert_array_equal(reader.read()["sequence"], [0, 1, 2, 3, 4])
+        assert len(reader.read()) == 0
+        assert reader.dropped == 0
+    finally:
+        attached.close()
+        reader.close()
+
+
+def test_reader_counts_records_overwritten_before_it_read_them(name):
+    reader = SharedMemoryRing(name, 4, create=True)
+    try:
+        reader.write(records(10))
+        np.testing.assert_array_equal(reader.read()["sequence"], [6, 7, 8, 9])
+        assert reader.dropped == 6
+    finally:
+        reader.close()
+
+
+def test_writer_follows_reader_that_restarted(name):
+    reader = SharedMemoryRing(name, 16, create=True)
+    sender = writer(name)
+    try:
+        assert sender.send_message(message=records(2)) is None
+        assert len(reader.read()) == 2
+        # A reader killed without closing its ring is replaced by a new one under the same name.
+        restarted = SharedMemoryRing(name, 16, create=True)
+        reader.owner = False
+        reader.close()
+        reader = restarted
+        assert sender.send_message(message=records(3)) is None
+        np.testing.assert_array_equal(reader.read()["sequence"], [0, 1, 2])
+    finally:
+        sender.close_connections()
+        reader.close()
+
+
+def test_writer_follows_reader_that_closed_and_restarted(name):
+    reader = SharedMemoryRing(name, 16, create=True)
+    sender = writer(name)
+    try:
+        assert sender.send_message(message=records(1)) is None
+        reader.close()
+        assert sender.send_message(message=records(1)) == "CONNECTION ERROR"
+        reader = SharedMemoryRing(name, 16, create=True)
+        assert sender.send_message(message=records(2)) is None
+        assert len(reader.read()) == 2
+    finally:
+        sender.close_connections()
+        reader.close()
+
+
+def test_writer_notices_ring_removed_without_being_retired(name):
+    reader = SharedMemoryRing(name, 16, create=True)
+    attached = SharedMemoryRing(name, check_interval=0.0)
+    try:
+        assert not attached.replaced()
+        # Removed without being retired, as when the resource tracker of a killed reader cleans up after it.
+        shared_memory.SharedMemory(name=name).unlink()
+        reader.owner = False
+        assert attached.replaced()
+    finally:
+        attached.close()
+        reader.close()
@@ -0,0 +1,120 @@
+"""
+Round trips through a SocketManager server in selector mode and its worker pool.
+"""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from admission import WorkerPool
+from pose_format import batch_records, decode_poses, encode_poses
+from socket_class import SocketManager, CODEC_POSE, BUSY
+
+
+def pose(offset=0.0):
+    return {"score": 0.9, "keypoints": [{"position": {"x": offset + index, "y": offset + 2 * index}, "score": 0.8}
+                                        for index in range(17)]}
+
+
+class Callback:
+    """
+    Stands in for the parser, running whatever behaviour a test sets.
+    """
+
+    def __init__(self):
+        self.behaviour = lambda message: {"poses": len(message)}
+
+    def got_message(self, address, message):
+        return self.behaviour(message)
+
+
+@pytest.fixture
+def server():
+    callback = Callback()
+    manager = SocketManager(callback, port=0, server=True, allow_pickle=False, timeout=3, workers=1, queue_size=1,
+                            overload_policy=WorkerPool.POLICY_REJECT,
+                            server_mode=SocketManager.SERVER_MODE_SELECTOR)
+    manager.listen()
+    yield callback, manager.socket.getsockname()[1]
+    manager.stop_server()
+    # Lets the selector loop see the stop before the next test starts a server.
+    time.sleep(0.1)
+
+
+def client():
+    return SocketManager(None, server=False, persistent=True, timeout=3, codecs=(CODEC_POSE,))
+
+
+def test_round_trip(server):
+    callback, port = server
+    received = []
+
+    def record(message):
+        received.append(message)
+        return {"poses": len(message)}
+
+    callback.behaviour = record
+    sender = client()
+    records = batch_records([[pose(), pose(50.0)]], stream_id=3, timestamp=12.5)
+    try:
+        assert sender.send_message(port=port, message=records) == {"poses": 2}
+        assert sender.send_message(port=port, message=records[:1]) == {"poses": 1}
+    finally:
+        sender.close_connections()
+    assert len(received) == 2
+    np.testing.assert_array_equal(received[0], decode_poses(encode_poses(records)))
+    assert received[0]["stream_id"].tolist() == [3, 3]
+    assert received[0]["timestamp"].tolist() == [12.5, 12.5]
+
+
+def test_callback_error_does_not_wedge_connection(server):
+    callback, port = server
+
+    def fail(message):
+        raise ZeroDivisionError("float division by zero")
+
+    callback.behaviour = fail
+    sender = client()
+    records = batch_records([[pose()]])
+    try:
+        started = time.monotonic()
+        assert sender.send_message(port=port, message=records) == "CONNECTION ERROR"
+        # The connection is closed straight away rather than left until the client times out.
+        assert time.monotonic() - started < 1.0
+        callback.behaviour = lambda message: {"poses": len(message)}
+        assert sender.send_message(port=port, message=records) == {"poses": 1}
+    finally:
+        sender.close_connections()
+
+
+def test_overloaded_pool_answers_busy(server):
+    callback, port = server
+    release = threading.Event()
+
+    def wait(message):
+        release.wait(2)
+        return {"poses": len(message)}
+
+    callback.behaviour = wait
+    records = batch_records([[pose()]])
+    senders = [client() for _ in range(3)]
+    responses = [None] * len(senders)
+
+    def send(index):
+        responses[index] = senders[index].send_message(port=port, message=records)
+
+    threads = [threading.Thread(target=send, args=(index,)) for index in range(len(senders))]
+    try:
+        for thread in threads:
+            thread.start()
+            # One message runs and one waits, so the third finds the queue full.
+            time.sleep(0.2)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+    finally:
+        for sender in senders:
+            sender.close_connections()
+    assert sorted(map(str, responses)) == sorted([BUSY, str({"poses": 1}), str({"poses": 1})])
@@ -0,0 +1,112 @@
+"""
+Requests for files served by StaticAssets through a Flask test client, checking the encoding chosen, ETags and
+cache headers.
+"""
+
+import gzip
+import types
+import zlib
+
+import pytest
+from flask import Flask, request
+
+import static_assets
+from static_assets import CACHE_IMMUTABLE, CACHE_REVALIDATE, StaticAssets
+
+PAGE = b"<html><body>" + b"<p>camera</p>" * 200 + b"</body></html>"
+BUNDLE = b"console.log('pose');\n" * 200
+
+
+def serve(directory):
+    """
+    Args:
+        directory(pathlib.Path): Directory of the files to serve.
+
+    Returns:
+        FlaskClient: Test client of an app serving the directory at its root.
+    """
+    app = Flask(__name__)
+    assets = StaticAssets(str(directory))
+
+    @app.route("/<path:path>")
+    def send_asset(path):
+        return assets.response(path, request)
+
+    return app.test_client()
+
+
+@pytest.fixture
+def directory(tmp_path):
+    (tmp_path / "camera.html").write_bytes(PAGE)
+    (tmp_path / "camera.98fd1d1f.js").write_bytes(BUNDLE)
+    (tmp_path / "tiny.txt").write_bytes(b"x")
+    (tmp_path / "models").mkdir()
+    (tmp_path / "models" / "pose.json").write_bytes(b"{}")
+    return tmp_path
+
+
+def test_hashed_names_are_immutable_and_others_revalidated(directory):
+    client = serve(directory)
+    assert client.get("/camera.98fd1d1f.js").headers["Cache-Control"] == CACHE_IMMUTABLE
+    assert client.get("/camera.html").headers["Cache-Control"] == CACHE_REVALIDATE
+    assert client.get("/camera.html").headers["Vary"] == "Accept-Encoding"
+
+
+def test_gzip_is_served_only_when_accepted(directory):
+    client = serve(directory)
+    compressed = client.get("/camera.html", headers={"Accept-Encoding": "gzip, deflate"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.mimetype == "text/html"
+    assert gzip.decompress(compressed.data) == PAGE
+    original = client.get("/camera.html", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in original.headers
+    assert original.data == PAGE
+    assert compressed.headers["ETag"] != original.headers["ETag"]
+
+
+def test_files_that_do_not_shrink_are_served_as_they_are(directory):
+    response = serve(directory).get("/tiny.txt", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert response.data == b"x"
+
+
+def test_brotli_is_preferred_when_installed_and_accepted(directory, monkeypatch):
+    monkeypatch.setattr(static_assets, "brotli", types.SimpleNamespace(compress=lambda data: zlib.compress(data, 9)))
+    client = serve(directory)
+    response = client.get("/camera.98fd1d1f.js", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["Content-Encoding"] == "br"
+    assert zlib.decompress(response.data) == BUNDLE
+    response = client.get("/camera.98fd1d1f.js", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+
+
+def test_matching_etag_is_answered_with_not_modified(directory):
+    client = serve(directory)
+    first = client.get("/camera.html", headers={"Accept-Encoding": "gzip"})
+    etag = first.headers["ETag"]
+    cached = client.get("/camera.html", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.data == b""
+    assert cached.headers["ETag"] == etag
+    assert cached.headers["Cache-Control"] == CACHE_REVALIDATE
+    # The client's copy is gzip, so a request for the original is not answered from it.
+    other = client.get("/camera.html", headers={"Accept-Encoding": "identity", "If-None-Match": etag})
+    assert other.status_code == 200
+    assert other.data == PAGE
+
+
+def test_changed_file_gets_a_new_etag(directory):
+    etag = serve(directory).get("/camera.html").headers["ETag"]
+    (directory / "camera.html").write_bytes(PAGE + b"<!-- changed -->")
+    response = serve(directory).get("/camera.html", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_files_in_subdirectories_are_served_and_unknown_names_are_not_found(directory):
+    client = serve(directory)
+    response = client.get("/models/pose.json")
+    assert response.status_code == 200
+    assert response.mimetype == "application/json"
+    assert response.data == b"{}"
+    assert client.get("/missing.js").status_code == 404
@@ -0,0 +1,93 @@
+"""
+Checks that PoseTracker keeps the id of each person across frames, starts new tracks for new people and forgets
+tracks once they expire.
+"""
+
+import numpy as np
+import pytest
+
+import tracker
+from tracker import PoseTracker, match_poses, pose_distances
+
+
+def pose(offset, score=1.0):
+    """
+    Builds a pose with every keypoint confidently seen, shifted by offset.
+
+    Args:
+        offset(float): Distance added to the x and y of every keypoint.
+        score(float): Confidence score of every keypoint.
+
+    Returns:
+        np.ndarray: (17, 3) x, y and score of the pose.
+    """
+    keypoints = np.zeros((17, 3))
+    keypoints[:, 0] = np.arange(17) + offset
+    keypoints[:, 1] = np.arange(17) * 2 + offset
+    keypoints[:, 2] = score
+    return keypoints
+
+
+@pytest.fixture(params=["greedy", "optimal"])
+def matching(request, monkeypatch):
+    """
+    Runs a test with greedy matching, and with optimal assignment when scipy is installed.
+    """
+    if request.param == "greedy":
+        monkeypatch.setattr(tracker, "linear_sum_assignment", None)
+    elif tracker.linear_sum_assignment is None:
+        pytest.skip("scipy is not installed")
+    return request.param
+
+
+def test_pose_distances_use_shared_confident_keypoints():
+    tracked = np.stack([pose(0.0)])
+    moved = pose(3.0)
+    moved[:8, 2] = 0.0
+    costs = pose_distances(tracked, np.stack([moved, pose(0.0, score=0.0)]), 0.2)
+    assert costs.shape == (1, 2)
+    np.testing.assert_allclose(costs[0, 0], np.hypot(3.0, 3.0))
+    # No keypoint is confidently seen in both, so the centres of the poses are compared.
+    np.testing.assert_allclose(costs[0, 1], 0.0)
+
+
+def test_match_poses_pairs_lowest_costs_within_limit(matching):
+    costs = np.array([[1.0, 5.0, 50.0],
+                      [8.0, 2.0, 40.0],
+                      [30.0, 60.0, 70.0]])
+    rows, columns = match_poses(costs, 10.0)
+    # The third track costs more than the limit with every pose, so it stays unmatched.
+    assert sorted(zip(rows.tolist(), columns.tolist())) == [(0, 0), (1, 1)]
+    rows, columns = match_poses(np.zeros((0, 2)), 10.0)
+    assert len(rows) == len(columns) == 0
+
+
+def test_update_keeps_ids_and_starts_new_tracks(matching):
+    poses_tracker = PoseTracker(max_distance=20.0)
+    first = poses_tracker.update(np.stack([pose(0.0), pose(200.0)]), 0.0)
+    assert [track.track_id for track in first] == [0, 1]
+    # The people swap places in the list and move a little, and a third person arrives.
+    second = poses_tracker.update(np.stack([pose(205.0), pose(400.0), pose(4.0)]), 0.1)
+    assert [track.track_id for track in second] == [1, 2, 0]
+    np.testing.assert_array_equal(second[2].keypoints, pose(4.0))
+    assert second[0].last_seen == 0.1
+    assert poses_tracker.last_seen == 0.1
+    assert len(poses_tracker.tracks) == 3
+
+
+def test_each_track_gets_its_own_metrics():
+    poses_tracker = PoseTracker(metrics_factory=list)
+    tracks = poses_tracker.update(np.stack([pose(0.0), pose(300.0)]), 0.0)
+    assert tracks[0].metrics is not tracks[1].metrics
+    assert poses_tracker.update(np.stack([pose(1.0)]), 0.1)[0].metrics is tracks[0].metrics
+
+
+def test_unmatched_tracks_expire_and_ids_are_not_reused():
+    poses_tracker = PoseTracker(expiry=1.0)
+    poses_tracker.update(np.stack([pose(0.0), pose(300.0)]), 0.0)
+    poses_tracker.update(np.stack([pose(1.0)]), 0.9)
+    assert [track.track_id for track in poses_tracker.update(np.zeros((0, 17, 3)), 1.5)] == []
+    assert [track.track_id for track in poses_tracker.tracks] == [0]
+    # The person returns after their track expired, so they are followed under a new id.
+    assert [track.track_id for track in poses_tracker.update(np.stack([pose(300.0)]), 3.0)] == [2]
+    assert [track.track_id for track in poses_tracker.tracks] == [2]
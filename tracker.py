@@ -0,0 +1,169 @@
+"""
+Assigns stable track ids to the poses of several people across frames.
+
+Every pose in a frame is compared with the last pose of every live track in one NumPy pass, giving a cost matrix of
+mean keypoint distances. Poses are then matched to tracks by lowest cost, unmatched poses start new tracks and
+tracks that have not been matched for a while expire. Each track carries its own metric state so the speeds of
+different people are never mixed.
+"""
+
+import itertools
+import threading
+
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    # Optimal assignment is optional, poses are matched greedily by lowest cost without scipy.
+    linear_sum_assignment = None
+
+# Confidence score a keypoint needs to be used for matching.
+DEFAULT_MINIMUM_CONFIDENCE = 0.2
+
+
+def pose_distances(tracked, poses, minimum_confidence=DEFAULT_MINIMUM_CONFIDENCE):
+    """
+    Computes the matching cost between every tracked pose and every new pose.
+    The cost is the mean distance between keypoints confidently seen in both poses, or the distance between the
+    centres of the two poses when they have no such keypoint in common.
+
+    Args:
+        tracked(np.ndarray): (t, 17, 3) x, y and score of the last pose of each track.
+        poses(np.ndarray): (n, 17, 3) x, y and score of each new pose.
+        minimum_confidence(float): Score a keypoint must exceed to be compared.
+
+    Returns:
+        np.ndarray: (t, n) matrix of costs in position units.
+    """
+    shared = (tracked[:, None, :, 2] > minimum_confidence) & (poses[None, :, :, 2] > minimum_confidence)
+    distances = np.linalg.norm(tracked[:, None, :, :2] - poses[None, :, :, :2], axis=3)
+    counts = shared.sum(axis=2)
+    costs = np.where(shared, distances, 0.0).sum(axis=2) / np.maximum(counts, 1)
+    centres = np.linalg.norm(tracked[:, :, :2].mean(axis=1)[:, None] - poses[:, :, :2].mean(axis=1)[None], axis=2)
+    return np.where(counts > 0, costs, centres)
+
+
+def match_poses(costs, max_cost):
+    """
+    Pairs tracks with poses so the total cost is low, leaving out any pair costing more than max_cost.
+
+    Args:
+        costs(np.ndarray): (t, n) cost matrix from pose_distances.
+        max_cost(float): Highest cost a pair may have to be matched.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Track indexes and the pose indexes matched to them.
+    """
+    if costs.size == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    if linear_sum_assignment is not None:
+        rows, columns = linear_sum_assignment(costs)
+    else:
+        order = np.argsort(costs, axis=None)
+        order = order[costs.ravel()[order] <= max_cost]
+        rows, columns = np.unravel_index(order, costs.shape)
+        used_rows = set()
+        used_columns = set()
+        keep = []
+        for index, (row, column) in enumerate(zip(rows.tolist(), columns.tolist())):
+            if row not in used_rows and column not in used_columns:
+                used_rows.add(row)
+                used_columns.add(column)
+                keep.append(index)
+                if len(keep) == min(costs.shape):
+                    break
+        rows = rows[keep]
+        columns = columns[keep]
+    matched = costs[rows, columns] <= max_cost
+    return rows[matched], columns[matched]
+
+
+class Track:
+    """
+    One person followed across frames.
+    """
+    __slots__ = ("track_id", "keypoints", "last_seen", "metrics")
+
+    def __init__(self, track_id, keypoints, last_seen, metrics=None):
+        """
+        Args:
+            track_id(int): Id of the track, unique within its tracker.
+            keypoints(np.ndarray): (17, 3) x, y and score of the latest pose.
+            last_seen(float): Time in seconds the track was last matched.
+            metrics: Metric state kept for this person, eg. a PoseMetrics.
+        """
+        self.track_id = track_id
+        self.keypoints = keypoints
+        self.last_seen = last_seen
+        self.metrics = metrics
+
+
+class PoseTracker:
+    """
+    Keeps the live tracks of one camera stream and matches each new frame of poses to them.
+    """
+    # Largest mean keypoint distance, in position units, between a track and a pose still taken as the same person.
+    DEFAULT_MAX_DISTANCE = 100.0
+    # Seconds a track is kept without being matched before it expires.
+    DEFAULT_EXPIRY = 2.0
+
+    def __init__(self, metrics_factory=None, max_distance=DEFAULT_MAX_DISTANCE, expiry=DEFAULT_EXPIRY,
+                 minimum_confidence=DEFAULT_MINIMUM_CONFIDENCE):
+        """
+        Args:
+            metrics_factory(callable): Called with no arguments to create the metric state of each new track.
+            max_distance(float): Largest matching cost accepted.
+            expiry(float): Seconds an unmatched track is kept.
+            minimum_confidence(float): Score a keypoint must exceed to be used for matching.
+        """
+        self.metrics_factory = metrics_factory
+        self.max_distance = max_distance
+        self.expiry = expiry
+        self.minimum_confidence = minimum_confidence
+        self.tracks = []
+        # Time in seconds of the last frame the tracker was updated with, None before the first.
+        self.last_seen = None
+        # Held by callers while updating the tracker and running metrics for a frame.
+        self.lock = threading.Lock()
+        self.__ids = itertools.count()
+
+    def update(self, poses, timestamp):
+        """
+        Matches the poses of a frame to the live tracks, starting a track for each pose that matches none.
+
+        Args:
+            poses(np.ndarray): (n, 17, 3) x, y and score of each pose in the frame.
+            timestamp(float): Time of the frame in seconds.
+
+        Returns:
+            list[Track]: The track of each pose, in the order of the poses.
+        """
+        self.expire(timestamp)
+        self.last_seen = timestamp
+        poses = np.asarray(poses, dtype=np.float64)
+        assigned = [None] * len(poses)
+        if self.tracks and len(poses):
+            tracked = np.stack([track.keypoints for track in self.tracks])
+            rows, columns = match_poses(pose_distances(tracked, poses, self.minimum_confidence), self.max_distance)
+            for row, column in zip(rows.tolist(), columns.tolist()):
+                assigned[column] = self.tracks[row]
+        for index, track in enumerate(assigned):
+            if track is None:
+                metrics = self.metrics_factory() if self.metrics_factory is not None else None
+                track = Track(next(self.__ids), poses[index], timestamp, metrics)
+                self.tracks.append(track)
+                assigned[index] = track
+            else:
+                track.keypoints = poses[index]
+                track.last_seen = timestamp
+        return assigned
+
+    def expire(self, timestamp):
+        """
+        Drops tracks that have not been matched within the expiry time.
+
+        Args:
+            timestamp(float): Current time in seconds.
+        """
+        self.tracks = [track for track in self.tracks if timestamp - track.last_seen <= self.expiry]